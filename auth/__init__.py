@@ -1,11 +1,27 @@
 """
 用户认证模块
 提供用户注册、登录、密钥管理功能
+
+子模块按需导入：客户端只用到 password / master_key，
+不必在启动时加载服务端的邮件发送（smtplib、ssl、email.mime）等依赖
 """
 
-from .user import User
-from .password import PasswordManager
-from .email_service import EmailService
-from .master_key import MasterKeyManager
+import importlib
+
+_EXPORTS = {
+    'User': '.user',
+    'PasswordManager': '.password',
+    'EmailService': '.email_service',
+    'MasterKeyManager': '.master_key',
+}
 
 __all__ = ['User', 'PasswordManager', 'EmailService', 'MasterKeyManager']
+
+
+def __getattr__(name):
+    module_name = _EXPORTS.get(name)
+    if module_name is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(importlib.import_module(module_name, __name__), name)
+    globals()[name] = value
+    return value
@@ -3,11 +3,13 @@ Email 服务模块
 发送验证码和密码重置邮件
 """
 
+import atexit
 import os
-import random
-import string
+import secrets
 import time
 import smtplib
+import queue
+from contextlib import contextmanager
 from email.mime.text import MIMEText
 from email.mime.multipart import MIMEMultipart
 from email.header import Header
@@ -15,16 +17,214 @@ from email.utils import formataddr
 from typing import Dict, Optional, Tuple
 from dataclasses import dataclass
 from threading import Lock
+from collections import OrderedDict
 
 
-@dataclass
+class _SMTPPool:
+    """
+    SMTP 连接池
+    复用已完成 TLS 握手和 AUTH 的连接，避免每封邮件重复建立会话
+    """
+    
+    MAX_CONNS = 4              # 最大空闲连接数
+    IDLE_TIMEOUT = 60          # 空闲超时（秒），超过后关闭
+    MAX_USES_PER_CONN = 100    # 单连接最大发送次数
+    MAX_CONN_AGE = 600         # 单连接最长存活时间（秒）
+    
+    _pools: Dict[Tuple[str, int, str], '_SMTPPool'] = {}
+    _pools_lock = Lock()
+    
+    def __init__(self, host: str, port: int, user: str, password: str,
+                 use_ssl: bool, timeout: float = 30):
+        self.host = host
+        self.port = port
+        self.user = user
+        self.password = password
+        self.use_ssl = use_ssl
+        self.timeout = timeout
+        # 空闲连接: (conn, created_at, last_used, uses)
+        self._idle: queue.LifoQueue = queue.LifoQueue(maxsize=self.MAX_CONNS)
+        self._closed = False  # 被替换或退出时关闭，之后归还的连接直接关闭
+    
+    @classmethod
+    def for_endpoint(cls, host: str, port: int, user: str, password: str,
+                     use_ssl: bool) -> '_SMTPPool':
+        """按 (host, port, user) 获取共享连接池"""
+        key = (host, port, user)
+        old_pool = None
+        with cls._pools_lock:
+            pool = cls._pools.get(key)
+            if pool is None or pool.password != password or pool.use_ssl != use_ssl:
+                old_pool = pool
+                pool = cls(host, port, user, password, use_ssl)
+                cls._pools[key] = pool
+        # 配置变化后旧池不再使用，关闭其已认证的空闲连接（在锁外进行网络操作）
+        if old_pool is not None:
+            old_pool.close_all()
+        return pool
+    
+    @classmethod
+    def close_pools(cls):
+        """关闭所有连接池（进程退出时调用）"""
+        with cls._pools_lock:
+            pools = list(cls._pools.values())
+            cls._pools.clear()
+        for pool in pools:
+            pool.close_all()
+    
+    def _connect(self) -> smtplib.SMTP:
+        """建立新连接并完成认证"""
+        if self.use_ssl:
+            conn = smtplib.SMTP_SSL(self.host, self.port, timeout=self.timeout)
+        else:
+            conn = smtplib.SMTP(self.host, self.port, timeout=self.timeout)
+            conn.ehlo()
+            conn.starttls()
+            conn.ehlo()
+        try:
+            conn.login(self.user, self.password)
+        except Exception:
+            self._close(conn)
+            raise
+        return conn
+    
+    @staticmethod
+    def _close(conn: smtplib.SMTP):
+        """关闭连接，忽略错误"""
+        try:
+            conn.quit()
+        except Exception:
+            try:
+                conn.close()
+            except Exception:
+                pass
+    
+    def _is_reusable(self, entry: tuple, now: float) -> bool:
+        """检查空闲连接是否仍可复用"""
+        conn, created_at, last_used, uses = entry
+        if now - last_used > self.IDLE_TIMEOUT:
+            return False
+        if now - created_at > self.MAX_CONN_AGE:
+            return False
+        if uses >= self.MAX_USES_PER_CONN:
+            return False
+        try:
+            return conn.noop()[0] == 250
+        except Exception:
+            return False
+    
+    def _checkout(self) -> tuple:
+        """取出一个可用连接，必要时新建"""
+        now = time.time()
+        while True:
+            try:
+                entry = self._idle.get_nowait()
+            except queue.Empty:
+                break
+            if self._is_reusable(entry, now):
+                return entry
+            self._close(entry[0])
+        
+        return self._connect(), now, now, 0
+    
+    def _checkin(self, entry: tuple):
+        """归还连接，池满时直接关闭"""
+        conn, created_at, _, uses = entry
+        if self._closed:
+            self._close(conn)
+            return
+        try:
+            self._idle.put_nowait((conn, created_at, time.time(), uses + 1))
+        except queue.Full:
+            self._close(conn)
+    
+    @contextmanager
+    def get(self):
+        """
+        借出连接的上下文管理器
+        发送异常时丢弃该连接，否则归还到池中
+        """
+        entry = self._checkout()
+        ok = False
+        try:
+            yield entry[0]
+            ok = True
+        finally:
+            if ok:
+                self._checkin(entry)
+            else:
+                self._close(entry[0])
+    
+    def close_all(self):
+        """关闭所有空闲连接，之后归还的连接也直接关闭"""
+        self._closed = True
+        while True:
+            try:
+                entry = self._idle.get_nowait()
+            except queue.Empty:
+                break
+            self._close(entry[0])
+
+
+atexit.register(_SMTPPool.close_pools)
+
+
+@dataclass(slots=True)
 class VerificationCode:
     """验证码信息"""
-    code: str
+    code: bytes  # ASCII 数字
     email: str
     created_at: float
     expires_at: float
     purpose: str  # "login" or "reset"
+    attempts: int = 0  # 已失败的尝试次数
+
+
+# 邮件 HTML 模板（按变量位置预先切分，渲染时仅做字符串拼接）
+_CODE_EMAIL_HEAD = """
+        <!DOCTYPE html>
+        <html>
+        <head>
+            <meta charset="utf-8">
+        </head>
+        <body style="font-family: 'Microsoft YaHei', Arial, sans-serif; background: #f5f5f5; padding: 20px;">
+            <div style="max-width: 500px; margin: 0 auto; background: white; border-radius: 8px; padding: 30px; box-shadow: 0 2px 10px rgba(0,0,0,0.1);">
+                <h2 style="color: #1a73e8; margin-bottom: 20px;">"""
+_CODE_EMAIL_MIDDLE = """</h2>
+                <p style="color: #666; font-size: 14px;">您的验证码是：</p>
+                <div style="background: #f0f7ff; border-radius: 8px; padding: 20px; text-align: center; margin: 20px 0;">
+                    <span style="font-size: 32px; font-weight: bold; color: #1a73e8; letter-spacing: 8px;">"""
+_CODE_EMAIL_TAIL = """</span>
+                </div>
+                <p style="color: #999; font-size: 12px;">验证码有效期 5 分钟，请勿泄露给他人。</p>
+                <hr style="border: none; border-top: 1px solid #eee; margin: 20px 0;">
+                <p style="color: #999; font-size: 12px;">此邮件由安全网盘系统自动发送，请勿回复。</p>
+            </div>
+        </body>
+        </html>
+        """
+
+_RECOVERY_EMAIL_HEAD = """
+        <!DOCTYPE html>
+        <html>
+        <head>
+            <meta charset="utf-8">
+        </head>
+        <body style="font-family: 'Microsoft YaHei', Arial, sans-serif; background: #f5f5f5; padding: 20px;">
+            <div style="max-width: 500px; margin: 0 auto; background: white; border-radius: 8px; padding: 30px; box-shadow: 0 2px 10px rgba(0,0,0,0.1);">
+                <h2 style="color: #1a73e8; margin-bottom: 20px;">密钥恢复</h2>
+                <p style="color: #666; font-size: 14px;">您的恢复凭证：</p>
+                <div style="background: #fff3e0; border-radius: 8px; padding: 15px; margin: 20px 0; word-break: break-all;">
+                    <code style="font-size: 14px; color: #e65100;">"""
+_RECOVERY_EMAIL_TAIL = """</code>
+                </div>
+                <p style="color: #f44336; font-size: 12px;">⚠️ 请妥善保管此凭证，它是恢复您加密文件的唯一方式。</p>
+                <hr style="border: none; border-top: 1px solid #eee; margin: 20px 0;">
+                <p style="color: #999; font-size: 12px;">此邮件由安全网盘系统自动发送，请勿回复。</p>
+            </div>
+        </body>
+        </html>
+        """
 
 
 class EmailService:
@@ -33,6 +233,7 @@ class EmailService:
     CODE_LENGTH = 6
     CODE_EXPIRY = 300  # 5 分钟
     MAX_ATTEMPTS = 5   # 最大尝试次数
+    MAX_CODES = 100000  # 最多同时保存的验证码数量
     
     def __init__(self, 
                  smtp_host: str = None,
@@ -58,17 +259,24 @@ class EmailService:
         self.smtp_password = smtp_password or os.environ.get('SMTP_PASSWORD', '')
         self.sender_email = sender_email or self.smtp_user
         self.sender_name = sender_name
+        # 发件人头部（RFC 2047 编码）只依赖初始化参数，预先生成
+        self._from_header = formataddr((str(Header(self.sender_name, 'utf-8')), self.sender_email))
+        
+        # 初始化后不再变化的配置判断，只计算一次
+        self.is_configured = bool(self.smtp_host and self.smtp_user and self.smtp_password)
+        # SSL端口: 465(QQ/网易), 994(网易)；其余端口(587)使用 STARTTLS
+        self._use_ssl = self.smtp_port in (465, 994)
+        self._smtp_pool: Optional[_SMTPPool] = None
+        if self.is_configured:
+            self._smtp_pool = _SMTPPool.for_endpoint(
+                self.smtp_host, self.smtp_port, self.smtp_user,
+                self.smtp_password, self._use_ssl
+            )
         
-        # 验证码存储
-        self._codes: Dict[str, VerificationCode] = {}
-        self._attempts: Dict[str, int] = {}
+        # 验证码存储（按插入顺序即过期顺序排列，容量受限）
+        self._codes: OrderedDict[Tuple[str, str], VerificationCode] = OrderedDict()
         self._lock = Lock()
     
-    @property
-    def is_configured(self) -> bool:
-        """检查是否已配置 SMTP"""
-        return bool(self.smtp_host and self.smtp_user and self.smtp_password)
-    
     def generate_code(self, email: str, purpose: str = "login") -> str:
         """
         生成验证码
@@ -80,21 +288,45 @@ class EmailService:
         Returns:
             生成的验证码
         """
-        code = ''.join(random.choices(string.digits, k=self.CODE_LENGTH))
+        # 一次读取 CSPRNG 字节，每字节取 b % 10；拒绝 >= 250 的字节以消除取模偏差
+        digits = b''
+        while len(digits) < self.CODE_LENGTH:
+            raw = secrets.token_bytes(self.CODE_LENGTH * 2)
+            digits += bytes(b % 10 + 0x30 for b in raw if b < 250)
+        digits = digits[:self.CODE_LENGTH]
+        code = digits.decode('ascii')
+        
+        now = time.time()
+        entry = VerificationCode(
+            code=digits,
+            email=email,
+            created_at=now,
+            expires_at=now + self.CODE_EXPIRY,
+            purpose=purpose
+        )
         
+        key = (email, purpose)
         with self._lock:
-            key = f"{email}:{purpose}"
-            self._codes[key] = VerificationCode(
-                code=code,
-                email=email,
-                created_at=time.time(),
-                expires_at=time.time() + self.CODE_EXPIRY,
-                purpose=purpose
-            )
-            self._attempts[key] = 0
+            self._codes[key] = entry
+            self._codes.move_to_end(key)
+            self._evict_expired(now)
         
         return code
     
+    def _evict_expired(self, now: float):
+        """
+        清理过期及超出容量的验证码（需持有锁）
+        
+        所有验证码有效期相同，队首总是最早过期的条目，
+        因此只需从队首弹出，均摊 O(1)
+        """
+        codes = self._codes
+        while codes:
+            oldest = next(iter(codes.values()))
+            if oldest.expires_at >= now and len(codes) <= self.MAX_CODES:
+                break
+            codes.popitem(last=False)
+    
     def verify_code(self, email: str, code: str, purpose: str = "login") -> Tuple[bool, str]:
         """
         验证验证码
@@ -107,33 +339,34 @@ class EmailService:
         Returns:
             (是否有效, 错误消息)
         """
+        key = (email, purpose)
+        
+        # 无锁读取：单次 dict 查找在 GIL 下是原子的，条目的 code/expires_at 创建后不再修改
+        stored = self._codes.get(key)
+        if stored is None or time.time() > stored.expires_at:
+            return False, "验证码不存在或已过期"
+        if stored.attempts >= self.MAX_ATTEMPTS:
+            return False, "验证码已失效，请重新获取"
+        # 常量时间比较，避免逐字符比较带来的时序侧信道
+        matched = secrets.compare_digest(stored.code, code.encode('utf-8'))
+        
+        # 仅在修改状态时加锁，并确认条目未被替换或删除
         with self._lock:
-            key = f"{email}:{purpose}"
-            
-            # 检查尝试次数
-            attempts = self._attempts.get(key, 0)
-            if attempts >= self.MAX_ATTEMPTS:
-                self._codes.pop(key, None)
-                return False, "验证码已失效，请重新获取"
-            
-            stored = self._codes.get(key)
-            if not stored:
+            if self._codes.get(key) is not stored:
                 return False, "验证码不存在或已过期"
             
-            # 检查过期
-            if time.time() > stored.expires_at:
-                self._codes.pop(key, None)
-                return False, "验证码已过期"
+            # 检查尝试次数（保留条目直至过期，避免重复尝试）
+            if stored.attempts >= self.MAX_ATTEMPTS:
+                return False, "验证码已失效，请重新获取"
             
             # 验证
-            if stored.code != code:
-                self._attempts[key] = attempts + 1
-                remaining = self.MAX_ATTEMPTS - attempts - 1
+            if not matched:
+                stored.attempts += 1
+                remaining = self.MAX_ATTEMPTS - stored.attempts
                 return False, f"验证码错误，剩余 {remaining} 次尝试"
             
             # 验证成功，清除
-            self._codes.pop(key, None)
-            self._attempts.pop(key, None)
+            del self._codes[key]
             return True, ""
     
     def send_verification_code(self, email: str, purpose: str = "login") -> Tuple[bool, str]:
@@ -195,79 +428,22 @@ class EmailService:
         """发送邮件"""
         msg = MIMEMultipart('alternative')
         msg['Subject'] = subject
-        msg['From'] = formataddr((str(Header(self.sender_name, 'utf-8')), self.sender_email))
+        msg['From'] = self._from_header
         msg['To'] = to_email
         
         # HTML 内容
         html_part = MIMEText(body, 'html', 'utf-8')
         msg.attach(html_part)
         
-        # 根据端口选择连接方式
-        # SSL端口: 465(QQ/网易), 994(网易)
-        # TLS端口: 587
-        if self.smtp_port in (465, 994):
-            # SSL 模式 (端口 465, 994)
-            server = smtplib.SMTP_SSL(self.smtp_host, self.smtp_port, timeout=30)
-            try:
-                server.login(self.smtp_user, self.smtp_password)
-                server.send_message(msg)
-            finally:
-                server.quit()
-        else:
-            # TLS 模式 (端口 587)
-            server = smtplib.SMTP(self.smtp_host, self.smtp_port, timeout=30)
-            try:
-                server.ehlo()
-                server.starttls()
-                server.ehlo()
-                server.login(self.smtp_user, self.smtp_password)
-                server.send_message(msg)
-            finally:
-                server.quit()
+        # 复用连接池中已认证的连接
+        with self._smtp_pool.get() as conn:
+            conn.send_message(msg)
     
     def _create_code_email_body(self, code: str, purpose: str) -> str:
         """创建验证码邮件内容"""
         title = "登录验证" if purpose == "login" else "密码重置"
-        return f"""
-        <!DOCTYPE html>
-        <html>
-        <head>
-            <meta charset="utf-8">
-        </head>
-        <body style="font-family: 'Microsoft YaHei', Arial, sans-serif; background: #f5f5f5; padding: 20px;">
-            <div style="max-width: 500px; margin: 0 auto; background: white; border-radius: 8px; padding: 30px; box-shadow: 0 2px 10px rgba(0,0,0,0.1);">
-                <h2 style="color: #1a73e8; margin-bottom: 20px;">{title}</h2>
-                <p style="color: #666; font-size: 14px;">您的验证码是：</p>
-                <div style="background: #f0f7ff; border-radius: 8px; padding: 20px; text-align: center; margin: 20px 0;">
-                    <span style="font-size: 32px; font-weight: bold; color: #1a73e8; letter-spacing: 8px;">{code}</span>
-                </div>
-                <p style="color: #999; font-size: 12px;">验证码有效期 5 分钟，请勿泄露给他人。</p>
-                <hr style="border: none; border-top: 1px solid #eee; margin: 20px 0;">
-                <p style="color: #999; font-size: 12px;">此邮件由安全网盘系统自动发送，请勿回复。</p>
-            </div>
-        </body>
-        </html>
-        """
+        return _CODE_EMAIL_HEAD + title + _CODE_EMAIL_MIDDLE + code + _CODE_EMAIL_TAIL
     
     def _create_recovery_email_body(self, token: str) -> str:
         """创建恢复邮件内容"""
-        return f"""
-        <!DOCTYPE html>
-        <html>
-        <head>
-            <meta charset="utf-8">
-        </head>
-        <body style="font-family: 'Microsoft YaHei', Arial, sans-serif; background: #f5f5f5; padding: 20px;">
-            <div style="max-width: 500px; margin: 0 auto; background: white; border-radius: 8px; padding: 30px; box-shadow: 0 2px 10px rgba(0,0,0,0.1);">
-                <h2 style="color: #1a73e8; margin-bottom: 20px;">密钥恢复</h2>
-                <p style="color: #666; font-size: 14px;">您的恢复凭证：</p>
-                <div style="background: #fff3e0; border-radius: 8px; padding: 15px; margin: 20px 0; word-break: break-all;">
-                    <code style="font-size: 14px; color: #e65100;">{token}</code>
-                </div>
-                <p style="color: #f44336; font-size: 12px;">⚠️ 请妥善保管此凭证，它是恢复您加密文件的唯一方式。</p>
-                <hr style="border: none; border-top: 1px solid #eee; margin: 20px 0;">
-                <p style="color: #999; font-size: 12px;">此邮件由安全网盘系统自动发送，请勿回复。</p>
-            </div>
-        </body>
-        </html>
-        """
+        return _RECOVERY_EMAIL_HEAD + token + _RECOVERY_EMAIL_TAIL
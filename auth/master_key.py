@@ -4,8 +4,10 @@
 """
 
 import os
+import base64
 import secrets
 import hashlib
+from concurrent.futures import ThreadPoolExecutor
 from typing import Tuple, Optional
 from dataclasses import dataclass
 
@@ -14,15 +16,57 @@ from crypto.rsa import RSACipher
 from crypto.kdf import KeyDerivation
 
 
-@dataclass
+# 用于并行执行密钥派生（PBKDF2 在原生代码中运行，会释放 GIL）
+_kdf_executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix="kdf")
+
+# 恢复密钥标准化表：去除分隔符和空格，小写字母转大写（单次扫描完成）
+_RECOVERY_KEY_TABLE = str.maketrans(
+    'abcdefghijklmnopqrstuvwxyz',
+    'ABCDEFGHIJKLMNOPQRSTUVWXYZ',
+    '- '
+)
+
+
+# 主密钥包布局: (字段名, 长度)
+# 加密字段为 IV(16) + CBC 密文（32 字节主密钥填充后为 48 字节）
+_BUNDLE_LAYOUT = (
+    ('master_key', 32),                  # 明文主密钥（仅在内存中）
+    ('encrypted_master_key', 64),        # 密码加密的主密钥
+    ('master_key_salt', KeyDerivation.SALT_SIZE),    # 密码加密盐值
+    ('recovery_key_encrypted', 64),      # 恢复密钥加密的主密钥
+    ('recovery_key_salt', KeyDerivation.SALT_SIZE),  # 恢复密钥盐值
+    ('recovery_key_hash', 32),           # 恢复密钥哈希
+)
+
+_BUNDLE_SLICES = {}
+_offset = 0
+for _name, _size in _BUNDLE_LAYOUT:
+    _BUNDLE_SLICES[_name] = slice(_offset, _offset + _size)
+    _offset += _size
+_BUNDLE_SIZE = _offset
+del _offset, _name, _size
+
+
+def _bundle_field(name: str) -> property:
+    """生成返回缓冲区视图的只读属性"""
+    sl = _BUNDLE_SLICES[name]
+    return property(lambda self: memoryview(self.blob)[sl])
+
+
+@dataclass(slots=True)
 class MasterKeyBundle:
-    """主密钥包"""
-    master_key: bytes                    # 明文主密钥（仅在内存中）
-    encrypted_master_key: bytes          # 密码加密的主密钥
-    master_key_salt: bytes               # 密码加密盐值
-    recovery_key_encrypted: bytes        # 恢复密钥加密的主密钥
-    recovery_key_salt: bytes             # 恢复密钥盐值
-    recovery_key_hash: bytes             # 恢复密钥哈希
+    """
+    主密钥包
+    所有字段连续存放在同一块缓冲区中，各字段通过 memoryview 零拷贝访问
+    """
+    blob: bytes
+    
+    master_key = _bundle_field('master_key')
+    encrypted_master_key = _bundle_field('encrypted_master_key')
+    master_key_salt = _bundle_field('master_key_salt')
+    recovery_key_encrypted = _bundle_field('recovery_key_encrypted')
+    recovery_key_salt = _bundle_field('recovery_key_salt')
+    recovery_key_hash = _bundle_field('recovery_key_hash')
 
 
 class MasterKeyManager:
@@ -45,11 +89,10 @@ class MasterKeyManager:
         """
         # 生成 120 bits 的随机数据
         random_bytes = os.urandom(15)
-        # Base32 编码（不含填充）
-        import base64
-        recovery_key = base64.b32encode(random_bytes).decode('ascii').rstrip('=')
-        # 分组显示
-        return '-'.join([recovery_key[i:i+4] for i in range(0, len(recovery_key), 4)])
+        # Base32 编码（15 字节恰好编码为 24 个字符，无填充）
+        s = base64.b32encode(random_bytes).decode('ascii')
+        # 分组显示（长度固定，直接按位置切片）
+        return f"{s[0:4]}-{s[4:8]}-{s[8:12]}-{s[12:16]}-{s[16:20]}-{s[20:24]}"
     
     @classmethod
     def create_master_key_bundle(cls, password: str) -> Tuple[MasterKeyBundle, str]:
@@ -62,36 +105,54 @@ class MasterKeyManager:
         Returns:
             (主密钥包, 恢复密钥明文)
         """
+        # 所有输出直接写入同一块缓冲区
+        buf = bytearray(_BUNDLE_SIZE)
+        view = memoryview(buf)
+        
+        def put(name: str, data: bytes):
+            sl = _BUNDLE_SLICES[name]
+            if len(data) != sl.stop - sl.start:
+                raise ValueError(f"主密钥包字段长度不匹配: {name}")
+            view[sl] = data
+        
+        def put_encrypted(name: str, cipher: AESCipher, plaintext: bytes):
+            sl = _BUNDLE_SLICES[name]
+            if cipher.encrypt_cbc_into(plaintext, view[sl]) != sl.stop - sl.start:
+                raise ValueError(f"主密钥包字段长度不匹配: {name}")
+        
         # 生成主密钥
         master_key = cls.generate_master_key()
+        put('master_key', master_key)
         
-        # 使用密码加密主密钥
-        password_salt = KeyDerivation.generate_salt()
-        password_derived = KeyDerivation.derive_key(password, password_salt)
-        cipher = AESCipher(password_derived)
-        encrypted_master_key, iv = cipher.encrypt_cbc(master_key)
-        encrypted_master_key = iv + encrypted_master_key  # IV 放在密文前
-        
-        # 生成恢复密钥并加密主密钥
+        # 生成恢复密钥
         recovery_key = cls.generate_recovery_key()
-        recovery_key_normalized = recovery_key.replace('-', '').upper()
+        recovery_key_normalized = recovery_key.translate(_RECOVERY_KEY_TABLE)
+        
+        # 并行派生密码密钥和恢复密钥
+        password_salt = KeyDerivation.generate_salt()
         recovery_salt = KeyDerivation.generate_salt()
-        recovery_derived = KeyDerivation.derive_key(recovery_key_normalized, recovery_salt)
-        recovery_cipher = AESCipher(recovery_derived)
-        recovery_encrypted, recovery_iv = recovery_cipher.encrypt_cbc(master_key)
-        recovery_encrypted = recovery_iv + recovery_encrypted
+        password_future = _kdf_executor.submit(
+            KeyDerivation.derive_key, password, password_salt
+        )
+        recovery_future = _kdf_executor.submit(
+            KeyDerivation.derive_key, recovery_key_normalized, recovery_salt
+        )
+        put('master_key_salt', password_salt)
+        put('recovery_key_salt', recovery_salt)
         
         # 恢复密钥哈希（用于验证）
-        recovery_hash = hashlib.sha256(recovery_key_normalized.encode()).digest()
-        
-        bundle = MasterKeyBundle(
-            master_key=master_key,
-            encrypted_master_key=encrypted_master_key,
-            master_key_salt=password_salt,
-            recovery_key_encrypted=recovery_encrypted,
-            recovery_key_salt=recovery_salt,
-            recovery_key_hash=recovery_hash
-        )
+        put('recovery_key_hash', hashlib.sha256(recovery_key_normalized.encode()).digest())
+        
+        # 使用密码加密主密钥（IV 放在密文前，直接写入缓冲区）
+        cipher = AESCipher(password_future.result())
+        put_encrypted('encrypted_master_key', cipher, master_key)
+        
+        # 使用恢复密钥加密主密钥
+        recovery_cipher = AESCipher(recovery_future.result())
+        put_encrypted('recovery_key_encrypted', recovery_cipher, master_key)
+        
+        view.release()
+        bundle = MasterKeyBundle(blob=bytes(buf))
         
         return bundle, recovery_key
     
@@ -112,9 +173,11 @@ class MasterKeyManager:
         try:
             password_derived = KeyDerivation.derive_key(password, salt)
             cipher = AESCipher(password_derived)
-            iv = encrypted_master_key[:16]
-            ciphertext = encrypted_master_key[16:]
-            return cipher.decrypt_cbc(ciphertext, iv)
+            # 切片使用 memoryview，不复制密文
+            data = memoryview(encrypted_master_key)
+            iv = data[:16]
+            ciphertext = data[16:]
+            return cipher.decrypt_cbc_key(ciphertext, iv)
         except Exception:
             return None
     
@@ -133,12 +196,14 @@ class MasterKeyManager:
             主密钥明文，失败返回 None
         """
         try:
-            recovery_normalized = recovery_key.replace('-', '').replace(' ', '').upper()
+            recovery_normalized = recovery_key.translate(_RECOVERY_KEY_TABLE)
             recovery_derived = KeyDerivation.derive_key(recovery_normalized, salt)
             cipher = AESCipher(recovery_derived)
-            iv = recovery_encrypted[:16]
-            ciphertext = recovery_encrypted[16:]
-            return cipher.decrypt_cbc(ciphertext, iv)
+            # 切片使用 memoryview，不复制密文
+            data = memoryview(recovery_encrypted)
+            iv = data[:16]
+            ciphertext = data[16:]
+            return cipher.decrypt_cbc_key(ciphertext, iv)
         except Exception:
             return None
     
@@ -158,7 +223,7 @@ class MasterKeyManager:
         new_salt = KeyDerivation.generate_salt()
         password_derived = KeyDerivation.derive_key(new_password, new_salt)
         cipher = AESCipher(password_derived)
-        encrypted, iv = cipher.encrypt_cbc(master_key)
+        encrypted, iv = cipher.encrypt_cbc_key(master_key)
         return iv + encrypted, new_salt
     
     @classmethod
@@ -173,7 +238,7 @@ class MasterKeyManager:
         Returns:
             是否匹配
         """
-        recovery_normalized = recovery_key.replace('-', '').replace(' ', '').upper()
+        recovery_normalized = recovery_key.translate(_RECOVERY_KEY_TABLE)
         computed_hash = hashlib.sha256(recovery_normalized.encode()).digest()
         return secrets.compare_digest(computed_hash, stored_hash)
 
@@ -182,7 +247,7 @@ class UserKeyManager:
     """用户密钥管理器"""
     
     @staticmethod
-    def generate_user_keypair(master_key: bytes) -> Tuple[bytes, bytes, bytes, bytes]:
+    def generate_user_keypair(master_key: bytes) -> Tuple[bytes, bytes]:
         """
         生成用户 RSA 密钥对
         
@@ -190,7 +255,7 @@ class UserKeyManager:
             master_key: 主密钥（用于加密私钥）
             
         Returns:
-            (公钥, 加密的私钥, 私钥盐值, 私钥IV)
+            (公钥, 加密的私钥（IV + 密文）)
         """
         # 生成 RSA 密钥对
         private_key, public_key = RSACipher.generate_keypair()
@@ -199,7 +264,7 @@ class UserKeyManager:
         cipher = AESCipher(master_key)
         encrypted_private_key, iv = cipher.encrypt_cbc(private_key)
         
-        return public_key, iv + encrypted_private_key, b'', iv
+        return public_key, iv + encrypted_private_key
     
     @staticmethod
     def decrypt_private_key(encrypted_private_key: bytes, 
@@ -216,8 +281,10 @@ class UserKeyManager:
         """
         try:
             cipher = AESCipher(master_key)
-            iv = encrypted_private_key[:16]
-            ciphertext = encrypted_private_key[16:]
+            # 切片使用 memoryview，不复制密文
+            data = memoryview(encrypted_private_key)
+            iv = data[:16]
+            ciphertext = data[16:]
             return cipher.decrypt_cbc(ciphertext, iv)
         except Exception:
             return None
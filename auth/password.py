@@ -4,9 +4,25 @@
 """
 
 import bcrypt
+import binascii
 import hashlib
+import hmac
+import os
 import re
-from typing import Tuple
+import time
+from collections import OrderedDict
+from threading import Lock
+from typing import Optional, Tuple, Union
+
+
+# 密码强度检查使用的预编译正则
+_RE_DIGIT = re.compile(r'\d')
+_RE_ALPHA = re.compile(r'[a-zA-Z]')
+_RE_LOWER = re.compile(r'[a-z]')
+_RE_UPPER = re.compile(r'[A-Z]')
+_RE_SPECIAL = re.compile(r'[!@#$%^&*(),.?":{}|<>]')
+# 旧账户 bcrypt 哈希的前缀与代价因子
+_RE_BCRYPT = re.compile(rb'\$2[abxy]\$(\d\d)\$')
 
 
 class PasswordManager:
@@ -14,6 +30,25 @@ class PasswordManager:
     
     MIN_PASSWORD_LENGTH = 8
     
+    # scrypt 参数：内存占用 128 * r * N = 64 MiB，使 GPU/ASIC 批量猜测的成本远高于 bcrypt
+    # 存储格式: $scrypt$ln=<log2 N>,r=<r>,p=<p>$<base64 盐>$<base64 哈希>
+    SCRYPT_LOG_N = 16
+    SCRYPT_R = 8
+    SCRYPT_P = 1
+    SCRYPT_SALT_SIZE = 16
+    SCRYPT_HASH_SIZE = 32
+    SCRYPT_PREFIX = b'$scrypt$'
+    SCRYPT_PARAMS = b'ln=%d,r=%d,p=%d' % (SCRYPT_LOG_N, SCRYPT_R, SCRYPT_P)
+    # 哈希由客户端生成后上传，参数决定服务端验证开销，只接受固定参数与有限的 bcrypt 代价
+    BCRYPT_MAX_ROUNDS = 12
+    
+    # 验证结果缓存：仅缓存成功结果，键为 SHA-256(预哈希 + 存储的哈希)
+    # TTL 是安全与性能的权衡：越长重复登录越快，但缓存指纹在内存中停留越久
+    VERIFY_CACHE_TTL = 30       # 秒
+    VERIFY_CACHE_SIZE = 10000
+    _verify_cache: 'OrderedDict[bytes, float]' = OrderedDict()
+    _verify_lock = Lock()
+    
     @staticmethod
     def prehash_password(password: str) -> str:
         """
@@ -29,35 +64,141 @@ class PasswordManager:
         return hashlib.sha256(password.encode('utf-8')).hexdigest()
     
     @staticmethod
-    def hash_password(password: str) -> bytes:
+    def prehash_password_bytes(password: str) -> bytes:
+        """
+        预哈希密码，直接返回 ASCII 十六进制字节
+        与 prehash_password(password).encode() 相同，但不经过中间字符串，
+        可直接交给 hash_password / verify_password
+        
+        Args:
+            password: 明文密码
+            
+        Returns:
+            SHA-256 哈希的十六进制字节串
+        """
+        return binascii.hexlify(hashlib.sha256(password.encode('utf-8')).digest())
+    
+    @staticmethod
+    def _scrypt(password: bytes, salt: bytes, log_n: int, r: int, p: int) -> bytes:
+        """计算 scrypt 哈希（OpenSSL 实现，会释放 GIL）"""
+        n = 1 << log_n
+        return hashlib.scrypt(
+            password, salt=salt, n=n, r=r, p=p,
+            maxmem=2 * 128 * r * n,
+            dklen=PasswordManager.SCRYPT_HASH_SIZE
+        )
+    
+    @staticmethod
+    def hash_password(password: Union[str, bytes]) -> bytes:
         """
         哈希密码（服务端存储用）
-        对已经过 SHA-256 预哈希的密码再进行 bcrypt 哈希
+        对已经过 SHA-256 预哈希的密码再进行 scrypt 哈希
         
         Args:
-            password: 预哈希后的密码（SHA-256 hex）
+            password: 预哈希后的密码（SHA-256 hex，str 或 bytes）
             
         Returns:
-            bcrypt 哈希值
+            scrypt 编码哈希值
         """
-        return bcrypt.hashpw(password.encode('utf-8'), bcrypt.gensalt(rounds=12))
+        if isinstance(password, str):
+            password = password.encode('utf-8')
+        pm = PasswordManager
+        salt = os.urandom(pm.SCRYPT_SALT_SIZE)
+        digest = pm._scrypt(password, salt, pm.SCRYPT_LOG_N, pm.SCRYPT_R, pm.SCRYPT_P)
+        return b'%s%s$%s$%s' % (
+            pm.SCRYPT_PREFIX, pm.SCRYPT_PARAMS,
+            binascii.b2a_base64(salt, newline=False),
+            binascii.b2a_base64(digest, newline=False)
+        )
     
     @staticmethod
-    def verify_password(prehashed: str, stored_hash: bytes) -> bool:
+    def _parse_scrypt(stored_hash: bytes) -> Optional[Tuple[bytes, bytes]]:
+        """解析 scrypt 编码哈希，参数不是 SCRYPT_PARAMS 或格式错误时返回 None"""
+        pm = PasswordManager
+        try:
+            params, salt, digest = stored_hash[len(pm.SCRYPT_PREFIX):].split(b'$')
+            salt = binascii.a2b_base64(salt)
+            digest = binascii.a2b_base64(digest)
+        except ValueError:
+            return None
+        if (params != pm.SCRYPT_PARAMS or len(salt) != pm.SCRYPT_SALT_SIZE
+                or len(digest) != pm.SCRYPT_HASH_SIZE):
+            return None
+        return salt, digest
+    
+    @staticmethod
+    def is_acceptable_hash(stored_hash: bytes) -> bool:
+        """
+        检查客户端上传的密码哈希能否存储（注册、重置密码时调用）
+        
+        Args:
+            stored_hash: 客户端生成的哈希值
+            
+        Returns:
+            是否为固定参数的 scrypt 哈希，或代价不超过 BCRYPT_MAX_ROUNDS 的 bcrypt 哈希
+        """
+        if not isinstance(stored_hash, bytes):
+            return False
+        if stored_hash.startswith(PasswordManager.SCRYPT_PREFIX):
+            return PasswordManager._parse_scrypt(stored_hash) is not None
+        match = _RE_BCRYPT.match(stored_hash)
+        return (match is not None and len(stored_hash) == 60
+                and int(match.group(1)) <= PasswordManager.BCRYPT_MAX_ROUNDS)
+    
+    @staticmethod
+    def _check_hash(prehashed: bytes, stored_hash: bytes) -> bool:
+        """按存储格式校验哈希（scrypt，或旧账户的 bcrypt），参数不可接受时不做计算"""
+        pm = PasswordManager
+        if not pm.is_acceptable_hash(stored_hash):
+            return False
+        if not stored_hash.startswith(pm.SCRYPT_PREFIX):
+            return bcrypt.checkpw(prehashed, stored_hash)
+        
+        salt, digest = pm._parse_scrypt(stored_hash)
+        computed = pm._scrypt(prehashed, salt, pm.SCRYPT_LOG_N, pm.SCRYPT_R, pm.SCRYPT_P)
+        return hmac.compare_digest(computed, digest)
+    
+    @staticmethod
+    def verify_password(prehashed: Union[str, bytes], stored_hash: bytes) -> bool:
         """
         验证密码
         
         Args:
-            prehashed: 预哈希后的密码（SHA-256 hex）
-            stored_hash: 存储的 bcrypt 哈希值
+            prehashed: 预哈希后的密码（SHA-256 hex，str 或 bytes）
+            stored_hash: 存储的哈希值（scrypt 或 bcrypt）
             
         Returns:
             验证是否通过
         """
         try:
-            return bcrypt.checkpw(prehashed.encode('utf-8'), stored_hash)
+            if isinstance(prehashed, str):
+                prehashed = prehashed.encode('utf-8')
+            key = hashlib.sha256(prehashed + stored_hash).digest()
         except Exception:
             return False
+        
+        now = time.time()
+        cache = PasswordManager._verify_cache
+        with PasswordManager._verify_lock:
+            expires_at = cache.get(key)
+            if expires_at is not None:
+                if expires_at >= now:
+                    return True
+                del cache[key]
+        
+        try:
+            valid = PasswordManager._check_hash(prehashed, bytes(stored_hash))
+        except Exception:
+            return False
+        
+        # 不缓存失败结果，避免放大暴力破解
+        if valid:
+            with PasswordManager._verify_lock:
+                cache[key] = now + PasswordManager.VERIFY_CACHE_TTL
+                cache.move_to_end(key)
+                while len(cache) > PasswordManager.VERIFY_CACHE_SIZE:
+                    cache.popitem(last=False)
+        return valid
     
     @staticmethod
     def validate_password(password: str) -> Tuple[bool, str]:
@@ -74,11 +215,11 @@ class PasswordManager:
             return False, f"密码长度至少 {PasswordManager.MIN_PASSWORD_LENGTH} 位"
         
         # 检查是否包含数字
-        if not re.search(r'\d', password):
+        if not _RE_DIGIT.search(password):
             return False, "密码必须包含至少一个数字"
         
         # 检查是否包含字母
-        if not re.search(r'[a-zA-Z]', password):
+        if not _RE_ALPHA.search(password):
             return False, "密码必须包含至少一个字母"
         
         return True, ""
@@ -105,19 +246,19 @@ class PasswordManager:
             score += 10
         
         # 包含小写字母
-        if re.search(r'[a-z]', password):
+        if _RE_LOWER.search(password):
             score += 15
         
         # 包含大写字母
-        if re.search(r'[A-Z]', password):
+        if _RE_UPPER.search(password):
             score += 15
         
         # 包含数字
-        if re.search(r'\d', password):
+        if _RE_DIGIT.search(password):
             score += 15
         
         # 包含特殊字符
-        if re.search(r'[!@#$%^&*(),.?":{}|<>]', password):
+        if _RE_SPECIAL.search(password):
             score += 15
         
         return min(score, 100)
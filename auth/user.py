@@ -3,12 +3,12 @@
 定义用户数据结构
 """
 
-from dataclasses import dataclass, field
+from dataclasses import dataclass, field, fields
 from typing import Optional
 from datetime import datetime
 
 
-@dataclass
+@dataclass(slots=True)
 class User:
     """用户模型"""
     
@@ -20,7 +20,6 @@ class User:
     # RSA 密钥对
     public_key: bytes = b""              # 公钥（明文存储）
     encrypted_private_key: bytes = b""    # 私钥（用主密钥加密后存储）
-    private_key_salt: bytes = b""         # 私钥加密盐值
     
     # 主密钥（用于加密用户数据）
     encrypted_master_key: bytes = b""     # 主密钥（用密码派生密钥加密）
@@ -38,23 +37,29 @@ class User:
     
     def to_dict(self) -> dict:
         """转换为字典（用于数据库存储）"""
-        return {
-            'id': self.id,
-            'username': self.username,
-            'email': self.email,
-            'password_hash': self.password_hash,
-            'public_key': self.public_key,
-            'encrypted_private_key': self.encrypted_private_key,
-            'private_key_salt': self.private_key_salt,
-            'encrypted_master_key': self.encrypted_master_key,
-            'master_key_salt': self.master_key_salt,
-            'recovery_key_encrypted': self.recovery_key_encrypted,
-            'recovery_key_salt': self.recovery_key_salt,
-            'recovery_key_hash': self.recovery_key_hash,
-            'is_active': self.is_active,
-            'created_at': self.created_at.isoformat() if self.created_at else None,
-            'last_login': self.last_login.isoformat() if self.last_login else None
-        }
+        d = {name: getattr(self, name) for name in _USER_FIELDS}
+        d['created_at'] = self.created_at.isoformat() if self.created_at else None
+        d['last_login'] = self.last_login.isoformat() if self.last_login else None
+        return d
+    
+    @classmethod
+    def from_db_row(cls, row) -> 'User':
+        """
+        从数据库行创建用户对象（登录等热路径使用）
+        
+        Args:
+            row: 按字段声明顺序排列的列值序列
+        """
+        user = cls.__new__(cls)
+        (user.id, user.username, user.email, user.password_hash,
+         user.public_key, user.encrypted_private_key,
+         user.encrypted_master_key, user.master_key_salt,
+         user.recovery_key_encrypted, user.recovery_key_salt, user.recovery_key_hash,
+         is_active, created_at, last_login) = row
+        user.is_active = bool(is_active)
+        user.created_at = datetime.fromisoformat(created_at)
+        user.last_login = datetime.fromisoformat(last_login) if last_login else None
+        return user
     
     @classmethod
     def from_dict(cls, data: dict) -> 'User':
@@ -62,10 +67,11 @@ class User:
         created_at = data.get('created_at')
         last_login = data.get('last_login')
         
+        fromisoformat = datetime.fromisoformat
         if isinstance(created_at, str):
-            created_at = datetime.fromisoformat(created_at)
+            created_at = fromisoformat(created_at)
         if isinstance(last_login, str):
-            last_login = datetime.fromisoformat(last_login)
+            last_login = fromisoformat(last_login)
         
         return cls(
             id=data.get('id'),
@@ -74,7 +80,6 @@ class User:
             password_hash=data.get('password_hash', b''),
             public_key=data.get('public_key', b''),
             encrypted_private_key=data.get('encrypted_private_key', b''),
-            private_key_salt=data.get('private_key_salt', b''),
             encrypted_master_key=data.get('encrypted_master_key', b''),
             master_key_salt=data.get('master_key_salt', b''),
             recovery_key_encrypted=data.get('recovery_key_encrypted', b''),
@@ -86,7 +91,11 @@ class User:
         )
 
 
-@dataclass
+# User 字段名（按声明顺序），供 to_dict 复用
+_USER_FIELDS = tuple(f.name for f in fields(User))
+
+
+@dataclass(slots=True)
 class UserCredentials:
     """用户凭据（登录时使用）"""
     username: str = ""
@@ -96,7 +105,7 @@ class UserCredentials:
     login_type: str = "password"  # "password" or "email"
 
 
-@dataclass
+@dataclass(slots=True)
 class RegistrationData:
     """注册数据"""
     username: str
@@ -106,7 +115,6 @@ class RegistrationData:
     # 客户端生成的密钥数据
     public_key: bytes = b""
     encrypted_private_key: bytes = b""
-    private_key_salt: bytes = b""
     encrypted_master_key: bytes = b""
     master_key_salt: bytes = b""
     recovery_key_encrypted: bytes = b""
@@ -1,58 +1,131 @@
-import configparser
+"""
+客户端配置模块
+提供全局唯一的客户端配置实例
+"""
+
+import atexit
 import os
+import threading
 from dataclasses import dataclass, field
-from typing import List
+from typing import Dict, List, Optional
 
 CONFIG_FILE = "client.ini"
-
-@dataclass
+SAVE_DELAY = 1.0  # 延迟写盘时间（秒），合并短时间内的多次保存
+
+
+def _parse_ini(text: str) -> Dict[str, Dict[str, str]]:
+    """解析简单的 ini 文本（[section] 与 key = value），兼容 configparser 的输出格式."""
+    sections: Dict[str, Dict[str, str]] = {}
+    current: Optional[Dict[str, str]] = None
+    for line in text.splitlines():
+        line = line.strip()
+        if not line or line[0] in "#;":
+            continue
+        if line[0] == "[" and line[-1] == "]":
+            current = sections.setdefault(line[1:-1].strip(), {})
+        elif current is not None:
+            key, sep, value = line.partition("=")
+            if sep:
+                current[key.strip().lower()] = value.strip()
+    return sections
+
+
+def _format_ini(sections: Dict[str, Dict[str, str]]) -> str:
+    """将配置序列化为与 configparser 相同布局的 ini 文本."""
+    parts = []
+    for name, values in sections.items():
+        parts.append(f"[{name}]\n")
+        for key, value in values.items():
+            parts.append(f"{key} = {value}\n")
+        parts.append("\n")
+    return "".join(parts)
+
+@dataclass(slots=True)
 class ClientConfig:
-    """客户端配置管理，使用 configparser."""
+    """客户端配置管理，读写 client.ini."""
     host: str = "localhost"
     port: int = 9000
     recent_hosts: List[str] = field(default_factory=list)
     last_username: str = ""
 
-    def load(self):
-        """从 client.ini 加载配置."""
-        config = configparser.ConfigParser()
-        if os.path.exists(CONFIG_FILE):
-            config.read(CONFIG_FILE, encoding="utf-8")
-
-            # 网络设置
-            if "Network" in config:
-                self.host = config["Network"].get("host", "localhost")
-                self.port = config["Network"].getint("port", 9000)
+    _dirty: bool = field(default=False, init=False, repr=False, compare=False)
+    _save_timer: Optional[threading.Timer] = field(default=None, init=False, repr=False, compare=False)
+    _lock: threading.Lock = field(default_factory=threading.Lock, init=False, repr=False, compare=False)
 
-            # 历史记录设置
-            if "History" in config:
-                recent_str = config["History"].get("recent", "")
-                if recent_str:
-                    self.recent_hosts = [h.strip() for h in recent_str.split(",") if h.strip()]
+    def __post_init__(self):
+        # 退出时写入尚未落盘的修改
+        atexit.register(self.flush)
 
-            # 用户设置
-            if "User" in config:
-                self.last_username = config["User"].get("last_username", "")
+    def load(self):
+        """从 client.ini 加载配置."""
+        if not os.path.exists(CONFIG_FILE):
+            return
+        with open(CONFIG_FILE, "r", encoding="utf-8") as f:
+            config = _parse_ini(f.read())
+
+        # 网络设置
+        network = config.get("Network")
+        if network is not None:
+            self.host = network.get("host", "localhost")
+            port = network.get("port")
+            self.port = int(port) if port else 9000
+
+        # 历史记录设置
+        recent_str = config.get("History", {}).get("recent", "")
+        if recent_str:
+            self.recent_hosts = [h.strip() for h in recent_str.split(",") if h.strip()]
+
+        # 用户设置
+        user = config.get("User")
+        if user is not None:
+            self.last_username = user.get("last_username", "")
 
     def save(self):
-        """保存配置到 client.ini."""
-        config = configparser.ConfigParser()
-
-        config["Network"] = {
-            "host": self.host,
-            "port": str(self.port)
-        }
-
-        config["History"] = {
-            "recent": ", ".join(self.recent_hosts)
-        }
-
-        config["User"] = {
-            "last_username": self.last_username
-        }
-
-        with open(CONFIG_FILE, "w", encoding="utf-8") as configfile:
-            config.write(configfile)
+        """标记配置已修改，延迟 SAVE_DELAY 秒后写入 client.ini."""
+        with self._lock:
+            self._dirty = True
+            if self._save_timer is not None:
+                self._save_timer.cancel()
+            self._save_timer = threading.Timer(SAVE_DELAY, self.flush)
+            self._save_timer.daemon = True
+            self._save_timer.start()
+
+    def flush(self) -> bool:
+        """立即写入尚未保存的修改，写入失败时保留修改标记并返回 False."""
+        with self._lock:
+            if self._save_timer is not None:
+                self._save_timer.cancel()
+                self._save_timer = None
+            if not self._dirty:
+                return True
+            try:
+                self._write()
+            except OSError as e:
+                # 可能在定时器线程中执行，异常无人接收，在此报告
+                print(f"[Client] 保存配置失败: {e}")
+                return False
+            self._dirty = False
+            return True
+
+    def _write(self):
+        """原子写入 client.ini（先写临时文件再替换）."""
+        text = _format_ini({
+            "Network": {
+                "host": self.host,
+                "port": str(self.port)
+            },
+            "History": {
+                "recent": ", ".join(self.recent_hosts)
+            },
+            "User": {
+                "last_username": self.last_username
+            }
+        })
+
+        tmp_path = CONFIG_FILE + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as configfile:
+            configfile.write(text)
+        os.replace(tmp_path, CONFIG_FILE)
 
     def add_to_history(self, host: str, port: int):
         """将一个 host:port 添加到历史记录，仅保留最新的 5 个不重复条目."""
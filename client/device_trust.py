@@ -7,12 +7,55 @@
 import os
 import json
 import uuid
-from typing import Optional, Dict, List
+import binascii
+from typing import Optional, Dict, List, Tuple
 from pathlib import Path
 from dataclasses import dataclass, asdict
 
 from crypto.aes import AESCipher
 
+try:
+    import orjson  # 可选依赖：更快的 JSON 编解码
+except ImportError:
+    orjson = None
+
+try:
+    import keyring  # 可选依赖：系统密钥环（Windows 凭据管理器 / macOS 钥匙串 / libsecret）
+except ImportError:
+    keyring = None
+
+
+# 系统密钥环中的服务名
+KEYRING_SERVICE = "SecureNetDisk"
+
+# 密钥字段的存储编码（旧版本为 hex）
+KEY_ENCODING = "base64"
+_KEY_FIELDS = ("device_key", "encrypted_master_key", "encrypted_private_key", "public_key")
+
+
+def _json_loads(raw: bytes) -> dict:
+    """解析 device.json 内容（优先使用 orjson）"""
+    if orjson is not None:
+        return orjson.loads(raw)
+    return json.loads(raw)
+
+
+def _json_dumps(data: dict) -> bytes:
+    """序列化 device.json 内容（优先使用 orjson）"""
+    if orjson is not None:
+        return orjson.dumps(data)
+    return json.dumps(data, separators=(',', ':')).encode('ascii')
+
+
+def _encode(data: bytes) -> str:
+    """二进制 -> base64 字符串"""
+    return binascii.b2a_base64(data, newline=False).decode('ascii')
+
+
+def _decode(text: str) -> bytes:
+    """base64 字符串 -> 二进制"""
+    return binascii.a2b_base64(text)
+
 
 @dataclass
 class UserDeviceInfo:
@@ -20,10 +63,13 @@ class UserDeviceInfo:
     username: str
     email: str
     trusted: bool
-    device_key: str  # hex encoded
-    encrypted_master_key: str  # hex encoded
-    encrypted_private_key: str  # hex encoded
-    public_key: str  # hex encoded
+    device_key: str  # base64 encoded
+    public_key: str  # base64 encoded
+    # IV + CBC(主密钥长度(4) + 主密钥 + 私钥)，base64 encoded
+    encrypted_keys: str = ""
+    encrypted_master_key: str = ""  # 旧格式，base64 encoded
+    encrypted_private_key: str = ""  # 旧格式，base64 encoded
+    key_in_keyring: bool = False  # device_key 是否存放在系统密钥环中（此时 device_key 为空）
 
 
 class DeviceTrustManager:
@@ -35,6 +81,14 @@ class DeviceTrustManager:
     def __init__(self):
         self._ensure_storage_dir()
         self._device_id: Optional[str] = None
+        # device.json 的内存缓存，按文件修改时间判断是否失效
+        # 修改直接作用于缓存并置脏标记，由 flush() 统一写盘
+        self._cache: Optional[dict] = None
+        self._mtime: Optional[int] = None
+        self._dirty = False
+        # 已解析的单用户记录: email -> (原始字典, UserDeviceInfo)
+        # 原始字典被替换（重新加载）时自动失效，原地修改时由修改方按邮箱失效
+        self._user_info_cache: Dict[str, Tuple[dict, UserDeviceInfo]] = {}
     
     def _ensure_storage_dir(self):
         """确保存储目录存在"""
@@ -44,45 +98,126 @@ class DeviceTrustManager:
     def device_file_path(self) -> Path:
         return self.STORAGE_DIR / self.DEVICE_FILE
     
-    def _load_all_data(self) -> dict:
-        """加载所有设备数据"""
+    def invalidate(self):
+        """丢弃内存缓存（包括未写盘的修改），下次访问时重新读取 device.json"""
+        self._cache = None
+        self._mtime = None
+        self._dirty = False
+        self._user_info_cache.clear()
+    
+    def _load_existing(self) -> Optional[dict]:
+        """
+        加载已有的设备数据，文件不存在或无法解析时返回 None
+        返回内存缓存本身，修改后需置 _dirty 并调用 flush()
+        """
+        if self._dirty:
+            return self._cache
+        
         try:
-            if not self.device_file_path.exists():
-                return {"device_id": str(uuid.uuid4()), "users": {}}
-            
-            with open(self.device_file_path, 'r', encoding='utf-8') as f:
-                data = json.load(f)
+            mtime = self.device_file_path.stat().st_mtime_ns
+        except FileNotFoundError:
+            self._cache = None
+            self._mtime = None
+            return None
+        
+        if self._cache is not None and mtime == self._mtime:
+            return self._cache
+        
+        try:
+            data = _json_loads(self.device_file_path.read_bytes())
             
             # 兼容旧格式（单用户）
             if "users" not in data:
-                # 迁移旧数据
-                if "username" in data:
-                    old_user = UserDeviceInfo(
-                        username=data.get("username", ""),
-                        email=data.get("email", ""),
-                        trusted=data.get("trusted", False),
-                        device_key=data.get("device_key", ""),
-                        encrypted_master_key=data.get("encrypted_master_key", ""),
-                        encrypted_private_key=data.get("encrypted_private_key", ""),
-                        public_key=data.get("public_key", "")
-                    )
-                    return {
-                        "device_id": data.get("device_id", str(uuid.uuid4())),
-                        "users": {old_user.email: asdict(old_user)}
-                    }
-                return {"device_id": str(uuid.uuid4()), "users": {}}
+                data = self._migrate_single_user(data)
             
-            return data
+            # 兼容旧编码（hex），转换为 base64，下次保存时写回
+            if data.get("encoding") != KEY_ENCODING:
+                for user_info in data["users"].values():
+                    for key in _KEY_FIELDS:
+                        user_info[key] = _encode(bytes.fromhex(user_info.get(key, "")))
+                data["encoding"] = KEY_ENCODING
         except Exception as e:
             print(f"[DeviceTrust] 加载设备信息失败: {e}")
+            return None
+        
+        self._cache = data
+        self._mtime = mtime
+        return data
+    
+    def _load_or_init(self) -> dict:
+        """加载设备数据，不存在时初始化新的文档（仅在即将写入时调用）"""
+        data = self._load_existing()
+        if data is None:
+            data = {"device_id": str(uuid.uuid4()), "encoding": KEY_ENCODING, "users": {}}
+            self._cache = data
+            self._mtime = None
+        return data
+    
+    @staticmethod
+    def _migrate_single_user(data: dict) -> dict:
+        """迁移旧的单用户格式"""
+        if "username" not in data:
             return {"device_id": str(uuid.uuid4()), "users": {}}
+        
+        old_user = UserDeviceInfo(
+            username=data.get("username", ""),
+            email=data.get("email", ""),
+            trusted=data.get("trusted", False),
+            device_key=data.get("device_key", ""),
+            encrypted_master_key=data.get("encrypted_master_key", ""),
+            encrypted_private_key=data.get("encrypted_private_key", ""),
+            public_key=data.get("public_key", "")
+        )
+        return {
+            "device_id": data.get("device_id", str(uuid.uuid4())),
+            "users": {old_user.email: asdict(old_user)}
+        }
     
-    def _save_all_data(self, data: dict):
-        """保存所有设备数据"""
+    @staticmethod
+    def _store_device_key(email: str, device_key: bytes) -> bool:
+        """将设备密钥存入系统密钥环，不可用时返回 False"""
+        if keyring is None:
+            return False
         try:
-            with open(self.device_file_path, 'w', encoding='utf-8') as f:
-                json.dump(data, f, indent=2, ensure_ascii=False)
+            keyring.set_password(KEYRING_SERVICE, email, _encode(device_key))
+            return True
         except Exception as e:
+            print(f"[DeviceTrust] 系统密钥环不可用，设备密钥保存到本地文件: {e}")
+            return False
+    
+    @staticmethod
+    def _load_device_key(info: UserDeviceInfo) -> Optional[bytes]:
+        """读取设备密钥（系统密钥环或本地文件）"""
+        if not info.key_in_keyring:
+            return _decode(info.device_key)
+        if keyring is None:
+            return None
+        stored = keyring.get_password(KEYRING_SERVICE, info.email)
+        return _decode(stored) if stored else None
+    
+    @staticmethod
+    def _delete_device_key(user_data: dict):
+        """从系统密钥环删除设备密钥"""
+        if keyring is None or not user_data.get("key_in_keyring"):
+            return
+        try:
+            keyring.delete_password(KEYRING_SERVICE, user_data["email"])
+        except Exception:
+            pass
+    
+    def flush(self):
+        """将未保存的修改原子写入 device.json（先写临时文件再替换）"""
+        if not self._dirty:
+            return
+        try:
+            tmp_path = self.device_file_path.with_name(self.DEVICE_FILE + ".tmp")
+            with open(tmp_path, 'wb') as f:
+                f.write(_json_dumps(self._cache))
+            os.replace(tmp_path, self.device_file_path)
+            self._dirty = False
+            self._mtime = self.device_file_path.stat().st_mtime_ns
+        except Exception as e:
+            self.invalidate()
             print(f"[DeviceTrust] 保存设备信息失败: {e}")
     
     def has_trusted_device(self, email: str = None) -> bool:
@@ -92,7 +227,9 @@ class DeviceTrustManager:
         Args:
             email: 如果指定，检查该邮箱是否信任此设备
         """
-        data = self._load_all_data()
+        data = self._load_existing()
+        if data is None:
+            return False
         users = data.get("users", {})
         
         if email:
@@ -104,19 +241,29 @@ class DeviceTrustManager:
     
     def get_trusted_emails(self) -> List[str]:
         """获取所有信任此设备的用户邮箱列表"""
-        data = self._load_all_data()
+        data = self._load_existing()
+        if data is None:
+            return []
         users = data.get("users", {})
         return [email for email, info in users.items() if info.get("trusted", False)]
     
     def get_user_info_by_email(self, email: str) -> Optional[UserDeviceInfo]:
-        """通过邮箱获取用户设备信息"""
-        data = self._load_all_data()
-        users = data.get("users", {})
-        user_data = users.get(email)
+        """通过邮箱获取用户设备信息（按用户缓存解析结果）"""
+        data = self._load_existing()
+        if data is None:
+            return None
+        user_data = data.get("users", {}).get(email)
+        
+        if not user_data:
+            return None
         
-        if user_data:
-            return UserDeviceInfo(**user_data)
-        return None
+        cached = self._user_info_cache.get(email)
+        if cached is not None and cached[0] is user_data:
+            return cached[1]
+        
+        info = UserDeviceInfo(**user_data)
+        self._user_info_cache[email] = (user_data, info)
+        return info
     
     def trust_device(self, username: str, email: str,
                      master_key: bytes, private_key: bytes, 
@@ -138,30 +285,31 @@ class DeviceTrustManager:
             # 生成设备密钥
             device_key = os.urandom(32)
             
-            # 使用设备密钥加密主密钥和私钥
+            # 使用设备密钥一次性加密主密钥和私钥（长度前缀便于解密后拆分）
             cipher = AESCipher(device_key)
+            blob = len(master_key).to_bytes(4, 'big') + master_key + private_key
+            encrypted_keys, iv = cipher.encrypt_cbc(blob)
             
-            encrypted_master, iv1 = cipher.encrypt_cbc(master_key)
-            encrypted_master = iv1 + encrypted_master
-            
-            encrypted_private, iv2 = cipher.encrypt_cbc(private_key)
-            encrypted_private = iv2 + encrypted_private
+            # 设备密钥优先存入系统密钥环，避免与密文一起明文落盘
+            in_keyring = self._store_device_key(email, device_key)
             
             # 创建用户信息
             user_info = UserDeviceInfo(
                 username=username,
                 email=email,
                 trusted=True,
-                device_key=device_key.hex(),
-                encrypted_master_key=encrypted_master.hex(),
-                encrypted_private_key=encrypted_private.hex(),
-                public_key=public_key.hex()
+                device_key="" if in_keyring else _encode(device_key),
+                public_key=_encode(public_key),
+                encrypted_keys=_encode(iv + encrypted_keys),
+                key_in_keyring=in_keyring
             )
             
             # 加载现有数据并添加/更新用户
-            data = self._load_all_data()
+            data = self._load_or_init()
             data["users"][email] = asdict(user_info)
-            self._save_all_data(data)
+            self._user_info_cache.pop(email, None)
+            self._dirty = True
+            self.flush()
             
             print(f"[DeviceTrust] 用户 {username} ({email}) 已信任此设备")
             return True
@@ -185,25 +333,33 @@ class DeviceTrustManager:
             if not info or not info.trusted:
                 return None
             
-            device_key = bytes.fromhex(info.device_key)
+            device_key = self._load_device_key(info)
+            if not device_key:
+                print("[DeviceTrust] 设备密钥不存在")
+                return None
             cipher = AESCipher(device_key)
             
-            # 解密主密钥
-            encrypted_master = bytes.fromhex(info.encrypted_master_key)
-            iv1 = encrypted_master[:16]
-            master_key = cipher.decrypt_cbc(encrypted_master[16:], iv1)
-            
-            # 解密私钥
-            encrypted_private = bytes.fromhex(info.encrypted_private_key)
-            iv2 = encrypted_private[:16]
-            private_key = cipher.decrypt_cbc(encrypted_private[16:], iv2)
+            if info.encrypted_keys:
+                # 一次解密，按长度前缀拆分主密钥和私钥
+                encrypted_keys = _decode(info.encrypted_keys)
+                blob = cipher.decrypt_cbc(encrypted_keys[16:], encrypted_keys[:16])
+                master_end = 4 + int.from_bytes(blob[:4], 'big')
+                master_key = blob[4:master_end]
+                private_key = blob[master_end:]
+            else:
+                # 旧格式：主密钥和私钥分别加密
+                encrypted_master = _decode(info.encrypted_master_key)
+                master_key = cipher.decrypt_cbc(encrypted_master[16:], encrypted_master[:16])
+                
+                encrypted_private = _decode(info.encrypted_private_key)
+                private_key = cipher.decrypt_cbc(encrypted_private[16:], encrypted_private[:16])
             
             return {
                 'username': info.username,
                 'email': info.email,
                 'master_key': master_key,
                 'private_key': private_key,
-                'public_key': bytes.fromhex(info.public_key)
+                'public_key': _decode(info.public_key)
             }
             
         except Exception as e:
@@ -219,21 +375,32 @@ class DeviceTrustManager:
         """
         try:
             if email:
-                data = self._load_all_data()
+                data = self._load_existing() or {}
                 if email in data.get("users", {}):
-                    del data["users"][email]
-                    self._save_all_data(data)
+                    self._delete_device_key(data["users"].pop(email))
+                    self._user_info_cache.pop(email, None)
+                    self._dirty = True
+                    self.flush()
                     print(f"[DeviceTrust] 用户 {email} 的设备信任已清除")
             else:
+                for user_data in (self._load_existing() or {}).get("users", {}).values():
+                    self._delete_device_key(user_data)
                 if self.device_file_path.exists():
                     self.device_file_path.unlink()
+                self.invalidate()
                 print("[DeviceTrust] 所有设备信任已清除")
         except Exception as e:
             print(f"[DeviceTrust] 清除信任失败: {e}")
     
     def mark_untrusted(self, email: str):
         """标记指定用户为不信任"""
-        data = self._load_all_data()
+        data = self._load_existing() or {}
         if email in data.get("users", {}):
-            data["users"][email]["trusted"] = False
-            self._save_all_data(data)
+            user_data = data["users"][email]
+            user_data["trusted"] = False
+            # 不再信任后密钥无用，一并删除
+            self._delete_device_key(user_data)
+            user_data["key_in_keyring"] = False
+            self._user_info_cache.pop(email, None)
+            self._dirty = True
+            self.flush()
@@ -3,21 +3,61 @@
 处理文件的客户端加解密
 """
 
+import io
 import os
-from typing import Tuple, Optional
+import tempfile
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from typing import Iterator, List, Tuple, Optional, Union
 from pathlib import Path
 
+from Crypto.Cipher import AES
+from Crypto.Util.Padding import unpad
+
 from crypto.aes import AESCipher
 
 
-import tempfile
+# 流式加解密的 I/O 线程：一个预读下一块，一个写出上一块
+_io_executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix="file-io")
+
+# CTR 并行解密线程（pycryptodome 解密时释放 GIL）
+_ctr_workers = os.cpu_count() or 1
+_ctr_executor = ThreadPoolExecutor(max_workers=_ctr_workers, thread_name_prefix="ctr")
+
+
+def _as_cipher(key: Union[bytes, AESCipher]) -> AESCipher:
+    """密钥字节或已有的 AESCipher 实例 -> AESCipher（复用调用方缓存的实例）"""
+    return key if isinstance(key, AESCipher) else AESCipher(key)
+
+
+def _write_all(fd: int, data) -> None:
+    """绕过缓冲 I/O 层直接写入文件描述符，处理部分写入"""
+    view = memoryview(data)
+    while view:
+        view = view[os.write(fd, view):]
+
 
 class FileCrypto:
     """文件加密器"""
     
     CHUNK_SIZE = 64 * 1024  # 64KB
+    STREAM_CHUNK_SIZE = 4 * 1024 * 1024  # 4MB，流式加密的读写块大小
     LARGE_FILE_THRESHOLD = 100 * 1024 * 1024  # 100MB
     
+    # 加密格式版本标记
+    VERSION_CBC = 0  # version(1) + iv(16) + ciphertext（旧格式，仅解密）
+    VERSION_CTR = 1  # version(1) + nonce(8) + ciphertext
+    VERSION_GCM = 2  # version(1) + nonce(12) + tag(16) + ciphertext
+    VERSION_GCM_STREAM = 3  # version(1) + nonce(12) + ciphertext + tag(16)，边加密边发送
+    GCM_NONCE_SIZE = 12
+    GCM_TAG_SIZE = 16
+    GCM_HEADER_SIZE = 1 + GCM_NONCE_SIZE + GCM_TAG_SIZE
+    
+    # CTR 解密分块大小（必须是 16 字节的整数倍）及启用并行的最小密文大小
+    CTR_CHUNK_SIZE = 4 * 1024 * 1024  # 4MB
+    CTR_PARALLEL_THRESHOLD = 16 * 1024 * 1024  # 16MB
+    
     @staticmethod
     def generate_file_key() -> bytes:
         """生成文件密钥"""
@@ -26,7 +66,7 @@ class FileCrypto:
     @staticmethod
     def encrypt_file(file_path: Path, file_key: bytes) -> Tuple[bytes, int]:
         """
-        加密文件 (分块处理，支持大文件)
+        加密文件 (分块流式处理，支持大文件)
         
         Args:
             file_path: 文件路径
@@ -36,58 +76,98 @@ class FileCrypto:
             (加密数据, 原始大小) 元组
             对于大文件返回 (临时文件路径字符串, 原始大小)
         """
+        
         file_size = file_path.stat().st_size
         
-        # 对于小文件 (< 100MB)，使用内存加密 (CBC模式)
+        # 小文件 (< 100MB) 写入内存缓冲区，大文件直接写入临时文件描述符
+        # 返回临时文件路径而不是数据，避免内存溢出
         if file_size < FileCrypto.LARGE_FILE_THRESHOLD:
-            with open(file_path, 'rb') as f:
-                plaintext = f.read()
-            
-            cipher = AESCipher(file_key)
-            ciphertext, iv = cipher.encrypt_cbc(plaintext)
-            # 格式: version(1) + iv(16) + ciphertext
-            encrypted_data = b'\x00' + iv + ciphertext
-            del plaintext
-            return encrypted_data, file_size
+            out = io.BytesIO()
+            write = out.write
+            temp_fd = temp_path = None
+        else:
+            temp_fd, temp_path = tempfile.mkstemp(suffix='.enc')
+            write = partial(_write_all, temp_fd)
         
-        # 对于大文件 (>= 100MB)，流式加密到临时文件
-        # 返回临时文件路径而不是数据，避免内存溢出
-        import tempfile
-        import gc
-        from Crypto.Cipher import AES
+        # 统一使用流式 GCM 加密，明文不再整体读入内存
+        nonce = os.urandom(FileCrypto.GCM_NONCE_SIZE)
+        gcm_cipher = AES.new(file_key, AES.MODE_GCM, nonce=nonce)
+        tag_offset = 1 + FileCrypto.GCM_NONCE_SIZE
         
-        nonce = os.urandom(8)
-        # 创建单个 CTR 密码对象，保持计数器状态
-        ctr_cipher = AES.new(file_key, AES.MODE_CTR, nonce=nonce)
+        try:
+            try:
+                # 写入版本标记、nonce，认证标签先占位，加密完成后回填
+                write(bytes((FileCrypto.VERSION_GCM,)) + nonce + bytes(FileCrypto.GCM_TAG_SIZE))
+                
+                # 分块读取并加密（无缓冲读取，大块直接进出内核）
+                with open(file_path, 'rb', buffering=0) as f:
+                    if hasattr(os, 'posix_fadvise'):
+                        os.posix_fadvise(f.fileno(), 0, 0, os.POSIX_FADV_SEQUENTIAL)
+                    FileCrypto._pipelined_transform(f, write, gcm_cipher.encrypt,
+                                                    FileCrypto.STREAM_CHUNK_SIZE)
+                
+                tag = gcm_cipher.digest()
+                if temp_fd is None:
+                    out.seek(tag_offset)
+                    out.write(tag)
+                    return out.getvalue(), file_size
+                
+                os.lseek(temp_fd, tag_offset, os.SEEK_SET)
+                _write_all(temp_fd, tag)
+            finally:
+                if temp_fd is not None:
+                    os.close(temp_fd)
+        except BaseException:
+            if temp_path is not None:
+                os.remove(temp_path)
+            raise
         
-        # 创建临时文件
-        temp_fd, temp_path = tempfile.mkstemp(suffix='.enc')
+        # 返回临时文件路径 (字符串类型表示是文件路径)
+        return temp_path, file_size
+    
+    @staticmethod
+    def encrypted_size(file_size: int) -> int:
+        """encrypt_file_iter 输出的密文总长度"""
+        return FileCrypto.GCM_HEADER_SIZE + file_size
+    
+    @staticmethod
+    def encrypt_file_iter(file_path: Path, file_key: bytes,
+                          chunk_size: int = STREAM_CHUNK_SIZE) -> Iterator[bytes]:
+        """
+        流式加密文件（生成器），密文边生成边交给上传方，不落临时文件
+        格式为 version 3: version(1) + nonce(12) + ciphertext + tag(16)
+        头部随第一块、认证标签随最后一块输出，总长度见 encrypted_size()
         
-        with os.fdopen(temp_fd, 'wb') as temp_file:
-            # 写入版本标记和 nonce
-            temp_file.write(b'\x01')  # version 1 = CTR mode
-            temp_file.write(nonce)
-            
-            # 分块读取并加密
-            chunk_size = 1024 * 1024  # 1MB chunks
+        Args:
+            file_path: 文件路径
+            file_key: 文件密钥
+            chunk_size: 每次读取的明文大小
             
-            with open(file_path, 'rb') as f:
-                counter = 0
-                while True:
-                    chunk = f.read(chunk_size)
-                    if not chunk:
-                        break
-                    
-                    # 使用同一个 cipher 对象加密，保持计数器连续
-                    encrypted_chunk = ctr_cipher.encrypt(chunk)
-                    temp_file.write(encrypted_chunk)
-                    
-                    counter += 1
-                    if counter % 100 == 0:
-                        gc.collect()
+        Yields:
+            密文数据块
+        """
         
-        # 返回临时文件路径 (字符串类型表示是文件路径)
-        return temp_path, file_size
+        nonce = os.urandom(FileCrypto.GCM_NONCE_SIZE)
+        gcm_cipher = AES.new(file_key, AES.MODE_GCM, nonce=nonce)
+        prefix = bytes((FileCrypto.VERSION_GCM_STREAM,)) + nonce
+        
+        with open(file_path, 'rb') as f:
+            chunk = f.read(chunk_size)
+            while chunk:
+                # 预读下一块，以便在最后一块后附加认证标签
+                next_chunk = f.read(chunk_size)
+                encrypted = gcm_cipher.encrypt(chunk)
+                if not next_chunk:
+                    encrypted += gcm_cipher.digest()
+                if prefix:
+                    encrypted = prefix + encrypted
+                    prefix = b''
+                yield encrypted
+                chunk = next_chunk
+        
+        if prefix:
+            # 空文件
+            yield prefix + gcm_cipher.digest()
     
     @staticmethod
     def decrypt_file(encrypted_data: bytes, file_key: bytes) -> bytes:
@@ -103,23 +183,28 @@ class FileCrypto:
         """
         cipher = AESCipher(file_key)
         
+        # 通过 memoryview 切片，避免复制整段密文；仅 IV/nonce 转为 bytes
+        mv = memoryview(encrypted_data)
+        
         # 检查版本标记
-        version = encrypted_data[0]
+        version = mv[0]
         
-        if version == 0:
+        if version in (FileCrypto.VERSION_GCM, FileCrypto.VERSION_GCM_STREAM):
+            return FileCrypto._decrypt_gcm_or_legacy(mv, file_key)
+        elif version == 0:
             # CBC 模式: version(1) + iv(16) + ciphertext
-            iv = encrypted_data[1:17]
-            ciphertext = encrypted_data[17:]
+            iv = bytes(mv[1:17])
+            ciphertext = mv[17:]
             return cipher.decrypt_cbc(ciphertext, iv)
         elif version == 1:
             # CTR 模式: version(1) + nonce(8) + ciphertext
-            nonce = encrypted_data[1:9]
-            ciphertext = encrypted_data[9:]
+            nonce = bytes(mv[1:9])
+            ciphertext = mv[9:]
             return cipher.decrypt_ctr(ciphertext, nonce)
         else:
             # 兼容旧格式 (无版本标记，直接是 iv + ciphertext)
-            iv = encrypted_data[:16]
-            ciphertext = encrypted_data[16:]
+            iv = bytes(mv[:16])
+            ciphertext = mv[16:]
             return cipher.decrypt_cbc(ciphertext, iv)
     
     @staticmethod
@@ -132,12 +217,16 @@ class FileCrypto:
             file_key: 文件密钥
             output_path: 输出文件路径
         """
-        import gc
-        from Crypto.Cipher import AES
-        
         version = encrypted_data[0]
         
-        if version == 0:
+        if version in (FileCrypto.VERSION_GCM, FileCrypto.VERSION_GCM_STREAM):
+            # GCM 模式 - 一次性解密并校验
+            decrypted = FileCrypto._decrypt_gcm_or_legacy(encrypted_data, file_key)
+            with open(output_path, 'wb') as f:
+                f.write(decrypted)
+            del decrypted
+            
+        elif version == 0:
             # CBC 模式 - 小文件，一次性解密
             cipher = AESCipher(file_key)
             iv = encrypted_data[1:17]
@@ -146,31 +235,21 @@ class FileCrypto:
             with open(output_path, 'wb') as f:
                 f.write(decrypted)
             del decrypted
-            gc.collect()
             
         elif version == 1:
             # CTR 模式 - 大文件，流式解密
             nonce = encrypted_data[1:9]
-            ciphertext = encrypted_data[9:]
-            
-            # 创建单个 CTR 密码对象
-            ctr_cipher = AES.new(file_key, AES.MODE_CTR, nonce=nonce)
+            # 使用 memoryview 切片，避免每个分块复制一份密文
+            ciphertext = memoryview(encrypted_data)[9:]
             
-            # 流式解密写入文件
-            chunk_size = 1024 * 1024  # 1MB chunks
+            # 分块解密写入文件（大文件多线程并行）
+            chunk_size = FileCrypto.CTR_CHUNK_SIZE
+            chunks = (ciphertext[offset:offset + chunk_size]
+                      for offset in range(0, len(ciphertext), chunk_size))
             with open(output_path, 'wb') as f:
-                offset = 0
-                while offset < len(ciphertext):
-                    chunk = ciphertext[offset:offset + chunk_size]
-                    decrypted_chunk = ctr_cipher.decrypt(chunk)
-                    f.write(decrypted_chunk)
-                    offset += chunk_size
-                    
-                    if offset % (50 * chunk_size) == 0:
-                        gc.collect()
+                FileCrypto._ctr_decrypt_chunks(chunks, f, file_key, nonce, len(ciphertext))
             
-            del ciphertext
-            gc.collect()
+            ciphertext.release()
             
         else:
             # 兼容旧格式
@@ -181,7 +260,6 @@ class FileCrypto:
             with open(output_path, 'wb') as f:
                 f.write(decrypted)
             del decrypted
-            gc.collect()
     
     @staticmethod
     def decrypt_from_encrypted_file(encrypted_file_path: Path, file_key: bytes, output_path: Path):
@@ -193,8 +271,6 @@ class FileCrypto:
             file_key: 文件密钥
             output_path: 输出文件路径
         """
-        import gc
-        from Crypto.Cipher import AES
 
         # 获取文件大小
         file_size = encrypted_file_path.stat().st_size
@@ -212,7 +288,6 @@ class FileCrypto:
 
             del encrypted_data
             del decrypted
-            gc.collect()
             return
 
 
@@ -221,50 +296,301 @@ class FileCrypto:
             # 读取版本标记
             version = enc_file.read(1)[0]
             
-            if version == 0:
-                # CBC 模式 - 小文件
+            if version in (FileCrypto.VERSION_GCM, FileCrypto.VERSION_GCM_STREAM):
+                # GCM 模式 - 流式解密，全部写完后校验认证标签
+                nonce = enc_file.read(FileCrypto.GCM_NONCE_SIZE)
+                if version == FileCrypto.VERSION_GCM:
+                    tag = enc_file.read(FileCrypto.GCM_TAG_SIZE)
+                else:
+                    # 标签位于文件末尾
+                    enc_file.seek(-FileCrypto.GCM_TAG_SIZE, os.SEEK_END)
+                    tag = enc_file.read(FileCrypto.GCM_TAG_SIZE)
+                    enc_file.seek(1 + FileCrypto.GCM_NONCE_SIZE)
+                gcm_cipher = AES.new(file_key, AES.MODE_GCM, nonce=nonce)
+                
+                chunk_size = 1024 * 1024  # 1MB chunks
+                remaining = file_size - FileCrypto.GCM_HEADER_SIZE
+                with open(output_path, 'wb') as out_file:
+                    while remaining > 0:
+                        chunk = enc_file.read(min(chunk_size, remaining))
+                        if not chunk:
+                            break
+                        remaining -= len(chunk)
+                        out_file.write(gcm_cipher.decrypt(chunk))
+                try:
+                    gcm_cipher.verify(tag)
+                except ValueError as e:
+                    # 认证失败，删除已写出的不可信明文
+                    os.remove(output_path)
+                    # 旧格式的随机 IV 首字节恰好为版本号时认证必然失败，按旧格式重试
+                    if file_size % 16:
+                        raise
+                    enc_file.seek(0)
+                    iv = enc_file.read(16)
+                    try:
+                        with open(output_path, 'wb') as out_file:
+                            FileCrypto._cbc_decrypt_stream(enc_file, out_file, file_key, iv)
+                    except ValueError:
+                        os.remove(output_path)
+                        raise e
+                
+            elif version == 0:
+                # CBC 模式 - 流式解密
                 iv = enc_file.read(16)
-                ciphertext = enc_file.read()
-                cipher = AESCipher(file_key)
-                decrypted = cipher.decrypt_cbc(ciphertext, iv)
-                with open(output_path, 'wb') as f:
-                    f.write(decrypted)
-                del decrypted
-                gc.collect()
+                with open(output_path, 'wb') as out_file:
+                    FileCrypto._cbc_decrypt_stream(enc_file, out_file, file_key, iv)
                 
             elif version == 1:
                 # CTR 模式 - 大文件，流式解密
                 nonce = enc_file.read(8)
-                ctr_cipher = AES.new(file_key, AES.MODE_CTR, nonce=nonce)
                 
-                chunk_size = 1024 * 1024  # 1MB chunks
+                # 分块解密写入文件（大文件多线程并行）
+                chunk_size = FileCrypto.CTR_CHUNK_SIZE
+                chunks = iter(lambda: enc_file.read(chunk_size), b'')
                 with open(output_path, 'wb') as out_file:
-                    counter = 0
-                    while True:
-                        chunk = enc_file.read(chunk_size)
-                        if not chunk:
-                            break
-                        
-                        decrypted_chunk = ctr_cipher.decrypt(chunk)
-                        out_file.write(decrypted_chunk)
-                        
-                        counter += 1
-                        if counter % 100 == 0:
-                            gc.collect()
+                    FileCrypto._ctr_decrypt_chunks(chunks, out_file, file_key, nonce,
+                                                   file_size - 9)
                 
             else:
-                # 兼容旧格式 - 整个读取
+                # 兼容旧格式 (iv + ciphertext) - 流式解密
                 enc_file.seek(0)
-                encrypted_data = enc_file.read()
-                cipher = AESCipher(file_key)
-                iv = encrypted_data[:16]
-                ciphertext = encrypted_data[16:]
-                decrypted = cipher.decrypt_cbc(ciphertext, iv)
-                with open(output_path, 'wb') as f:
-                    f.write(decrypted)
-                del decrypted
-                del encrypted_data
-                gc.collect()
+                iv = enc_file.read(16)
+                with open(output_path, 'wb') as out_file:
+                    FileCrypto._cbc_decrypt_stream(enc_file, out_file, file_key, iv)
+    
+    @staticmethod
+    def _pipelined_transform(src, write, transform, chunk_size: int):
+        """
+        分块读取 src，经 transform 处理后交给 write 写出
+        读写在 I/O 线程中进行，与当前线程的 AES 计算重叠
+        （pycryptodome 加解密时释放 GIL）；CTR/GCM 计数器有状态，
+        transform 始终在当前线程按顺序调用。同时最多一读一写在途，内存占用有界。
+        """
+        read_future = _io_executor.submit(src.read, chunk_size)
+        write_future = None
+        try:
+            while True:
+                chunk = read_future.result()
+                if not chunk:
+                    break
+                read_future = _io_executor.submit(src.read, chunk_size)
+                
+                # 使用同一个 cipher 对象处理，保持计数器连续
+                processed = transform(chunk)
+                
+                if write_future is not None:
+                    write_future.result()
+                write_future = _io_executor.submit(write, processed)
+        finally:
+            # 确保没有在途的读写，调用方随后可安全关闭/定位文件
+            read_future.cancel()
+            if not read_future.cancelled():
+                read_future.exception()
+            if write_future is not None:
+                write_future.result()
+    
+    @staticmethod
+    def _cbc_decrypt_stream(src, out, file_key: bytes, iv: bytes):
+        """
+        分块解密 CBC 密文（从 src 当前位置读到末尾）并写入 out
+        始终保留最后一个已解密分块，读到末尾后再去除 PKCS#7 填充
+        """
+        
+        cipher = AES.new(file_key, AES.MODE_CBC, iv)
+        previous = None
+        while True:
+            chunk = src.read(FileCrypto.STREAM_CHUNK_SIZE)
+            if not chunk:
+                break
+            if previous is not None:
+                out.write(previous)
+            previous = cipher.decrypt(chunk)
+        
+        if previous is None:
+            raise ValueError("密文为空")
+        out.write(unpad(previous, AES.block_size))
+    
+    @staticmethod
+    def _ctr_decrypt_chunks(chunks, out, file_key: bytes, nonce: bytes, total_size: int):
+        """
+        按顺序解密 CTR_CHUNK_SIZE 大小的密文分块并写入 out
+        CTR 第 i 块的密钥流只取决于 (nonce, i * 块内分组数)，各分块可独立解密；
+        密文不小于 CTR_PARALLEL_THRESHOLD 时分发到线程池，按原顺序写出
+        """
+        
+        blocks_per_chunk = FileCrypto.CTR_CHUNK_SIZE // AES.block_size
+        
+        def decrypt_chunk(index: int, chunk) -> bytes:
+            cipher = AES.new(file_key, AES.MODE_CTR, nonce=nonce,
+                             initial_value=index * blocks_per_chunk)
+            return cipher.decrypt(chunk)
+        
+        if total_size < FileCrypto.CTR_PARALLEL_THRESHOLD:
+            for index, chunk in enumerate(chunks):
+                out.write(decrypt_chunk(index, chunk))
+            return
+        
+        # 限制在途分块数量，保持内存占用有界
+        pending = deque()
+        for index, chunk in enumerate(chunks):
+            pending.append(_ctr_executor.submit(decrypt_chunk, index, chunk))
+            if len(pending) >= _ctr_workers * 2:
+                out.write(pending.popleft().result())
+        while pending:
+            out.write(pending.popleft().result())
+    
+    @staticmethod
+    def _encrypt_gcm(plaintext: bytes, key: Union[bytes, AESCipher]) -> bytes:
+        """
+        GCM 加密为 version 2 格式
+        
+        Returns:
+            version(1) + nonce(12) + tag(16) + ciphertext
+        """
+        nonce = os.urandom(FileCrypto.GCM_NONCE_SIZE)
+        ciphertext, _, tag = _as_cipher(key).encrypt_gcm(plaintext, nonce=nonce)
+        return bytes((FileCrypto.VERSION_GCM,)) + nonce + tag + ciphertext
+    
+    @staticmethod
+    def _decrypt_gcm(encrypted_data: bytes, key: Union[bytes, AESCipher]) -> bytes:
+        """
+        解密 version 2 / 3 (GCM) 格式数据
+        
+        Raises:
+            ValueError: 如果认证失败
+        """
+        mv = memoryview(encrypted_data)
+        nonce_end = 1 + FileCrypto.GCM_NONCE_SIZE
+        if mv[0] == FileCrypto.VERSION_GCM_STREAM:
+            # version 3: 认证标签在末尾
+            tag_start = len(mv) - FileCrypto.GCM_TAG_SIZE
+            ciphertext, tag = mv[nonce_end:tag_start], mv[tag_start:]
+        else:
+            header_end = FileCrypto.GCM_HEADER_SIZE
+            ciphertext, tag = mv[header_end:], mv[nonce_end:header_end]
+        return _as_cipher(key).decrypt_gcm(
+            ciphertext,
+            bytes(mv[1:nonce_end]),
+            bytes(tag)
+        )
+    
+    @staticmethod
+    def _decrypt_gcm_or_legacy(encrypted_data: bytes, file_key: bytes) -> bytes:
+        """
+        解密 version 2 / 3 (GCM) 格式文件，认证失败时兼容旧的 IV + CBC 格式
+        
+        旧格式没有版本标记，随机 IV 的首字节约有 1/128 的概率为 2 或 3；
+        其长度总是 16 的整数倍，此时按旧格式重试
+        
+        Raises:
+            ValueError: 如果两种格式都解密失败
+        """
+        try:
+            return FileCrypto._decrypt_gcm(encrypted_data, file_key)
+        except ValueError as e:
+            if len(encrypted_data) % 16:
+                raise
+            mv = memoryview(encrypted_data)
+            try:
+                return AESCipher(file_key).decrypt_cbc(mv[16:], bytes(mv[:16]))
+            except ValueError:
+                raise e
+    
+    @staticmethod
+    def encrypt_file_key(file_key: bytes, master_key: Union[bytes, AESCipher]) -> bytes:
+        """
+        使用主密钥加密文件密钥 (GCM 模式)
+        
+        Args:
+            file_key: 文件密钥
+            master_key: 主密钥（或复用的 AESCipher 实例）
+            
+        Returns:
+            加密后的文件密钥（version 2 格式）
+        """
+        return FileCrypto._encrypt_gcm(file_key, master_key)
+    
+    @staticmethod
+    def encrypt_file_keys(file_keys: List[bytes],
+                          master_key: Union[bytes, AESCipher]) -> List[bytes]:
+        """
+        批量加密文件密钥（输出格式与 encrypt_file_key 相同）
+        
+        所有 nonce 一次性取自系统随机源，且只创建一个 AESCipher
+        
+        Args:
+            file_keys: 文件密钥列表
+            master_key: 主密钥（或复用的 AESCipher 实例）
+            
+        Returns:
+            加密后的文件密钥列表（version 2 格式），顺序与输入一致
+        """
+        cipher = _as_cipher(master_key)
+        nonce_size = FileCrypto.GCM_NONCE_SIZE
+        nonces = memoryview(os.urandom(nonce_size * len(file_keys)))
+        header = bytes((FileCrypto.VERSION_GCM,))
+        
+        results = []
+        for i, file_key in enumerate(file_keys):
+            nonce = bytes(nonces[i * nonce_size:(i + 1) * nonce_size])
+            ciphertext, _, tag = cipher.encrypt_gcm(file_key, nonce=nonce)
+            results.append(header + nonce + tag + ciphertext)
+        return results
+    
+    @staticmethod
+    def decrypt_file_key(encrypted_file_key: bytes, master_key: Union[bytes, AESCipher]) -> bytes:
+        """
+        解密文件密钥（兼容旧的 IV + CBC 密文格式）
+        
+        Args:
+            encrypted_file_key: 加密的文件密钥
+            master_key: 主密钥（或复用的 AESCipher 实例）
+            
+        Returns:
+            文件密钥
+        """
+        # 旧格式固定为 IV(16) + 48 字节密文，长度可与 GCM 格式区分
+        if (len(encrypted_file_key) == FileCrypto.GCM_HEADER_SIZE + AESCipher.KEY_SIZE
+                and encrypted_file_key[0] == FileCrypto.VERSION_GCM):
+            return FileCrypto._decrypt_gcm(encrypted_file_key, master_key)
+        
+        cipher = _as_cipher(master_key)
+        return cipher.decrypt_cbc_key(encrypted_file_key[16:], encrypted_file_key[:16])
+    
+    @staticmethod
+    def decrypt_file_keys(encrypted_file_keys: List[bytes],
+                          master_key: Union[bytes, AESCipher]) -> List[bytes]:
+        """
+        批量解密文件密钥（与逐个调用 decrypt_file_key 结果相同）
+        
+        GCM 格式逐个校验认证标签但共用一个 AESCipher；
+        旧 CBC 格式合并为一次块解密
+        
+        Args:
+            encrypted_file_keys: 加密的文件密钥列表
+            master_key: 主密钥（或复用的 AESCipher 实例）
+            
+        Returns:
+            文件密钥列表，顺序与输入一致
+        """
+        cipher = _as_cipher(master_key)
+        gcm_size = FileCrypto.GCM_HEADER_SIZE + AESCipher.KEY_SIZE
+        
+        results: List[Optional[bytes]] = [None] * len(encrypted_file_keys)
+        legacy_indexes = []
+        for i, encrypted in enumerate(encrypted_file_keys):
+            if len(encrypted) == gcm_size and encrypted[0] == FileCrypto.VERSION_GCM:
+                results[i] = FileCrypto._decrypt_gcm(encrypted, cipher)
+            else:
+                legacy_indexes.append(i)
+        
+        if legacy_indexes:
+            legacy_keys = cipher.decrypt_cbc_keys(
+                [encrypted_file_keys[i] for i in legacy_indexes]
+            )
+            for i, file_key in zip(legacy_indexes, legacy_keys):
+                results[i] = file_key
+        return results
     
     @staticmethod
     def encrypt_file_streaming(file_path: Path, file_key: bytes):
@@ -278,9 +604,11 @@ class FileCrypto:
         Yields:
             加密数据块
         """
+        
         # 使用 CTR 模式支持流式加密
-        cipher = AESCipher(file_key)
         nonce = os.urandom(8)
+        # 创建单个 CTR 密码对象，保持计数器跨分块连续（每块重新创建会复用同一段密钥流）
+        ctr_cipher = AES.new(file_key, AES.MODE_CTR, nonce=nonce)
         
         # 首先 yield nonce
         yield nonce
@@ -291,41 +619,41 @@ class FileCrypto:
                 if not chunk:
                     break
                 
-                encrypted_chunk, _ = cipher.encrypt_ctr(chunk, nonce)
-                yield encrypted_chunk
+                yield ctr_cipher.encrypt(chunk)
     
     @staticmethod
-    def encrypt_data(data: bytes, file_key: bytes) -> bytes:
+    def encrypt_data(data: bytes, file_key: Union[bytes, AESCipher]) -> bytes:
         """
         加密内存中的数据
         
         Args:
             data: 明文数据
-            file_key: 密钥
+            file_key: 密钥（同一密钥反复调用时可传入复用的 AESCipher 实例）
             
         Returns:
             加密数据（IV + 密文）
         """
-        cipher = AESCipher(file_key)
+        cipher = _as_cipher(file_key)
         ciphertext, iv = cipher.encrypt_cbc(data)
         return iv + ciphertext
     
     @staticmethod
-    def decrypt_data(encrypted_data: bytes, file_key: bytes) -> bytes:
+    def decrypt_data(encrypted_data: bytes, file_key: Union[bytes, AESCipher]) -> bytes:
         """
         解密内存中的数据
         
         Args:
             encrypted_data: 加密数据（IV + 密文）
-            file_key: 密钥
+            file_key: 密钥（同一密钥反复调用时可传入复用的 AESCipher 实例）
             
         Returns:
             解密后的数据
         """
-        iv = encrypted_data[:16]
-        ciphertext = encrypted_data[16:]
+        mv = memoryview(encrypted_data)
+        iv = bytes(mv[:16])
+        ciphertext = mv[16:]
         
-        cipher = AESCipher(file_key)
+        cipher = _as_cipher(file_key)
         return cipher.decrypt_cbc(ciphertext, iv)
 
 
@@ -340,6 +668,8 @@ class FileKeyManager:
             master_key: 用户主密钥
         """
         self.master_key = master_key
+        # 主密钥固定，复用同一个加密器（AESCipher 无状态，每次操作使用新的 IV/nonce）
+        self._cipher = AESCipher(master_key)
     
     def encrypt_file_key(self, file_key: bytes) -> bytes:
         """
@@ -351,9 +681,7 @@ class FileKeyManager:
         Returns:
             加密后的文件密钥
         """
-        cipher = AESCipher(self.master_key)
-        encrypted, iv = cipher.encrypt_cbc(file_key)
-        return iv + encrypted
+        return FileCrypto.encrypt_file_key(file_key, self._cipher)
     
     def decrypt_file_key(self, encrypted_file_key: bytes) -> bytes:
         """
@@ -365,11 +693,7 @@ class FileKeyManager:
         Returns:
             文件密钥
         """
-        iv = encrypted_file_key[:16]
-        ciphertext = encrypted_file_key[16:]
-        
-        cipher = AESCipher(self.master_key)
-        return cipher.decrypt_cbc(ciphertext, iv)
+        return FileCrypto.decrypt_file_key(encrypted_file_key, self._cipher)
     
     def prepare_upload(self, file_path: Path) -> Tuple[bytes, bytes, bytes]:
         """
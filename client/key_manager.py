@@ -4,13 +4,24 @@
 """
 
 import os
-from typing import Optional, Dict
-from dataclasses import dataclass
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional, Dict, List
+from dataclasses import dataclass, field
+
+from Crypto.PublicKey import RSA
 
 from crypto.aes import AESCipher
 from crypto.rsa import RSACipher
 from crypto.kdf import KeyDerivation
+from crypto.secure_memory import LockedBuffer, wipe_bytearray
 from auth.master_key import MasterKeyManager, UserKeyManager
+from protocol.packet import encode_binary, decode_binary, LEGACY_BINARY_ENCODING
+from client.file_crypto import FileCrypto
+from auth.password import PasswordManager
+
+
+# 服务端验证用的密码哈希（scrypt，会释放 GIL）与主密钥派生、RSA 密钥生成并行计算
+_hash_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="pw-hash")
 
 
 @dataclass
@@ -19,9 +30,38 @@ class UserKeys:
     user_id: int
     username: str
     email: str
-    master_key: bytes          # 主密钥（明文，仅在内存中）
-    private_key: bytes         # RSA 私钥（明文，仅在内存中）
+    master_key: bytes          # 主密钥（明文，解锁后为锁定内存的只读视图）
+    private_key: bytes         # RSA 私钥（明文，解锁后为锁定内存的只读视图）
     public_key: bytes          # RSA 公钥
+    # 主密钥加密器，解锁时创建一次，供文件密钥加解密复用
+    master_cipher: AESCipher = field(init=False, repr=False, compare=False)
+    # 私钥解密器，解锁时解析一次 PEM（含 CRT 参数 p, q, dP, dQ, qInv）
+    private_cipher: RSACipher = field(init=False, repr=False, compare=False)
+    # 已解析的 RSA 密钥对象
+    private_key_obj: RSA.RsaKey = field(init=False, repr=False, compare=False)
+    public_key_obj: RSA.RsaKey = field(init=False, repr=False, compare=False)
+    # 主密钥、私钥 PEM 所在的锁定内存（不会被换出到磁盘，锁定密钥时清零）
+    _master_key_buf: LockedBuffer = field(init=False, repr=False, compare=False)
+    _private_key_buf: LockedBuffer = field(init=False, repr=False, compare=False)
+    
+    def __post_init__(self):
+        self._master_key_buf = LockedBuffer(self.master_key)
+        self.master_key = self._master_key_buf.view()
+        self.master_cipher = AESCipher(self.master_key)
+        self.private_cipher = RSACipher(private_key=self.private_key)
+        self.private_key_obj = self.private_cipher.private_key_obj
+        self.public_key_obj = self.private_cipher.public_key_obj
+        self._private_key_buf = LockedBuffer(self.private_key)
+        self.private_key = self._private_key_buf.view()
+    
+    def wipe(self):
+        """清零锁定内存中的主密钥和私钥，并丢弃由它们派生的加密器"""
+        # 清零同时释放 master_key / private_key 视图，之后经由它们的加解密会抛出 ValueError
+        self._master_key_buf.wipe()
+        self._private_key_buf.wipe()
+        self.master_cipher = None
+        self.private_cipher = None
+        self.private_key_obj = None
 
 
 class KeyManager:
@@ -30,7 +70,8 @@ class KeyManager:
     def __init__(self):
         """初始化密钥管理器"""
         self.user_keys: Optional[UserKeys] = None
-        self.group_keys: Dict[int, bytes] = {}  # group_id -> group_key
+        self.group_keys: Dict[int, bytearray] = {}  # group_id -> group_key（可原地清零）
+        self._group_ciphers: Dict[int, AESCipher] = {}  # group_id -> 群组密钥加密器
     
     @property
     def is_unlocked(self) -> bool:
@@ -47,31 +88,34 @@ class KeyManager:
         Returns:
             注册所需的密钥数据
         """
+        # 计算密码哈希（用于服务端验证）：先用 SHA-256 预哈希，再用 scrypt 哈希
+        # 在后台与主密钥派生、RSA 密钥生成同时进行
+        password_prehash = PasswordManager.prehash_password_bytes(password)
+        hash_future = _hash_executor.submit(PasswordManager.hash_password, password_prehash)
+        
         # 创建主密钥包
         bundle, recovery_key = MasterKeyManager.create_master_key_bundle(password)
         
+        master_key = bytes(bundle.master_key)
+        
         # 生成 RSA 密钥对
-        public_key, encrypted_private_key, _, _ = UserKeyManager.generate_user_keypair(
-            bundle.master_key
+        public_key, encrypted_private_key = UserKeyManager.generate_user_keypair(
+            master_key
         )
         
-        # 计算密码哈希（用于服务端验证）
-        # 先用 SHA-256 预哈希，再用 bcrypt 哈希
-        from auth.password import PasswordManager
-        password_prehash = PasswordManager.prehash_password(password)
-        password_hash = PasswordManager.hash_password(password_prehash)
+        password_hash = hash_future.result()
         
         return {
-            'password_hash': password_hash.hex(),
-            'public_key': public_key.hex(),
-            'encrypted_private_key': encrypted_private_key.hex(),
-            'encrypted_master_key': bundle.encrypted_master_key.hex(),
-            'master_key_salt': bundle.master_key_salt.hex(),
-            'recovery_key_encrypted': bundle.recovery_key_encrypted.hex(),
-            'recovery_key_salt': bundle.recovery_key_salt.hex(),
-            'recovery_key_hash': bundle.recovery_key_hash.hex(),
+            'password_hash': encode_binary(password_hash),
+            'public_key': encode_binary(public_key),
+            'encrypted_private_key': encode_binary(encrypted_private_key),
+            'encrypted_master_key': encode_binary(bundle.encrypted_master_key),
+            'master_key_salt': encode_binary(bundle.master_key_salt),
+            'recovery_key_encrypted': encode_binary(bundle.recovery_key_encrypted),
+            'recovery_key_salt': encode_binary(bundle.recovery_key_salt),
+            'recovery_key_hash': encode_binary(bundle.recovery_key_hash),
             'recovery_key': recovery_key,  # 需要展示给用户保存
-            'master_key': bundle.master_key  # 临时保存
+            'master_key': master_key  # 临时保存
         }
     
     def unlock_with_password(self, password: str, user_data: dict) -> bool:
@@ -86,8 +130,10 @@ class KeyManager:
             是否成功解锁
         """
         try:
-            encrypted_master_key = bytes.fromhex(user_data['encrypted_master_key'])
-            master_key_salt = bytes.fromhex(user_data['master_key_salt'])
+            # 旧版服务器不声明编码，按 hex 解析
+            encoding = user_data.get('encoding', LEGACY_BINARY_ENCODING)
+            encrypted_master_key = decode_binary(user_data['encrypted_master_key'], encoding)
+            master_key_salt = decode_binary(user_data['master_key_salt'], encoding)
             
             # 解密主密钥
             master_key = MasterKeyManager.decrypt_with_password(
@@ -97,26 +143,7 @@ class KeyManager:
             if not master_key:
                 return False
             
-            # 解密私钥
-            encrypted_private_key = bytes.fromhex(user_data['encrypted_private_key'])
-            private_key = UserKeyManager.decrypt_private_key(
-                encrypted_private_key, master_key
-            )
-            
-            if not private_key:
-                return False
-            
-            # 保存密钥
-            self.user_keys = UserKeys(
-                user_id=user_data['user_id'],
-                username=user_data['username'],
-                email=user_data['email'],
-                master_key=master_key,
-                private_key=private_key,
-                public_key=bytes.fromhex(user_data['public_key'])
-            )
-            
-            return True
+            return self._unlock_with_master_key(master_key, user_data, encoding)
         except Exception as e:
             print(f"[KeyManager] 解锁失败: {e}")
             return False
@@ -133,8 +160,10 @@ class KeyManager:
             是否成功解锁
         """
         try:
-            recovery_encrypted = bytes.fromhex(user_data['recovery_key_encrypted'])
-            recovery_salt = bytes.fromhex(user_data['recovery_key_salt'])
+            # 旧版服务器不声明编码，按 hex 解析
+            encoding = user_data.get('encoding', LEGACY_BINARY_ENCODING)
+            recovery_encrypted = decode_binary(user_data['recovery_key_encrypted'], encoding)
+            recovery_salt = decode_binary(user_data['recovery_key_salt'], encoding)
             
             # 解密主密钥
             master_key = MasterKeyManager.decrypt_with_recovery(
@@ -144,30 +173,52 @@ class KeyManager:
             if not master_key:
                 return False
             
-            # 解密私钥
-            encrypted_private_key = bytes.fromhex(user_data['encrypted_private_key'])
-            private_key = UserKeyManager.decrypt_private_key(
-                encrypted_private_key, master_key
-            )
-            
-            if not private_key:
-                return False
-            
-            # 保存密钥
-            self.user_keys = UserKeys(
-                user_id=user_data['user_id'],
-                username=user_data['username'],
-                email=user_data['email'],
-                master_key=master_key,
-                private_key=private_key,
-                public_key=bytes.fromhex(user_data['public_key'])
-            )
-            
-            return True
+            return self._unlock_with_master_key(master_key, user_data, encoding)
         except Exception as e:
             print(f"[KeyManager] 恢复解锁失败: {e}")
             return False
     
+    def unlock_with_master_key(self, master_key: bytes, user_data: dict) -> bool:
+        """
+        使用已解密的主密钥解锁（跳过口令派生，用于重试时复用先前的解锁结果）
+        
+        Args:
+            master_key: 主密钥明文
+            user_data: 从服务器获取的用户数据
+            
+        Returns:
+            是否成功解锁
+        """
+        try:
+            encoding = user_data.get('encoding', LEGACY_BINARY_ENCODING)
+            return self._unlock_with_master_key(master_key, user_data, encoding)
+        except Exception as e:
+            print(f"[KeyManager] 解锁失败: {e}")
+            return False
+    
+    def _unlock_with_master_key(self, master_key: bytes, user_data: dict,
+                                encoding: str) -> bool:
+        """解密私钥并保存密钥集合"""
+        encrypted_private_key = decode_binary(user_data['encrypted_private_key'], encoding)
+        private_key = UserKeyManager.decrypt_private_key(
+            encrypted_private_key, master_key
+        )
+        
+        if not private_key:
+            return False
+        
+        # 保存密钥
+        self.user_keys = UserKeys(
+            user_id=user_data['user_id'],
+            username=user_data['username'],
+            email=user_data['email'],
+            master_key=master_key,
+            private_key=private_key,
+            public_key=decode_binary(user_data['public_key'], encoding)
+        )
+        
+        return True
+    
     def prepare_password_reset(self, new_password: str) -> dict:
         """
         准备密码重置数据
@@ -181,20 +232,21 @@ class KeyManager:
         if not self.user_keys:
             raise ValueError("密钥未解锁")
         
+        # 计算新密码哈希（先 SHA-256 预哈希，再 scrypt），与主密钥重新加密并行
+        new_prehash = PasswordManager.prehash_password_bytes(new_password)
+        hash_future = _hash_executor.submit(PasswordManager.hash_password, new_prehash)
+        
         # 使用新密码重新加密主密钥
         new_encrypted, new_salt = MasterKeyManager.reencrypt_with_new_password(
             self.user_keys.master_key, new_password
         )
         
-        # 计算新密码哈希（先 SHA-256 预哈希，再 bcrypt）
-        from auth.password import PasswordManager
-        new_prehash = PasswordManager.prehash_password(new_password)
-        new_hash = PasswordManager.hash_password(new_prehash)
+        new_hash = hash_future.result()
         
         return {
-            'new_password_hash': new_hash.hex(),
-            'new_encrypted_master_key': new_encrypted.hex(),
-            'new_master_key_salt': new_salt.hex()
+            'new_password_hash': encode_binary(new_hash),
+            'new_encrypted_master_key': encode_binary(new_encrypted),
+            'new_master_key_salt': encode_binary(new_salt)
         }
     
     def unlock_from_device(self, device_data: dict) -> bool:
@@ -223,28 +275,41 @@ class KeyManager:
     
     def lock(self):
         """锁定密钥（清除内存）"""
+        if self.user_keys:
+            self.user_keys.wipe()
         self.user_keys = None
+        for group_key in self.group_keys.values():
+            wipe_bytearray(group_key)
         self.group_keys.clear()
+        self._group_ciphers.clear()
     
     def encrypt_file_key(self, file_key: bytes) -> bytes:
         """使用主密钥加密文件密钥"""
         if not self.user_keys:
             raise ValueError("密钥未解锁")
         
-        cipher = AESCipher(self.user_keys.master_key)
-        encrypted, iv = cipher.encrypt_cbc(file_key)
-        return iv + encrypted
+        return FileCrypto.encrypt_file_key(file_key, self.user_keys.master_cipher)
+    
+    def encrypt_file_keys_batch(self, file_keys: List[bytes]) -> List[bytes]:
+        """使用主密钥批量加密文件密钥（用于多文件上传、文件夹重新加密）"""
+        if not self.user_keys:
+            raise ValueError("密钥未解锁")
+        
+        return FileCrypto.encrypt_file_keys(file_keys, self.user_keys.master_cipher)
     
     def decrypt_file_key(self, encrypted_file_key: bytes) -> bytes:
         """解密文件密钥"""
         if not self.user_keys:
             raise ValueError("密钥未解锁")
         
-        iv = encrypted_file_key[:16]
-        ciphertext = encrypted_file_key[16:]
+        return FileCrypto.decrypt_file_key(encrypted_file_key, self.user_keys.master_cipher)
+    
+    def decrypt_file_keys_batch(self, encrypted_file_keys: List[bytes]) -> List[bytes]:
+        """批量解密文件密钥（用于文件夹下载等一次处理多个文件的场景）"""
+        if not self.user_keys:
+            raise ValueError("密钥未解锁")
         
-        cipher = AESCipher(self.user_keys.master_key)
-        return cipher.decrypt_cbc(ciphertext, iv)
+        return FileCrypto.decrypt_file_keys(encrypted_file_keys, self.user_keys.master_cipher)
     
     def generate_group_key(self) -> bytes:
         """生成群组密钥"""
@@ -261,8 +326,7 @@ class KeyManager:
         Returns:
             加密后的数据
         """
-        rsa = RSACipher(public_key=user_public_key)
-        return rsa.encrypt(data)
+        return RSACipher.for_public_key(user_public_key).encrypt(data)
     
     def decrypt_for_me(self, encrypted_data: bytes) -> bytes:
         """
@@ -277,35 +341,61 @@ class KeyManager:
         if not self.user_keys:
             raise ValueError("密钥未解锁")
         
-        rsa = RSACipher(private_key=self.user_keys.private_key)
-        return rsa.decrypt(encrypted_data)
+        return self.user_keys.private_cipher.decrypt(encrypted_data)
     
     def set_group_key(self, group_id: int, group_key: bytes):
         """设置群组密钥"""
+        group_key = bytearray(group_key)
+        old_key = self.group_keys.get(group_id)
+        if old_key is not None:
+            wipe_bytearray(old_key)
         self.group_keys[group_id] = group_key
+        self._group_ciphers[group_id] = AESCipher(group_key)
     
     def get_group_key(self, group_id: int) -> Optional[bytes]:
         """获取群组密钥"""
         return self.group_keys.get(group_id)
     
+    @staticmethod
+    def _group_aad(group_id: int) -> bytes:
+        """群组密文的附加认证数据（绑定 group_id，防止密文被挪到其他群组使用）"""
+        return b'group:%d' % group_id
+    
     def encrypt_with_group_key(self, group_id: int, data: bytes) -> bytes:
-        """使用群组密钥加密"""
-        group_key = self.group_keys.get(group_id)
-        if not group_key:
+        """
+        使用群组密钥加密 (GCM 模式)
+        
+        Returns:
+            version(1) + nonce(12) + tag(16) + ciphertext
+        """
+        cipher = self._group_ciphers.get(group_id)
+        if not cipher:
             raise ValueError("群组密钥不存在")
         
-        cipher = AESCipher(group_key)
-        encrypted, iv = cipher.encrypt_cbc(data)
-        return iv + encrypted
+        nonce = os.urandom(FileCrypto.GCM_NONCE_SIZE)
+        ciphertext, _, tag = cipher.encrypt_gcm(
+            data, aad=self._group_aad(group_id), nonce=nonce
+        )
+        return bytes((FileCrypto.VERSION_GCM,)) + nonce + tag + ciphertext
     
     def decrypt_with_group_key(self, group_id: int, encrypted_data: bytes) -> bytes:
-        """使用群组密钥解密"""
-        group_key = self.group_keys.get(group_id)
-        if not group_key:
+        """使用群组密钥解密（兼容旧的 IV + CBC 密文格式）"""
+        cipher = self._group_ciphers.get(group_id)
+        if not cipher:
             raise ValueError("群组密钥不存在")
         
-        iv = encrypted_data[:16]
-        ciphertext = encrypted_data[16:]
+        mv = memoryview(encrypted_data)
+        if len(mv) >= FileCrypto.GCM_HEADER_SIZE and mv[0] == FileCrypto.VERSION_GCM:
+            nonce_end = 1 + FileCrypto.GCM_NONCE_SIZE
+            try:
+                return cipher.decrypt_gcm(
+                    mv[FileCrypto.GCM_HEADER_SIZE:], mv[1:nonce_end],
+                    mv[nonce_end:FileCrypto.GCM_HEADER_SIZE],
+                    aad=self._group_aad(group_id)
+                )
+            except ValueError:
+                # 旧格式的 IV 首字节恰好为版本号时认证必然失败，按 CBC 继续解密
+                if len(mv) % 16:
+                    raise
         
-        cipher = AESCipher(group_key)
-        return cipher.decrypt_cbc(ciphertext, iv)
+        return cipher.decrypt_cbc(mv[16:], mv[:16])
@@ -42,6 +42,7 @@ class Application:
         self.key_manager = KeyManager()
         self.device_trust = DeviceTrustManager()
         self.main_window = None
+        self.login_dialog = None  # 退出登录后复用，避免重复构建界面、解析样式表
         self.should_exit = False
     
     def run(self) -> int:
@@ -64,7 +65,11 @@ class Application:
     def _show_login(self) -> bool:
         """显示登录对话框"""
         print("显示登录界面...")
-        login = LoginDialog(self.network, self.key_manager, self.device_trust)
+        if self.login_dialog is None:
+            self.login_dialog = LoginDialog(self.network, self.key_manager, self.device_trust)
+        else:
+            self.login_dialog.reset()
+        login = self.login_dialog
         
         if login.exec() != LoginDialog.DialogCode.Accepted:
             self.should_exit = True
@@ -5,13 +5,43 @@
 
 import json
 import socket
+import threading
 import time
-from typing import Optional, Tuple, Callable
+from collections import OrderedDict, deque
+from concurrent.futures import Future, TimeoutError as FutureTimeoutError
+from typing import Optional, Tuple, Callable, Iterable, Union
 from dataclasses import dataclass
 
-from protocol.packet import PacketType
+from protocol.packet import PacketType, BINARY_ENCODING
 from protocol.secure_channel import SecureChannel, SecureChannelBuilder
 
+try:
+    import orjson  # 可选依赖：更快的 JSON 编解码
+except ImportError:
+    orjson = None
+
+
+def _json_dumps(data: dict) -> bytes:
+    """序列化请求数据（优先使用 orjson，直接得到 bytes）"""
+    if orjson is not None:
+        return orjson.dumps(data)
+    return json.dumps(data).encode('utf-8')
+
+
+def _json_loads(raw: bytes) -> dict:
+    """解析响应数据"""
+    if orjson is not None:
+        return orjson.loads(raw)
+    return json.loads(raw)
+
+
+class _ChannelFuture(Future):
+    """记录所属安全通道的请求 Future（超时时据此关闭对应通道）"""
+    
+    def __init__(self, channel: Optional[SecureChannel] = None):
+        super().__init__()
+        self.channel = channel
+
 
 @dataclass
 class ServerInfo:
@@ -24,6 +54,15 @@ class ServerInfo:
 class NetworkClient:
     """网络客户端"""
     
+    # 套接字收发缓冲区大小（上传时容纳多个在途数据块）
+    SOCKET_BUFFER_SIZE = 1 << 20
+    # 流水线上传时未确认数据块的默认窗口
+    UPLOAD_WINDOW = 8
+    # 不超过该大小（加密后）的文件使用单包上传
+    SMALL_UPLOAD_THRESHOLD = 512 * 1024
+    # 用户公钥缓存容量（批量邀请、分享时避免重复查询）
+    PUBLIC_KEY_CACHE_SIZE = 512
+    
     def __init__(self, server_info: ServerInfo):
         """
         初始化网络客户端
@@ -36,6 +75,18 @@ class NetworkClient:
         self.channel: Optional[SecureChannel] = None
         self._connected = False
         self._auth_cache = {}  # 缓存登录凭据用于静默重连
+        # 上传数据块的复用发送缓冲区：upload_id 头部 + 数据块
+        self._upload_buf = bytearray()
+        self._upload_buf_id: Optional[str] = None  # 缓冲区头部当前写入的 upload_id
+        # 请求流水线：服务端按顺序应答，后台读线程按 FIFO 将响应交给等待中的 Future
+        # 每个通道一个队列，重连后旧通道的 Future 不会吸收新通道的响应
+        self._pending: deque = deque()
+        self._pending_lock = threading.Lock()  # 保证入队顺序与发送顺序一致
+        self._reader: Optional[threading.Thread] = None
+        # 很少变化的查询结果缓存（只缓存成功响应）
+        self._public_key_cache: 'OrderedDict[str, dict]' = OrderedDict()  # username -> 响应
+        self._group_key_cache: dict = {}  # group_id -> 响应（本用户加密的群组密钥）
+        self._key_cache_lock = threading.Lock()
     
     def connect(self) -> bool:
         """
@@ -50,6 +101,11 @@ class NetworkClient:
             self.sock.settimeout(30)
             self.sock.connect((self.server_info.host, self.server_info.port))
             
+            # 关闭 Nagle 算法，避免小包（请求、末尾数据块）等待合并
+            self.sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            self.sock.setsockopt(socket.SOL_SOCKET, socket.SO_SNDBUF, self.SOCKET_BUFFER_SIZE)
+            self.sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, self.SOCKET_BUFFER_SIZE)
+            
             print(f"[Client] 已连接到 {self.server_info.host}:{self.server_info.port}")
             
             # 建立安全通道
@@ -64,7 +120,16 @@ class NetworkClient:
                 return False
             
             print("[Client] 安全通道已建立")
+            with self._pending_lock:
+                self._pending = deque()
             self._connected = True
+            
+            # 启动响应读取线程（通道上的所有接收都由它完成）
+            self._reader = threading.Thread(
+                target=self._reader_loop, args=(self.channel, self._pending),
+                name="network-reader", daemon=True
+            )
+            self._reader.start()
             return True
         except Exception as e:
             print(f"[Client] 连接失败: {e}")
@@ -99,6 +164,95 @@ class NetworkClient:
             self._connected = False
             return False
 
+    def _reader_loop(self, channel: SecureChannel, pending: deque):
+        """
+        后台读取响应并按发送顺序分派给等待中的 Future
+        
+        服务端对同一连接的请求逐个处理、按序应答，因此无需请求 ID，
+        FIFO 即可对应。任何接收失败（断开、HMAC/序列号校验失败）都会使
+        后续响应无法对齐，此时关闭通道并让该通道所有未完成请求失败。
+        
+        Args:
+            channel: 本线程负责读取的通道
+            pending: 该通道的待应答 Future 队列
+        """
+        channel.sock.settimeout(None)  # 读线程阻塞等待，超时由各请求自行控制
+        while not channel.is_closed:
+            result = channel.recv()
+            if result is None:
+                channel.close()
+                break
+            with self._pending_lock:
+                future = pending.popleft() if pending else None
+            if future is None:
+                continue  # 没有对应请求的响应，丢弃
+            try:
+                response = _json_loads(result[1])
+            except Exception as e:
+                response = {'success': False, 'error': f'响应解析失败: {e}'}
+            if not future.done():
+                future.set_result(response)
+        
+        with self._pending_lock:
+            failed = list(pending)
+            pending.clear()
+        for future in failed:
+            if not future.done():
+                future.set_result({'success': False, 'error': '连接已断开'})
+    
+    def _submit(self, packet_type: PacketType,
+                payload: Union[bytes, memoryview], compress: bool = True) -> Future:
+        """发送请求，返回在收到响应时完成的 Future（结果为响应字典）"""
+        channel = self.channel
+        future = _ChannelFuture(channel)
+        if not self.is_connected:
+            future.set_result({'success': False, 'error': '未连接到服务器'})
+            return future
+        
+        with self._pending_lock:
+            pending = self._pending
+            # 先入队再发送，保证读线程收到响应时 Future 已就位
+            pending.append(future)
+            try:
+                sent = channel.send(packet_type, payload, compress)
+            except Exception:
+                sent = False
+            if not sent:
+                pending.pop()
+                future.set_result({'success': False, 'error': '发送请求失败'})
+        return future
+    
+    def wait_response(self, future: Future, timeout: float = 30) -> dict:
+        """
+        等待响应
+        
+        服务端校验失败的请求不会应答，超时的 Future 若留在队列中会让之后
+        每个响应都错位一个，因此超时后关闭其所属通道，由读线程使该通道
+        所有未完成请求失败，后续请求需重新连接。
+        """
+        try:
+            return future.result(timeout)
+        except FutureTimeoutError:
+            if future.done():  # 超时判定后响应恰好到达
+                return future.result()
+            channel = getattr(future, 'channel', None)
+            if channel is not None:
+                if channel is self.channel:
+                    self._connected = False
+                channel.close()
+            return {'success': False, 'error': '接收响应超时'}
+    
+    def send_request_async(self, packet_type: PacketType, data: dict) -> Future:
+        """
+        发送请求但不等待响应
+        
+        多个相互独立的请求可连续发出，总耗时约为一次往返。
+        
+        Returns:
+            完成时结果为响应字典的 Future
+        """
+        return self._submit(packet_type, _json_dumps(data))
+    
     def send_request(self, packet_type: PacketType, 
                      data: dict, timeout: float = 30) -> Optional[dict]:
         """
@@ -112,26 +266,7 @@ class NetworkClient:
         Returns:
             响应数据字典
         """
-        if not self.is_connected:
-            return {'success': False, 'error': '未连接到服务器'}
-        
-        try:
-            # 发送请求
-            payload = json.dumps(data).encode('utf-8')
-            if not self.channel.send(packet_type, payload):
-                return {'success': False, 'error': '发送请求失败'}
-            
-            # 等待响应
-            result = self.channel.recv(timeout)
-            if not result:
-                return {'success': False, 'error': '接收响应超时'}
-            
-            response_type, response_data = result
-            return json.loads(response_data.decode('utf-8'))
-        except json.JSONDecodeError as e:
-            return {'success': False, 'error': f'响应解析失败: {e}'}
-        except Exception as e:
-            return {'success': False, 'error': str(e)}
+        return self.wait_response(self.send_request_async(packet_type, data), timeout)
     
     def send_binary(self, packet_type: PacketType, 
                     data: bytes, timeout: float = 30) -> Optional[dict]:
@@ -146,21 +281,8 @@ class NetworkClient:
         Returns:
             响应数据字典
         """
-        if not self.is_connected:
-            return {'success': False, 'error': '未连接到服务器'}
-        
-        try:
-            if not self.channel.send(packet_type, data):
-                return {'success': False, 'error': '发送数据失败'}
-            
-            result = self.channel.recv(timeout)
-            if not result:
-                return {'success': False, 'error': '接收响应超时'}
-            
-            response_type, response_data = result
-            return json.loads(response_data.decode('utf-8'))
-        except Exception as e:
-            return {'success': False, 'error': str(e)}
+        # 二进制载荷多为已加密的文件数据，压缩无收益
+        return self.wait_response(self._submit(packet_type, data, compress=False), timeout)
     
     # ============ API 方法 ============
     
@@ -176,26 +298,36 @@ class NetworkClient:
             'password_hash': password_hash,
             'public_key': public_key,
             'encrypted_private_key': encrypted_private_key,
-            'private_key_salt': '',
             'encrypted_master_key': encrypted_master_key,
             'master_key_salt': master_key_salt,
             'recovery_key_encrypted': recovery_key_encrypted,
             'recovery_key_salt': recovery_key_salt,
-            'recovery_key_hash': recovery_key_hash
+            'recovery_key_hash': recovery_key_hash,
+            'encoding': BINARY_ENCODING
         })
     
-    def login_password(self, username: str, password: str) -> dict:
-        """密码登录"""
+    def login_password(self, username: str, password_prehash: str) -> dict:
+        """
+        密码登录
+        
+        Args:
+            username: 用户名
+            password_prehash: PasswordManager.prehash_password 的结果；
+                明文密码只用于本地解锁主密钥，不会发送给服务器
+        """
         result = self.send_request(PacketType.AUTH_REQUEST, {
             'login_type': 'password',
             'username': username,
-            'password': password  # 发送预哈希后的密码
+            'password': password_prehash,
+            'encoding': BINARY_ENCODING
         })
         if result.get('success'):
+            self._clear_key_caches()
+            # 仅缓存预哈希，用于静默重连
             self._auth_cache = {
                 'login_type': 'password',
                 'username': username,
-                'password': password,
+                'password_prehash': password_prehash,
                 'timestamp': time.time()
             }
         return result
@@ -214,11 +346,15 @@ class NetworkClient:
     
     def login_email(self, email: str, code: str) -> dict:
         """Email 验证码登录"""
-        return self.send_request(PacketType.AUTH_REQUEST, {
+        result = self.send_request(PacketType.AUTH_REQUEST, {
             'login_type': 'email',
             'email': email,
-            'code': code
+            'code': code,
+            'encoding': BINARY_ENCODING
         })
+        if result.get('success'):
+            self._clear_key_caches()
+        return result
     
     def request_email_code(self, email: str, purpose: str = 'login') -> dict:
         """请求发送验证码"""
@@ -231,7 +367,8 @@ class NetworkClient:
         """获取用户恢复数据"""
         return self.send_request(PacketType.AUTH_REQUEST, {
             'login_type': 'recovery_data',
-            'username': username
+            'username': username,
+            'encoding': BINARY_ENCODING
         })
     
     def reset_password(self, username: str = None, email: str = None, 
@@ -247,12 +384,17 @@ class NetworkClient:
             'recovery_key': recovery_key,
             'new_password_hash': new_password_hash,
             'new_encrypted_master_key': new_encrypted_master_key,
-            'new_master_key_salt': new_master_key_salt
+            'new_master_key_salt': new_master_key_salt,
+            'encoding': BINARY_ENCODING
         })
     
     def get_file_list(self, parent_id: int = None, group_id: int = None) -> dict:
         """获取文件列表"""
-        return self.send_request(PacketType.FILE_LIST_REQUEST, {
+        return self.wait_response(self.get_file_list_async(parent_id, group_id))
+    
+    def get_file_list_async(self, parent_id: int = None, group_id: int = None) -> Future:
+        """发送获取文件列表请求，不等待响应"""
+        return self.send_request_async(PacketType.FILE_LIST_REQUEST, {
             'parent_id': parent_id,
             'group_id': group_id
         })
@@ -271,10 +413,79 @@ class NetworkClient:
             'path': '/' + filename
         })
     
+    def _upload_payload(self, upload_id: str, data: bytes) -> memoryview:
+        """
+        将 upload_id 头部与数据块拼入复用的发送缓冲区
+        
+        头部只在 upload_id 变化或缓冲区扩容时写入，数据块直接复制到头部之后，
+        避免每个数据块分配一个新的 bytes 对象。返回的视图在下次调用前有效。
+        """
+        header_len = len(upload_id)  # upload_id 为 ASCII hex 字符串
+        total = header_len + len(data)
+        buf = self._upload_buf
+        if len(buf) < total:
+            buf = self._upload_buf = bytearray(total)
+            self._upload_buf_id = None
+        if self._upload_buf_id != upload_id:
+            buf[:header_len] = upload_id.encode('ascii')
+            self._upload_buf_id = upload_id
+        buf[header_len:total] = data
+        return memoryview(buf)[:total]
+    
     def upload_file_data(self, upload_id: str, data: bytes) -> dict:
         """上传文件数据块"""
-        payload = upload_id.encode('utf-8') + data
-        return self.send_binary(PacketType.FILE_UPLOAD_DATA, payload)
+        with self._upload_payload(upload_id, data) as payload:
+            return self.send_binary(PacketType.FILE_UPLOAD_DATA, payload)
+    
+    def upload_file_data_pipelined(self, upload_id: str, chunks: Iterable[bytes],
+                                   window: int = UPLOAD_WINDOW,
+                                   on_progress: Callable[[int], bool] = None,
+                                   timeout: float = 30) -> dict:
+        """
+        流水线上传文件数据块
+        
+        连续发送最多 window 个数据块后才等待确认，隐藏每块一次的往返延迟。
+        
+        Args:
+            upload_id: 上传 ID
+            chunks: 数据块迭代器
+            window: 最大未确认数据块数
+            on_progress: 每收到一个确认时以已确认字节数调用，返回 False 则停止发送
+            timeout: 等待单个确认的超时时间
+            
+        Returns:
+            响应数据字典；被 on_progress 中止时包含 'cancelled': True
+        """
+        pending = deque()  # (数据块大小, Future)
+        acked = 0
+        
+        def wait_ack() -> Optional[dict]:
+            """等待最早的在途数据块确认，失败或取消时返回结果字典"""
+            nonlocal acked
+            size, future = pending.popleft()
+            response = self.wait_response(future, timeout)
+            if not response.get('success'):
+                return {'success': False, 'error': response.get('error', '上传数据失败')}
+            acked += size
+            if on_progress is not None and on_progress(acked) is False:
+                return {'success': False, 'cancelled': True}
+            return None
+        
+        # 中途退出时无需收取剩余确认：读线程会将其交给对应的 Future
+        for chunk in chunks:
+            with self._upload_payload(upload_id, chunk) as payload:
+                future = self._submit(PacketType.FILE_UPLOAD_DATA, payload, compress=False)
+            pending.append((len(chunk), future))
+            if len(pending) >= window:
+                failed = wait_ack()
+                if failed:
+                    return failed
+        
+        while pending:
+            failed = wait_ack()
+            if failed:
+                return failed
+        return {'success': True, 'size': acked}
     
     def upload_file_end(self, upload_id: str) -> dict:
         """结束文件上传"""
@@ -282,6 +493,25 @@ class NetworkClient:
             'upload_id': upload_id
         })
     
+    def upload_file_oneshot(self, filename: str, encrypted_file_key: str,
+                            data: bytes, parent_id: int = None,
+                            group_id: int = None) -> dict:
+        """
+        小文件单包上传（开始、数据、结束合并为一次往返）
+        
+        载荷格式: 元数据长度(4, 大端) + 元数据 JSON + 加密文件数据
+        """
+        header = _json_dumps({
+            'filename': filename,
+            'size': len(data),
+            'encrypted_file_key': encrypted_file_key,
+            'parent_id': parent_id,
+            'group_id': group_id,
+            'path': '/' + filename
+        })
+        payload = len(header).to_bytes(4, 'big') + header + data
+        return self.send_binary(PacketType.FILE_UPLOAD_ONESHOT, payload, timeout=60)
+    
     def upload_file_cancel(self, upload_id: str) -> dict:
         """取消文件上传"""
         return self.send_request(PacketType.FILE_UPLOAD_CANCEL, {
@@ -335,6 +565,10 @@ class NetworkClient:
         """获取群组列表"""
         return self.send_request(PacketType.GROUP_LIST_REQUEST, {})
     
+    def get_groups_async(self) -> Future:
+        """发送获取群组列表请求，不等待响应"""
+        return self.send_request_async(PacketType.GROUP_LIST_REQUEST, {})
+    
     def invite_to_group(self, group_id: int, username: str,
                         encrypted_group_key: str) -> dict:
         """邀请用户加入群组"""
@@ -346,13 +580,19 @@ class NetworkClient:
     
     def respond_invitation(self, invitation_id: int, accept: bool) -> dict:
         """响应群组邀请"""
-        return self.send_request(PacketType.GROUP_JOIN_REQUEST, {
+        result = self.send_request(PacketType.GROUP_JOIN_REQUEST, {
             'invitation_id': invitation_id,
             'accept': accept
         })
+        if accept and result.get('success') and result.get('group_id') is not None:
+            with self._key_cache_lock:
+                self._group_key_cache.pop(result['group_id'], None)
+        return result
     
     def leave_group(self, group_id: int) -> dict:
         """退出群组"""
+        with self._key_cache_lock:
+            self._group_key_cache.pop(group_id, None)
         return self.send_request(PacketType.GROUP_LEAVE_REQUEST, {
             'group_id': group_id
         })
@@ -364,21 +604,53 @@ class NetworkClient:
         })
     
     def get_group_key(self, group_id: int) -> dict:
-        """获取群组密钥"""
-        return self.send_request(PacketType.GROUP_KEY_REQUEST, {
+        """获取群组密钥（成功结果缓存到退出群组或重新登录）"""
+        with self._key_cache_lock:
+            cached = self._group_key_cache.get(group_id)
+        if cached is not None:
+            return cached
+        
+        result = self.send_request(PacketType.GROUP_KEY_REQUEST, {
             'group_id': group_id
         })
+        if result.get('success'):
+            with self._key_cache_lock:
+                self._group_key_cache[group_id] = result
+        return result
     
     def get_user_public_key(self, username: str) -> dict:
-        """获取用户公钥"""
-        return self.send_request(PacketType.USER_PUBLIC_KEY_REQUEST, {
+        """获取用户公钥（成功结果按 LRU 缓存）"""
+        with self._key_cache_lock:
+            cached = self._public_key_cache.get(username)
+            if cached is not None:
+                self._public_key_cache.move_to_end(username)
+                return cached
+        
+        result = self.send_request(PacketType.USER_PUBLIC_KEY_REQUEST, {
             'username': username
         })
+        if result.get('success'):
+            with self._key_cache_lock:
+                self._public_key_cache[username] = result
+                self._public_key_cache.move_to_end(username)
+                while len(self._public_key_cache) > self.PUBLIC_KEY_CACHE_SIZE:
+                    self._public_key_cache.popitem(last=False)
+        return result
+    
+    def _clear_key_caches(self):
+        """清空公钥、群组密钥缓存（登录新账号时调用）"""
+        with self._key_cache_lock:
+            self._public_key_cache.clear()
+            self._group_key_cache.clear()
     
     def get_notification_counts(self) -> dict:
         """获取未读通知计数"""
         return self.send_request(PacketType.NOTIFICATION_COUNT_REQUEST, {})
     
+    def get_notification_counts_async(self) -> Future:
+        """发送获取未读通知计数请求，不等待响应"""
+        return self.send_request_async(PacketType.NOTIFICATION_COUNT_REQUEST, {})
+    
     def mark_notification_read(self, notification_type: str, group_id: int = None) -> dict:
         """标记通知已读"""
         return self.send_request(PacketType.NOTIFICATION_READ_REQUEST, {
@@ -1,3 +1,10 @@
+import hashlib
+import string
+import time
+from collections import OrderedDict, defaultdict, deque
+from concurrent.futures import ThreadPoolExecutor, wait
+from functools import lru_cache
+
 from PyQt6.QtCore import Qt, pyqtSignal, QTimer
 from PyQt6.QtGui import QColor, QPainter, QLinearGradient, QPainterPath, QFont
 from PyQt6.QtWidgets import (
@@ -10,12 +17,102 @@ from PyQt6.QtGui import QIcon, QPixmap
 from pathlib import Path
 from .styles import StyleSheet
 from client.config import config as app_config
+from auth.password import PasswordManager
+from crypto.secure_memory import LockedBuffer
+
+
+# 密钥派生、RSA 密钥生成、登录请求等耗时操作在后台线程执行，避免阻塞界面
+_crypto_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="login-crypto")
+
+# 注册时的邮箱格式校验（等价于 ^[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}$，
+# 用集合判断代替正则，避免粘贴超长字符串时的回溯）
+_EMAIL_LOCAL_CHARS = frozenset(string.ascii_letters + string.digits + "._%+-")
+_EMAIL_DOMAIN_CHARS = frozenset(string.ascii_letters + string.digits + ".-")
+_EMAIL_TLD_CHARS = frozenset(string.ascii_letters)
+
+
+def _valid_email(email: str) -> bool:
+    """校验邮箱格式：本地部分@域名.顶级域名（顶级域名至少 2 个字母）"""
+    at = email.find('@')
+    if at < 1:
+        return False
+    local, domain = email[:at], email[at + 1:]
+    dot = domain.rfind('.')
+    if dot < 1 or len(domain) - dot - 1 < 2:
+        return False
+    return (_EMAIL_LOCAL_CHARS.issuperset(local)
+            and _EMAIL_DOMAIN_CHARS.issuperset(domain[:dot])
+            and _EMAIL_TLD_CHARS.issuperset(domain[dot + 1:]))
+
+
+# 常用枚举（导入时解析一次，避免构建界面时反复经由 PyQt6 枚举代理查找）
+_PW_ECHO = QLineEdit.EchoMode.Password
+_ALIGN_CENTER = Qt.AlignmentFlag.AlignCenter
+_ALIGN_LEFT = Qt.AlignmentFlag.AlignLeft
+_MB_YES = QMessageBox.StandardButton.Yes
+_MB_NO = QMessageBox.StandardButton.No
+
+
+def _password_edit(placeholder: str) -> QLineEdit:
+    """创建密码输入框"""
+    edit = QLineEdit()
+    edit.setPlaceholderText(placeholder)
+    edit.setEchoMode(_PW_ECHO)
+    return edit
+
+
+def _vbox(parent, *items, spacing: int = 12, margins: tuple = None) -> QVBoxLayout:
+    """
+    创建垂直布局并依次加入部件
+    
+    Args:
+        parent: 布局所属部件
+        items: QWidget / QLayout，或 (QWidget, 对齐方式) 元组
+        spacing: 间距
+        margins: 外边距 (左, 上, 右, 下)，为 None 时保留默认值
+    """
+    layout = QVBoxLayout(parent)
+    layout.setSpacing(spacing)
+    if margins is not None:
+        layout.setContentsMargins(*margins)
+    for item in items:
+        if isinstance(item, tuple):
+            layout.addWidget(item[0], alignment=item[1])
+        elif isinstance(item, QWidget):
+            layout.addWidget(item)
+        else:
+            layout.addLayout(item)
+    return layout
+
+
+_ICON_PATH = Path(__file__).parent.parent / "resources" / "icon.png"
+
+
+@lru_cache(maxsize=1)
+def _window_icon() -> QIcon:
+    """窗口图标（进程内只加载一次）"""
+    return QIcon(str(_ICON_PATH))
+
+
+@lru_cache(maxsize=1)
+def _logo_pixmap() -> QPixmap:
+    """登录页 Logo（解码、平滑缩放一次后复用；需在 QApplication 创建后调用）"""
+    return QPixmap(str(_ICON_PATH)).scaled(
+        56, 56,
+        Qt.AspectRatioMode.KeepAspectRatio,
+        Qt.TransformationMode.SmoothTransformation
+    )
 
 class GradientWaveWidget(QWidget):
     """动态波浪渐变背景部件"""
 
-    def __init__(self, parent=None):
+    FRAME_INTERVAL = 50  # 毫秒，20 FPS
+
+    def __init__(self, parent=None, show_waves: bool = True):
         super().__init__(parent)
+        self.show_waves = show_waves  # 是否在渐变上叠加波浪曲线
+        # 渐变位图铺满整个部件，重绘时无需先绘制父部件背景
+        self.setAttribute(Qt.WidgetAttribute.WA_OpaquePaintEvent)
         self.colors = [
             QColor("#132843"),  # Color 01
             QColor("#3966A2"),  # Color 02
@@ -23,21 +120,84 @@ class GradientWaveWidget(QWidget):
             QColor("#D6DEEB"),  # Color 04
             QColor("#F8F6F6")  # Color 05
         ]
-        self.offset = 0
         self.wave_speed = 0.5
         self.wave_height = 20
+        # 偏移量以 wave_speed 为步长在 0~100 间循环，用整数相位表示
+        self.phase = 0
+        self._phase_count = round(100 / self.wave_speed)
+        # 颜色停止点的基准位置（0~100）与相邻颜色的中间色（使过渡更平滑），
+        # 每个相位的 (位置, 颜色) 停止点表预先算好，绘制时直接查表
+        num_colors = len(self.colors)
+        stop_base = [i / (num_colors - 1) * 100 for i in range(num_colors)]
+        mid_base = [(i + 0.5) / (num_colors - 1) * 100 for i in range(num_colors - 1)]
+        mid_colors = [
+            QColor((a.red() + b.red()) // 2, (a.green() + b.green()) // 2, (a.blue() + b.blue()) // 2)
+            for a, b in zip(self.colors, self.colors[1:])
+        ]
+        bases = list(zip(stop_base + mid_base, self.colors + mid_colors))
+        self._phase_stops = [
+            [((base + phase * self.wave_speed) % 100 / 100, color) for base, color in bases]
+            for phase in range(self._phase_count)
+        ]
+        # 上一次绘制的 (尺寸, 缩放比, 相位)；同一相位被再次重绘时才渲染位图缓存，
+        # 动画中每帧相位都不同，直接填充渐变，避免每帧分配并渲染整幅位图
+        self._bg_key = None
+        self._bg_pixmap = None
 
-        # 启动动画定时器
+        # 动画定时器，仅在部件可见时运行（见 showEvent / hideEvent）
         self.timer = QTimer(self)
+        self.timer.setInterval(self.FRAME_INTERVAL)
         self.timer.timeout.connect(self.update_wave)
-        self.timer.start(50)  # 20 FPS
+
+    def showEvent(self, event):
+        """显示时启动动画"""
+        super().showEvent(event)
+        self.timer.start()
+
+    def hideEvent(self, event):
+        """隐藏或最小化时停止动画"""
+        self.timer.stop()
+        super().hideEvent(event)
+
+    @property
+    def offset(self) -> float:
+        """当前偏移量（0~100）"""
+        return self.phase * self.wave_speed
 
     def update_wave(self):
-        """更新波浪偏移量"""
-        self.offset += self.wave_speed
-        if self.offset > 100:  # 重置偏移量保持平滑循环
-            self.offset = 0
-        self.update()
+        """更新波浪相位"""
+        self.phase = (self.phase + 1) % self._phase_count  # 循环保持平滑
+        if not self.visibleRegion().isEmpty():
+            self.update()
+
+    def _gradient(self, width: int, height: int, phase: int) -> QLinearGradient:
+        """创建给定相位的主渐变"""
+        # 创建主渐变（从上到下）
+        main_gradient = QLinearGradient(0, 0, width, height)
+
+        # 颜色停止点随相位循环移动，制造波浪效果
+        for pos, color in self._phase_stops[phase]:
+            main_gradient.setColorAt(pos, color)
+        return main_gradient
+
+    def _paint_background(self, painter: QPainter, width: int, height: int):
+        """绘制渐变背景：相位变化后的首次绘制直接填充，同一相位的重复绘制复用位图"""
+        ratio = self.devicePixelRatioF()
+        key = (width, height, ratio, self.phase)
+        if key != self._bg_key:
+            self._bg_key = key
+            self._bg_pixmap = None
+            painter.fillRect(0, 0, width, height, self._gradient(width, height, self.phase))
+            return
+
+        if self._bg_pixmap is None:
+            pixmap = QPixmap(max(1, round(width * ratio)), max(1, round(height * ratio)))
+            pixmap.setDevicePixelRatio(ratio)
+            pixmap_painter = QPainter(pixmap)
+            pixmap_painter.fillRect(0, 0, width, height, self._gradient(width, height, self.phase))
+            pixmap_painter.end()
+            self._bg_pixmap = pixmap
+        painter.drawPixmap(0, 0, self._bg_pixmap)
 
     def paintEvent(self, event):
         """绘制波浪渐变背景"""
@@ -47,29 +207,11 @@ class GradientWaveWidget(QWidget):
         width = self.width()
         height = self.height()
 
-        # 创建主渐变（从上到下）
-        main_gradient = QLinearGradient(0, 0, width, height)
-
-        # 计算颜色停止点，制造波浪效果
-        num_colors = len(self.colors)
-        for i in range(num_colors):
-            # 计算波浪偏移位置
-            wave_pos = (i / (num_colors - 1) * 100 + self.offset) % 100 / 100
-            main_gradient.setColorAt(wave_pos, self.colors[i])
-
-            # 添加一些中间渐变点使过渡更平滑
-            if i < num_colors - 1:
-                mid_pos = ((i + 0.5) / (num_colors - 1) * 100 + self.offset) % 100 / 100
-                # 创建中间颜色（混合两个相邻颜色）
-                mid_color = QColor(
-                    (self.colors[i].red() + self.colors[i + 1].red()) // 2,
-                    (self.colors[i].green() + self.colors[i + 1].green()) // 2,
-                    (self.colors[i].blue() + self.colors[i + 1].blue()) // 2
-                )
-                main_gradient.setColorAt(mid_pos, mid_color)
-
-        # 填充渐变
-        painter.fillRect(0, 0, width, height, main_gradient)
+        # 渐变背景
+        self._paint_background(painter, width, height)
+        if not self.show_waves:
+            painter.end()
+            return
 
         # 添加一些波浪曲线
         painter.setPen(Qt.PenStyle.NoPen)
@@ -106,12 +248,43 @@ class LoginDialog(QDialog):
     """登录对话框"""
     login_success = pyqtSignal(dict)
     
+    # 解锁结果缓存：同一口令重试时（如重置请求失败后重新提交）跳过密钥派生
+    UNLOCK_CACHE_TTL = 60   # 秒
+    UNLOCK_CACHE_SIZE = 4
+    
+    # 输入框内容长度上限，超出的输入不发送到服务器
+    MAX_INPUT_LENGTH = 1024
+    
+    # 验证码请求频率限制（按邮箱，登录与重置密码共用）：
+    # 两次请求至少间隔 60 秒，一小时内最多 5 次
+    CODE_REQUEST_INTERVAL = 60
+    CODE_REQUEST_WINDOW = 3600
+    CODE_REQUEST_MAX = 5
+    
+    # 登录失败退避：连续失败 n 次后需等待 min(2^n, 60) 秒才能再次提交
+    LOGIN_BACKOFF_MAX = 60
+    
     def __init__(self, network_client, key_manager, device_trust=None, parent=None):
         super().__init__(parent)
         self.network = network_client
         self.key_manager = key_manager
         self.device_trust = device_trust
-        self._pending_trust_data = None  # 待确认信任的数据
+        # 待确认信任设备的登录结果与邮箱
+        self._pending_trust_result = None
+        self._pending_trust_email = None
+        self._trust_mbox = None  # 信任设备询问框（首次使用时创建）
+        # 页面索引 -> 该页的输入框 / 验证码按钮（页面创建时登记）
+        self._page_inputs: dict = {}
+        self._page_code_buttons: dict = {}
+        self._current_page = 0
+        # 信任此设备的邮箱快照，页面切换或信任状态变化时置空重建
+        self._trusted_emails_cache = None
+        # sha256(用户名, 口令, 盐) -> (时间, 锁定内存中的主密钥)，对话框关闭时清零
+        self._unlock_cache: OrderedDict = OrderedDict()
+        # 邮箱 -> 最近的验证码请求时间
+        self._code_request_log = defaultdict(lambda: deque(maxlen=self.CODE_REQUEST_MAX))
+        self._login_fail_count = 0
+        self._next_login_allowed = 0.0
         self.setWindowTitle("安全网盘 - 登录")
         self.setMinimumSize(400, 600)
         self.resize(900, 835)  # 初始大小
@@ -127,14 +300,9 @@ class LoginDialog(QDialog):
         main_layout.setContentsMargins(0, 0, 0, 0)  # 去除边距以便渐变区域填充
         main_layout.setSpacing(0)
 
-        # 渐变波浪背景区域
-        self.gradient_widget = GradientWaveWidget()
-        # 渐变区域的高度约为整个对话框的1/3
-        gradient_height = int(self.height() * 0.3)
-        self.gradient_widget.setFixedHeight(gradient_height)
-
-        # 渐变区域容器，包含内容
-        gradient_container = QWidget()
+        # 渐变区域容器，包含内容（自身绘制动态渐变背景）
+        self.gradient_widget = GradientWaveWidget(show_waves=False)
+        gradient_container = self.gradient_widget
         gradient_container.setObjectName("gradientContainer")
         gradient_layout = QVBoxLayout(gradient_container)
         gradient_layout.setContentsMargins(0, 0, 0, 0)
@@ -153,47 +321,27 @@ class LoginDialog(QDialog):
         logo_layout = QHBoxLayout(logo_container)
         logo_layout.setContentsMargins(0, 0, 0, 0)
         logo_layout.setSpacing(12)
-        logo_layout.setAlignment(Qt.AlignmentFlag.AlignCenter)
+        logo_layout.setAlignment(_ALIGN_CENTER)
         
-        icon_path = Path(__file__).parent.parent / "resources" / "icon.png"
-        if icon_path.exists():
+        if _ICON_PATH.exists():
             # 设置窗口图标
-            self.setWindowIcon(QIcon(str(icon_path)))
+            self.setWindowIcon(_window_icon())
             # Logo 图片
-            logo_pixmap = QPixmap(str(icon_path)).scaled(
-                56, 56, 
-                Qt.AspectRatioMode.KeepAspectRatio, 
-                Qt.TransformationMode.SmoothTransformation
-            )
             logo_icon = QLabel()
-            logo_icon.setPixmap(logo_pixmap)
+            logo_icon.setPixmap(_logo_pixmap())
             logo_layout.addWidget(logo_icon)
         
         logo_text = QLabel("安全网盘")
-        logo_text.setStyleSheet("""
-            QLabel {
-                font-size: 32px;
-                font-weight: bold;
-                color: white;
-                background: transparent;
-            }
-        """)
+        logo_text.setObjectName("logoText")
         logo_layout.addWidget(logo_text)
         
-        content_layout.addWidget(logo_container, alignment=Qt.AlignmentFlag.AlignCenter)
+        content_layout.addWidget(logo_container, alignment=_ALIGN_CENTER)
         
         
         # 连接状态标签
         self.connection_status = QLabel("⚪ 正在连接服务器...")
-        self.connection_status.setAlignment(Qt.AlignmentFlag.AlignCenter)
-        self.connection_status.setStyleSheet("""
-            QLabel {
-                color: rgba(255, 255, 255, 0.9);
-                font-size: 14px;
-                font-weight: 500;
-                text-shadow: 0 1px 2px rgba(0, 0, 0, 0.1);
-            }
-        """)
+        self.connection_status.setObjectName("connectionStatus")
+        self.connection_status.setAlignment(_ALIGN_CENTER)
         content_layout.addWidget(self.connection_status)
 
         content_layout.addSpacing(10)
@@ -201,21 +349,11 @@ class LoginDialog(QDialog):
         gradient_layout.addLayout(content_layout)
         gradient_layout.addStretch()
 
-        # 将渐变部件设置为渐变容器的背景
-        gradient_container.background_widget = self.gradient_widget
         main_layout.addWidget(gradient_container)
 
         # 创建白色内容区域（覆盖剩余部分）
         content_widget = QWidget()
         content_widget.setObjectName("contentWidget")
-        content_widget.setStyleSheet("""
-            QWidget#contentWidget {
-                background: white;
-                border-top-left-radius: 20px;
-                border-top-right-radius: 20px;
-                margin-top: -5px;
-            }
-        """)
 
         content_layout_inner = QVBoxLayout(content_widget)
         content_layout_inner.setContentsMargins(40, 30, 40, 40)
@@ -223,9 +361,17 @@ class LoginDialog(QDialog):
 
         self.stack = QStackedWidget()
         self.stack.addWidget(self._create_login_page())  # 0 - 密码登录
-        self.stack.addWidget(self._create_register_page())  # 1 - 注册
-        self.stack.addWidget(self._create_recovery_page())  # 2 - 恢复密码
-        self.stack.addWidget(self._create_email_login_page())  # 3 - 邮箱验证码登录
+        self.stack.addWidget(QWidget())  # 1 - 注册（首次打开时创建）
+        self.stack.addWidget(QWidget())  # 2 - 恢复密码（首次打开时创建）
+        self.stack.addWidget(QWidget())  # 3 - 邮箱验证码登录（首次打开时创建）
+        # 多数用户只使用密码登录页，其余页面首次切换到时再创建
+        self._lazy_pages = {
+            1: self._create_register_page,
+            2: self._create_recovery_page,
+            3: self._create_email_login_page,
+        }
+        # 一次性流程的页面，离开后释放，再次打开时重新创建
+        self._release_on_leave = {1: self._create_register_page}
 
         # 页面切换时刷新UI状态
         self.stack.currentChanged.connect(self._on_page_changed)
@@ -250,97 +396,6 @@ class LoginDialog(QDialog):
 
         main_layout.addWidget(content_widget)
 
-
-        # 初始化动画状态
-        gradient_container._animation_time = 0.0
-
-        # 初始化颜色数组
-        gradient_container._colors = [
-            QColor("#132843"),  # 深蓝色
-            QColor("#3966A2"),  # 蓝色
-            QColor("#6191D3"),  # 浅蓝色
-            QColor("#D6DEEB"),  # 淡蓝色
-            QColor("#F8F6F6")  # 近白色
-        ]
-
-        # 创建动画定时器
-        gradient_container._timer = QTimer(gradient_container)
-        gradient_container._timer.timeout.connect(lambda: (
-            setattr(gradient_container, '_animation_time',
-                    (gradient_container._animation_time + 0.005) % 1.0),
-            gradient_container.update()
-        ))
-        gradient_container._timer.start(16)  # 约60fps
-
-        # 重写渐变容器的绘制事件
-        def gradient_container_paint_event(event):
-            # 直接绘制渐变背景，不通过render
-            painter = QPainter(gradient_container)
-            painter.setRenderHint(QPainter.RenderHint.Antialiasing)
-
-            # 获取容器尺寸
-            width = gradient_container.width()
-            height = gradient_container.height()
-
-            # 创建主渐变
-            main_gradient = QLinearGradient(0, 0, width, height)
-
-            # 动态计算偏移量 - 需要保存偏移状态
-            if not hasattr(gradient_container, '_wave_offset'):
-                gradient_container._wave_offset = 0
-                gradient_container._wave_timer = QTimer(gradient_container)
-                gradient_container._wave_timer.timeout.connect(
-                    lambda: (
-                        setattr(gradient_container, '_wave_offset',
-                                (gradient_container._wave_offset + 0.5) % 100),
-                        gradient_container.update()
-                    )
-                )
-                gradient_container._wave_timer.start(50)
-
-            offset = gradient_container._wave_offset
-            colors = [
-                QColor("#132843"),  # Color 01
-                QColor("#3966A2"),  # Color 02
-                QColor("#6191D3"),  # Color 03
-                QColor("#D6DEEB"),  # Color 04
-                QColor("#F8F6F6")  # Color 05
-            ]
-
-            # 计算颜色停止点，制造波浪效果
-            num_colors = len(colors)
-            for i in range(num_colors):
-                # 计算波浪偏移位置
-                wave_pos = (i / (num_colors - 1) * 100 + offset) % 100 / 100
-                main_gradient.setColorAt(wave_pos, colors[i])
-
-                # 添加中间渐变点使过渡更平滑
-                if i < num_colors - 1:
-                    mid_pos = ((i + 0.5) / (num_colors - 1) * 100 + offset) % 100 / 100
-                    # 创建中间颜色（混合两个相邻颜色）
-                    mid_color = QColor(
-                        (colors[i].red() + colors[i + 1].red()) // 2,
-                        (colors[i].green() + colors[i + 1].green()) // 2,
-                        (colors[i].blue() + colors[i + 1].blue()) // 2
-                    )
-                    main_gradient.setColorAt(mid_pos, mid_color)
-
-            # 填充渐变
-            painter.fillRect(0, 0, width, height, main_gradient)
-
-            # 调用原始的paintEvent绘制内容
-            QWidget.paintEvent(gradient_container, event)
-
-        gradient_container.paintEvent = gradient_container_paint_event
-
-    def resizeEvent(self, event):
-        """处理窗口大小变化"""
-        super().resizeEvent(event)
-        # 动态调整渐变区域高度
-        gradient_height = int(self.height() * 0.3)
-        self.gradient_widget.setFixedHeight(gradient_height)
-        self.gradient_widget.update()
-
     def _show_settings_dialog(self):
         """显示服务器设置对话框"""
         dialog = QDialog(self)
@@ -352,20 +407,13 @@ class LoginDialog(QDialog):
 
         # 居中标题
         title_label = QLabel("服务器设置")
-        title_label.setAlignment(Qt.AlignmentFlag.AlignCenter)
-        title_label.setStyleSheet("""
-            QLabel {
-                font-size: 18px;
-                font-weight: 500;
-                color: #202124;
-                margin-bottom: 8px;
-            }
-        """)
+        title_label.setObjectName("settingsTitle")
+        title_label.setAlignment(_ALIGN_CENTER)
         layout.addWidget(title_label)
 
         # 服务器设置表单
         form_layout = QFormLayout()
-        form_layout.setFormAlignment(Qt.AlignmentFlag.AlignCenter)  # 表单居中
+        form_layout.setFormAlignment(_ALIGN_CENTER)  # 表单居中
         form_layout.setLabelAlignment(Qt.AlignmentFlag.AlignRight)  # 标签右对齐
 
         self.host_combo = QComboBox()
@@ -391,34 +439,21 @@ class LoginDialog(QDialog):
         host_container = QWidget()
         host_layout = QHBoxLayout(host_container)
         host_layout.setContentsMargins(0, 0, 0, 0)
-        host_layout.addWidget(self.host_combo, alignment=Qt.AlignmentFlag.AlignCenter)
+        host_layout.addWidget(self.host_combo, alignment=_ALIGN_CENTER)
 
         form_layout.addRow("地址端口:", host_container)
         layout.addLayout(form_layout)
 
         # 测试连接按钮
         test_conn_btn = QPushButton("测试连接")
-        test_conn_btn.setStyleSheet("""
-            QPushButton {
-                background: #1a73e8;
-                color: white;
-                border: none;
-                border-radius: 4px;
-                padding: 10px 20px;
-                font-weight: 500;
-                min-width: 100px;
-            }
-            QPushButton:hover {
-                background: #1557b0;
-            }
-        """)
+        test_conn_btn.setObjectName("testConnectionButton")
         test_conn_btn.clicked.connect(lambda: self._test_connection_in_dialog(dialog))
 
         # 将按钮放在容器中居中
         btn_container = QWidget()
         btn_layout = QHBoxLayout(btn_container)
         btn_layout.setContentsMargins(0, 0, 0, 0)
-        btn_layout.addWidget(test_conn_btn, alignment=Qt.AlignmentFlag.AlignCenter)
+        btn_layout.addWidget(test_conn_btn, alignment=_ALIGN_CENTER)
         layout.addWidget(btn_container)
 
         # 按钮框
@@ -432,7 +467,7 @@ class LoginDialog(QDialog):
         button_container = QWidget()
         button_container_layout = QHBoxLayout(button_container)
         button_container_layout.setContentsMargins(0, 0, 0, 0)
-        button_container_layout.addWidget(button_box, alignment=Qt.AlignmentFlag.AlignCenter)
+        button_container_layout.addWidget(button_box, alignment=_ALIGN_CENTER)
         layout.addWidget(button_container)
 
         dialog.exec()
@@ -529,11 +564,7 @@ class LoginDialog(QDialog):
 
     def _create_login_page(self):
         page = QWidget()
-        layout = QVBoxLayout(page)
-        layout.setContentsMargins(0, 1, 0, 0)
-        layout.setSpacing(12)
-
-        layout.addWidget(QLabel("登录您的账号"))
+        layout = _vbox(page, QLabel("登录您的账号"), margins=(0, 1, 0, 0))
 
         self.username_input = QLineEdit()
         self.username_input.setPlaceholderText("用户名")
@@ -541,9 +572,7 @@ class LoginDialog(QDialog):
             self.username_input.setText(app_config.last_username)
         layout.addWidget(self.username_input)
 
-        self.password_input = QLineEdit()
-        self.password_input.setPlaceholderText("密码")
-        self.password_input.setEchoMode(QLineEdit.EchoMode.Password)
+        self.password_input = _password_edit("密码")
         layout.addWidget(self.password_input)
 
         login_btn = QPushButton("登录")
@@ -554,22 +583,25 @@ class LoginDialog(QDialog):
         # 邮箱验证码登录按钮
         email_login_btn = QPushButton("📧 使用邮箱验证码登录")
         email_login_btn.setObjectName("linkButton")
-        email_login_btn.clicked.connect(lambda: self.stack.setCurrentIndex(3))
+        email_login_btn.clicked.connect(lambda: self._show_page(3))
         layout.addWidget(email_login_btn)
 
         # 忘记密码按钮
         forgot_btn = QPushButton("忘记密码")
         forgot_btn.setObjectName("linkButton")
-        forgot_btn.clicked.connect(lambda: self.stack.setCurrentIndex(2))
+        forgot_btn.clicked.connect(lambda: self._show_page(2))
         layout.addWidget(forgot_btn)
 
         layout.addStretch()
 
         reg_btn = QPushButton("没有账号？点击注册")
         reg_btn.setObjectName("linkButton")
-        reg_btn.clicked.connect(lambda: self.stack.setCurrentIndex(1))
+        reg_btn.clicked.connect(lambda: self._show_page(1))
         layout.addWidget(reg_btn)
 
+        # 切换离开本页时需要清空的输入框
+        self._page_inputs[0] = [self.username_input, self.password_input]
+
         return page
 
     def _on_host_changed(self, text):
@@ -592,12 +624,12 @@ class LoginDialog(QDialog):
 
     def _update_status(self, connected: bool, message: str):
         """更新连接状态标签"""
-        if connected:
-            self.connection_status.setText(f"🟢 {message}")
-            self.connection_status.setStyleSheet("color: #34a853; font-size: 12px; font-weight: bold;") 
-        else:
-            self.connection_status.setText(f"🔴 {message}")
-            self.connection_status.setStyleSheet("color: #ea4335; font-size: 12px; font-weight: bold;")
+        self.connection_status.setText(f"🟢 {message}" if connected else f"🔴 {message}")
+        # 样式规则在 StyleSheet.LOGIN 中按 state 属性匹配，只需重新 polish 该标签
+        self.connection_status.setProperty("state", "ok" if connected else "bad")
+        style = self.connection_status.style()
+        style.unpolish(self.connection_status)
+        style.polish(self.connection_status)
 
     def _ensure_connection(self) -> bool:
         """确保已连接到配置的服务器"""
@@ -607,7 +639,7 @@ class LoginDialog(QDialog):
 
         # 如果已连接，直接返回
         if self.network.is_connected:
-            if self.network.ping():
+            if self._run_in_background(self.network.ping):
                 return True
             # ping失败，重新连接
             self.network.disconnect()
@@ -618,7 +650,7 @@ class LoginDialog(QDialog):
         self.network.server_info.host = host
         self.network.server_info.port = port
         
-        if not self.network.connect():
+        if not self._run_in_background(self.network.connect):
             self._update_status(False, f"连接失败: {host}:{port}")
             QMessageBox.critical(self, "连接失败", f"无法连接到服务器 {host}:{port}\n请检查服务器设置")
             return False
@@ -626,6 +658,131 @@ class LoginDialog(QDialog):
         self._update_status(True, f"已连接到 {host}:{port}")
         return True
 
+    def _run_in_background(self, fn, *args, **kwargs):
+        """
+        在后台线程执行耗时操作（密码学计算、网络请求），等待期间继续处理界面事件
+        
+        等待期间禁用对话框，期间的点击和回车会被丢弃，防止重复提交
+        """
+        future = _crypto_executor.submit(fn, *args, **kwargs)
+        self.setEnabled(False)
+        try:
+            while not future.done():
+                QApplication.processEvents()
+                wait([future], timeout=0.02)
+        finally:
+            self.setEnabled(True)
+        return future.result()
+
+    def _unlock_cached(self, unlock, secret: str, user_data: dict, salt_field: str) -> bool:
+        """
+        带缓存的密钥解锁
+        
+        Args:
+            unlock: key_manager.unlock_with_password 或 unlock_with_recovery
+            secret: 密码或恢复密钥
+            user_data: 从服务器获取的用户数据
+            salt_field: 对应口令的盐字段名
+        """
+        now = time.monotonic()
+        while self._unlock_cache:
+            cached_at, buf = next(iter(self._unlock_cache.values()))
+            if now - cached_at <= self.UNLOCK_CACHE_TTL:
+                break
+            self._unlock_cache.popitem(last=False)
+            buf.wipe()
+        
+        cache_key = hashlib.sha256('\0'.join((
+            str(user_data.get('username', '')), secret, str(user_data.get(salt_field, ''))
+        )).encode('utf-8')).digest()
+        cached = self._unlock_cache.get(cache_key)
+        if cached is not None and self.key_manager.unlock_with_master_key(cached[1].view(), user_data):
+            return True
+        
+        if not self._run_in_background(unlock, secret, user_data):
+            return False
+        
+        old = self._unlock_cache.pop(cache_key, None)
+        if old is not None:
+            old[1].wipe()
+        self._unlock_cache[cache_key] = (now, LockedBuffer(self.key_manager.user_keys.master_key))
+        while len(self._unlock_cache) > self.UNLOCK_CACHE_SIZE:
+            self._unlock_cache.popitem(last=False)[1][1].wipe()
+        return True
+
+    def _clear_unlock_cache(self):
+        """清零并清空解锁结果缓存"""
+        for _, buf in self._unlock_cache.values():
+            buf.wipe()
+        self._unlock_cache.clear()
+
+    def done(self, result):
+        """对话框关闭（接受或取消）时清除缓存的密钥"""
+        self._clear_unlock_cache()
+        super().done(result)
+
+    def reset(self):
+        """
+        恢复初始状态，用于退出登录后复用同一个对话框
+        
+        复用时不再重新创建部件、解析样式表
+        """
+        self._pending_trust_result = None
+        self._pending_trust_email = None
+        if self.stack.currentIndex() != 0:
+            self.stack.setCurrentIndex(0)  # 切换页面时会清空输入框
+        else:
+            self._on_page_changed(0)
+        if app_config.last_username:
+            self.username_input.setText(app_config.last_username)
+        # 退出登录不会断开连接，仍连接时复用，避免覆盖未关闭的旧连接
+        if self.network.is_connected:
+            info = self.network.server_info
+            self._update_status(True, f"已连接到 {info.host}:{info.port}")
+        else:
+            QTimer.singleShot(100, self._try_initial_connect)
+
+    def _inputs_too_long(self, *values: str) -> bool:
+        """检查输入长度，超出上限时提示并返回 True"""
+        if any(len(value) > self.MAX_INPUT_LENGTH for value in values):
+            QMessageBox.warning(self, "提示", "输入内容过长")
+            return True
+        return False
+
+    def _code_request_allowed(self, email: str) -> bool:
+        """检查验证码请求频率，允许时记录本次请求（无论发送是否成功）"""
+        now = time.monotonic()
+        log = self._code_request_log[email.lower()]
+        while log and now - log[0] > self.CODE_REQUEST_WINDOW:
+            log.popleft()
+        
+        if log and now - log[-1] < self.CODE_REQUEST_INTERVAL:
+            wait_seconds = int(self.CODE_REQUEST_INTERVAL - (now - log[-1])) + 1
+            QMessageBox.warning(self, "提示", f"请求过于频繁，请 {wait_seconds} 秒后再试")
+            return False
+        if len(log) >= self.CODE_REQUEST_MAX:
+            QMessageBox.warning(self, "提示", "该邮箱验证码请求次数过多，请稍后再试")
+            return False
+        
+        log.append(now)
+        return True
+
+    def _login_throttled(self) -> bool:
+        """登录退避期间提示并返回 True"""
+        remaining = self._next_login_allowed - time.monotonic()
+        if remaining > 0:
+            QMessageBox.warning(self, "提示", f"登录失败次数过多，请 {int(remaining) + 1} 秒后再试")
+            return True
+        return False
+
+    def _on_login_failed(self, input_widget: QLineEdit):
+        """记录一次登录失败，退避期间禁用对应的输入框"""
+        self._login_fail_count += 1
+        delay = min(self.LOGIN_BACKOFF_MAX, 2 ** self._login_fail_count)
+        self._next_login_allowed = time.monotonic() + delay
+        input_widget.setEnabled(False)
+        QTimer.singleShot(delay * 1000, lambda: input_widget.setEnabled(True))
+
     def _save_connection_config(self):
         """保存成功的连接配置"""
         app_config.host = self.network.server_info.host
@@ -635,6 +792,8 @@ class LoginDialog(QDialog):
         app_config.save()
 
     def _do_login(self):
+        if self._login_throttled():
+            return
         if not self._ensure_connection():
             return
 
@@ -643,25 +802,24 @@ class LoginDialog(QDialog):
         if not username or not password:
             QMessageBox.warning(self, "提示", "请输入用户名和密码")
             return
+        if self._inputs_too_long(username, password):
+            return
         
         # 保存用户名
         app_config.last_username = username
         self._save_connection_config() # 保存连接配置（因为连接成功了）
         
-        # 使用 SHA-256 预哈希密码后再发送（避免明文传输）
-        from auth.password import PasswordManager
-        password_prehash = PasswordManager.prehash_password(password)
-        result = self.network.login_password(username, password_prehash)
+        result = self._run_in_background(self._login_with_password, username, password)
         
         if result.get('success'):
-            if self.key_manager.unlock_with_password(password, result):
+            self._login_fail_count = 0
+            if self._unlock_cached(self.key_manager.unlock_with_password, password,
+                                   result, 'master_key_salt'):
                 email = result.get('email', '')
                 # 检查是否需要询问信任设备（仅当该邮箱未信任时）
-                if self.device_trust and email and not self.device_trust.has_trusted_device(email):
-                    self._pending_trust_data = {
-                        'result': result,
-                        'email': email
-                    }
+                if self.device_trust and email and email not in self._trusted_emails():
+                    self._pending_trust_result = result
+                    self._pending_trust_email = email
                     self._ask_trust_device()
                 else:
                     self.login_success.emit(result)
@@ -669,24 +827,23 @@ class LoginDialog(QDialog):
             else:
                 QMessageBox.critical(self, "错误", "密钥解锁失败")
         else:
+            self._on_login_failed(self.password_input)
             QMessageBox.critical(self, "错误", result.get('error', '登录失败'))
 
+    def _login_with_password(self, username: str, password: str) -> dict:
+        """预哈希密码后发送登录请求（后台线程执行）"""
+        # 使用 SHA-256 预哈希密码后再发送（避免明文传输）
+        password_prehash = PasswordManager.prehash_password(password)
+        return self.network.login_password(username, password_prehash)
+
     def _create_email_login_page(self):
         """创建邮箱验证码登录页面"""
         page = QWidget()
-        layout = QVBoxLayout(page)
-        layout.setSpacing(12)
-        
-        back_btn = QPushButton("← 返回密码登录")
-        back_btn.setObjectName("linkButton")
-        back_btn.clicked.connect(lambda: self.stack.setCurrentIndex(0))
-        layout.addWidget(back_btn, alignment=Qt.AlignmentFlag.AlignLeft)
-        
-        layout.addWidget(QLabel("📧 邮箱验证码登录"))
+        layout = _vbox(page, self._back_button("← 返回密码登录"), QLabel("📧 邮箱验证码登录"))
         
         # 可更新的已信任用户提示
         self.email_login_trust_hint = QLabel("")
-        self.email_login_trust_hint.setStyleSheet("color: #1a73e8; font-size: 12px;")
+        self.email_login_trust_hint.setObjectName("trustedEmailsHint")
         self.email_login_trust_hint.setWordWrap(True)
         layout.addWidget(self.email_login_trust_hint)
         
@@ -704,21 +861,28 @@ class LoginDialog(QDialog):
         self.get_code_btn = QPushButton("获取验证码")
         self.get_code_btn.clicked.connect(self._request_email_code)
         code_layout.addWidget(self.get_code_btn, 1)
+        self._get_code_timer = QTimer(self)
+        self._get_code_timer.setSingleShot(True)
+        self._get_code_timer.setInterval(self.CODE_REQUEST_INTERVAL * 1000)
+        self._get_code_timer.timeout.connect(self._restore_get_code_btn)
         layout.addLayout(code_layout)
         
         # 密码输入（非信任设备需要）
-        self.email_password_input = QLineEdit()
-        self.email_password_input.setPlaceholderText("密码（非信任设备需要）")
-        self.email_password_input.setEchoMode(QLineEdit.EchoMode.Password)
+        self.email_password_input = _password_edit("密码（非信任设备需要）")
         layout.addWidget(self.email_password_input)
         
         # 提示：输入邮箱后会动态判断是否需要密码
         self.trust_hint_label = QLabel("")
-        self.trust_hint_label.setStyleSheet("color: #666; font-size: 11px;")
+        self.trust_hint_label.setObjectName("trustHintLabel")
         layout.addWidget(self.trust_hint_label)
         
-        # 邮箱输入变化时更新提示
-        self.email_input.textChanged.connect(self._update_trust_hint)
+        # 邮箱输入变化时更新提示（停止输入 150ms 后再查询，避免每次按键都查询信任状态）
+        self._last_hint_trusted = None  # 上次显示的信任状态，状态不变时不重设样式
+        self._trust_hint_timer = QTimer(self)
+        self._trust_hint_timer.setSingleShot(True)
+        self._trust_hint_timer.setInterval(150)
+        self._trust_hint_timer.timeout.connect(self._update_trust_hint)
+        self.email_input.textChanged.connect(self._trust_hint_timer.start)
         
         # 初始化信任状态
         self._refresh_trust_ui()
@@ -729,12 +893,15 @@ class LoginDialog(QDialog):
         layout.addWidget(email_login_btn)
         
         layout.addStretch()
+
+        # 切换离开本页时需要清空的输入框
+        self._page_inputs[3] = [self.email_input, self.email_code_input, self.email_password_input]
+        self._page_code_buttons[3] = self.get_code_btn
+
         return page
     def _refresh_trust_ui(self):
         """刷新设备信任相关的UI"""
-        trusted_emails = []
-        if self.device_trust:
-            trusted_emails = self.device_trust.get_trusted_emails()
+        trusted_emails = self._trusted_emails()
         
         # 更新邮箱登录页的已信任用户提示
         if hasattr(self, 'email_login_trust_hint'):
@@ -758,120 +925,117 @@ class LoginDialog(QDialog):
         # 更新当前输入框的信任状态
         self._update_trust_hint()
     
+    def _show_page(self, index: int):
+        """切换页面，延迟创建的页面在首次打开时替换占位部件"""
+        create_page = self._lazy_pages.pop(index, None)
+        if create_page is not None:
+            placeholder = self.stack.widget(index)
+            # 替换占位部件可能使当前索引移位，屏蔽期间的 currentChanged
+            self.stack.blockSignals(True)
+            try:
+                self.stack.insertWidget(index, create_page())
+                self.stack.removeWidget(placeholder)
+            finally:
+                self.stack.blockSignals(False)
+            placeholder.deleteLater()
+        self.stack.setCurrentIndex(index)
+
     def _on_page_changed(self, index: int):
         """页面切换时刷新UI状态"""
-        # 刷新信任状态
-        self._refresh_trust_ui()
-        
-        # 清除所有输入字段（防止信息泄露）
-        
-        # 密码登录页
-        if hasattr(self, 'username_input'):
-            self.username_input.clear()
-        if hasattr(self, 'password_input'):
-            self.password_input.clear()
-        
-        # 邮箱登录页
-        if hasattr(self, 'email_input'):
-            self.email_input.clear()
-        if hasattr(self, 'email_code_input'):
-            self.email_code_input.clear()
-        if hasattr(self, 'email_password_input'):
-            self.email_password_input.clear()
-        
-        # 注册页
-        if hasattr(self, 'reg_username'):
-            self.reg_username.clear()
-        if hasattr(self, 'reg_email'):
-            self.reg_email.clear()
-        if hasattr(self, 'reg_password'):
-            self.reg_password.clear()
-        
-        # 恢复页（恢复密钥方式）
-        if hasattr(self, 'recovery_username'):
-            self.recovery_username.clear()
-        if hasattr(self, 'recovery_key_input'):
-            self.recovery_key_input.clear()
-        
-        # 恢复页（邮箱验证码方式）
-        if hasattr(self, 'recovery_email_username'):
-            self.recovery_email_username.clear()
-        if hasattr(self, 'recovery_email_input'):
-            self.recovery_email_input.clear()
-        if hasattr(self, 'recovery_code_input'):
-            self.recovery_code_input.clear()
-        
-        # 恢复页（新密码）
-        if hasattr(self, 'new_password_input'):
-            self.new_password_input.clear()
-        if hasattr(self, 'confirm_password_input'):
-            self.confirm_password_input.clear()
+        # 清除离开页面的输入字段（防止信息泄露）；其他页面在上次离开时已清空
+        previous = self._current_page
+        self._current_page = index
+        self._trusted_emails_cache = None
+        for line_edit in self._page_inputs.get(previous, ()):
+            line_edit.clear()
         
         # 重置验证码按钮状态
-        if hasattr(self, 'get_code_btn'):
-            self.get_code_btn.setEnabled(True)
-            self.get_code_btn.setText("获取验证码")
-        if hasattr(self, 'recovery_get_code_btn'):
-            self.recovery_get_code_btn.setEnabled(True)
-            self.recovery_get_code_btn.setText("获取验证码")
+        code_btn = self._page_code_buttons.get(previous)
+        if code_btn is not None:
+            code_btn.setEnabled(True)
+            code_btn.setText("获取验证码")
+        
+        if previous in self._release_on_leave:
+            self._release_page(previous)
+        
+        # 刷新信任状态
+        self._refresh_trust_ui()
+    
+    def _release_page(self, index: int):
+        """释放已创建的页面，换回占位部件并恢复延迟创建"""
+        page = self.stack.widget(index)
+        self.stack.blockSignals(True)
+        try:
+            self.stack.insertWidget(index, QWidget())
+            self.stack.removeWidget(page)
+        finally:
+            self.stack.blockSignals(False)
+        page.deleteLater()
+        self._page_inputs.pop(index, None)
+        self._lazy_pages[index] = self._release_on_leave[index]
+    
+    def _trusted_emails(self) -> tuple:
+        """信任此设备的邮箱（快照，避免每次按键都查询设备信任文件）"""
+        if self._trusted_emails_cache is None:
+            self._trusted_emails_cache = (
+                tuple(self.device_trust.get_trusted_emails()) if self.device_trust else ()
+            )
+        return self._trusted_emails_cache
     
     def _update_trust_hint(self):
         """更新信任状态提示"""
+        if not hasattr(self, 'email_input'):
+            return  # 邮箱登录页尚未创建
         email = self.email_input.text().strip()
-        if self.device_trust and email and self.device_trust.has_trusted_device(email):
+        trusted = bool(email) and email in self._trusted_emails()
+        if trusted == self._last_hint_trusted:
+            return
+        self._last_hint_trusted = trusted
+        if trusted:
             self.trust_hint_label.setText("✓ 此邮箱已信任，无需密码")
-            self.trust_hint_label.setStyleSheet("color: #1a73e8; font-size: 11px;")
-            self.email_password_input.setEnabled(False)
         else:
             self.trust_hint_label.setText("此邮箱未信任此设备，需要输入密码")
-            self.trust_hint_label.setStyleSheet("color: #666; font-size: 11px;")
-            self.email_password_input.setEnabled(True)
+        self.email_password_input.setEnabled(not trusted)
+        # 样式规则在 StyleSheet.LOGIN 中按 trustState 属性匹配，只需重新 polish 该标签
+        self.trust_hint_label.setProperty("trustState", "trusted" if trusted else "untrusted")
+        style = self.trust_hint_label.style()
+        style.unpolish(self.trust_hint_label)
+        style.polish(self.trust_hint_label)
     
-    def _create_register_page(self):
-        page = QWidget()
-        layout = QVBoxLayout(page)
-        layout.setSpacing(12)
-        
-        back_btn = QPushButton("← 返回")
+    def _back_button(self, text: str) -> tuple:
+        """创建返回密码登录页的链接按钮，返回 (按钮, 对齐方式) 供 _vbox 使用"""
+        back_btn = QPushButton(text)
         back_btn.setObjectName("linkButton")
         back_btn.clicked.connect(lambda: self.stack.setCurrentIndex(0))
-        layout.addWidget(back_btn, alignment=Qt.AlignmentFlag.AlignLeft)
-        
-        layout.addWidget(QLabel("创建账号"))
-        
+        return back_btn, _ALIGN_LEFT
+    
+    def _create_register_page(self):
         self.reg_username = QLineEdit()
         self.reg_username.setPlaceholderText("用户名")
-        layout.addWidget(self.reg_username)
         
         self.reg_email = QLineEdit()
         self.reg_email.setPlaceholderText("邮箱")
-        layout.addWidget(self.reg_email)
         
-        self.reg_password = QLineEdit()
-        self.reg_password.setPlaceholderText("密码")
-        self.reg_password.setEchoMode(QLineEdit.EchoMode.Password)
-        layout.addWidget(self.reg_password)
+        self.reg_password = _password_edit("密码")
         
         reg_btn = QPushButton("注册")
         reg_btn.setObjectName("loginButton")
         reg_btn.clicked.connect(self._do_register)
-        layout.addWidget(reg_btn)
         
+        page = QWidget()
+        layout = _vbox(page, self._back_button("← 返回"), QLabel("创建账号"),
+                       self.reg_username, self.reg_email, self.reg_password, reg_btn)
         layout.addStretch()
+
+        # 切换离开本页时需要清空的输入框
+        self._page_inputs[1] = [self.reg_username, self.reg_email, self.reg_password]
+
         return page
     
     def _create_recovery_page(self):
         """创建密码恢复页面"""
         page = QWidget()
-        layout = QVBoxLayout(page)
-        layout.setSpacing(12)
-        
-        back_btn = QPushButton("← 返回登录")
-        back_btn.setObjectName("linkButton")
-        back_btn.clicked.connect(lambda: self.stack.setCurrentIndex(0))
-        layout.addWidget(back_btn, alignment=Qt.AlignmentFlag.AlignLeft)
-        
-        layout.addWidget(QLabel("🔑 重置密码"))
+        layout = _vbox(page, self._back_button("← 返回登录"), QLabel("🔑 重置密码"))
         
         # 方式选择
         self.recovery_method_label = QLabel("请选择重置方式：")
@@ -911,63 +1075,42 @@ class LoginDialog(QDialog):
         
         self.recovery_email_username = QLineEdit()
         self.recovery_email_username.setPlaceholderText("用户名")
-        self.recovery_email_username.setStyleSheet("""
-            QLineEdit {
-                padding: 10px;
-                border: 1px solid #ddd;
-                border-radius: 4px;
-                font-size: 14px;
-            }
-        """)
+        self.recovery_email_username.setObjectName("recoveryInput")
         email_layout.addWidget(self.recovery_email_username)
 
         self.recovery_email_input = QLineEdit()
         self.recovery_email_input.setPlaceholderText("邮箱地址")
-        self.recovery_email_input.setStyleSheet("""
-            QLineEdit {
-                padding: 10px;
-                border: 1px solid #ddd;
-                border-radius: 4px;
-                font-size: 14px;
-            }
-        """)
+        self.recovery_email_input.setObjectName("recoveryInput")
         email_layout.addWidget(self.recovery_email_input)
 
         code_row = QHBoxLayout()
         self.recovery_code_input = QLineEdit()
         self.recovery_code_input.setPlaceholderText("验证码")
         self.recovery_code_input.setMaxLength(6)
-        self.recovery_code_input.setStyleSheet("""
-            QLineEdit {
-                padding: 10px;
-                border: 1px solid #ddd;
-                border-radius: 4px;
-                font-size: 14px;
-            }
-        """)
+        self.recovery_code_input.setObjectName("recoveryInput")
         code_row.addWidget(self.recovery_code_input, 2)
         
         self.recovery_get_code_btn = QPushButton("获取验证码")
         self.recovery_get_code_btn.clicked.connect(self._request_recovery_code)
         code_row.addWidget(self.recovery_get_code_btn, 1)
+        self._recovery_get_code_timer = QTimer(self)
+        self._recovery_get_code_timer.setSingleShot(True)
+        self._recovery_get_code_timer.setInterval(self.CODE_REQUEST_INTERVAL * 1000)
+        self._recovery_get_code_timer.timeout.connect(self._restore_recovery_get_code_btn)
         email_layout.addLayout(code_row)
         
         self.recovery_email_hint = QLabel("")
-        self.recovery_email_hint.setStyleSheet("color: #666; font-size: 11px;")
+        self.recovery_email_hint.setObjectName("recoveryEmailHint")
         email_layout.addWidget(self.recovery_email_hint)
         
         layout.addWidget(self.recovery_email_container)
         self.recovery_email_container.hide()  # 默认隐藏
         
         # 新密码输入
-        self.new_password_input = QLineEdit()
-        self.new_password_input.setPlaceholderText("新密码")
-        self.new_password_input.setEchoMode(QLineEdit.EchoMode.Password)
+        self.new_password_input = _password_edit("新密码")
         layout.addWidget(self.new_password_input)
         
-        self.confirm_password_input = QLineEdit()
-        self.confirm_password_input.setPlaceholderText("确认新密码")
-        self.confirm_password_input.setEchoMode(QLineEdit.EchoMode.Password)
+        self.confirm_password_input = _password_edit("确认新密码")
         layout.addWidget(self.confirm_password_input)
         
         reset_btn = QPushButton("重置密码")
@@ -976,6 +1119,15 @@ class LoginDialog(QDialog):
         layout.addWidget(reset_btn)
         
         layout.addStretch()
+
+        # 切换离开本页时需要清空的输入框
+        self._page_inputs[2] = [
+            self.recovery_username, self.recovery_key_input,
+            self.recovery_email_username, self.recovery_email_input, self.recovery_code_input,
+            self.new_password_input, self.confirm_password_input,
+        ]
+        self._page_code_buttons[2] = self.recovery_get_code_btn
+
         return page
     
     def _switch_recovery_method(self, method: str):
@@ -992,12 +1144,22 @@ class LoginDialog(QDialog):
             self.recovery_email_container.show()
             # 检查信任设备
             if self.device_trust:
-                trusted = self.device_trust.get_trusted_emails()
+                trusted = self._trusted_emails()
                 if trusted:
                     self.recovery_email_hint.setText(f"可用邮箱: {', '.join(trusted)}")
                 else:
                     self.recovery_email_hint.setText("⚠️ 此设备无信任用户，无法使用此方式")
     
+    def _restore_recovery_get_code_btn(self):
+        """恢复找回密码页的获取验证码按钮"""
+        self.recovery_get_code_btn.setEnabled(True)
+        self.recovery_get_code_btn.setText("获取验证码")
+    
+    def _restore_get_code_btn(self):
+        """恢复邮箱登录页的获取验证码按钮"""
+        self.get_code_btn.setEnabled(True)
+        self.get_code_btn.setText("获取验证码")
+    
     def _request_recovery_code(self):
         """请求密码重置验证码"""
         if not self._ensure_connection():
@@ -1009,21 +1171,23 @@ class LoginDialog(QDialog):
             return
         
         # 检查是否是信任设备的邮箱
-        if not self.device_trust or not self.device_trust.has_trusted_device(email):
+        if email not in self._trusted_emails():
             QMessageBox.warning(self, "提示", "此邮箱未信任此设备，无法使用邮箱验证码重置密码")
             return
         
-        result = self.network.request_email_code(email, 'reset')
+        if not self._code_request_allowed(email):
+            return
+        
+        self.recovery_get_code_btn.setEnabled(False)
+        self.recovery_get_code_btn.setText("发送中…")
+        result = self._run_in_background(self.network.request_email_code, email, 'reset')
         if result.get('success'):
             QMessageBox.information(self, "提示", "验证码已发送")
-            self.recovery_get_code_btn.setEnabled(False)
             self.recovery_get_code_btn.setText("已发送")
-            from PyQt6.QtCore import QTimer
-            QTimer.singleShot(60000, lambda: (
-                self.recovery_get_code_btn.setEnabled(True),
-                self.recovery_get_code_btn.setText("获取验证码")
-            ))
+            # 冷却结束后恢复
+            self._recovery_get_code_timer.start()
         else:
+            self._restore_recovery_get_code_btn()
             QMessageBox.critical(self, "错误", result.get('error', '发送失败'))
     
     def _request_email_code(self):
@@ -1036,22 +1200,25 @@ class LoginDialog(QDialog):
             QMessageBox.warning(self, "提示", "请输入邮箱")
             return
         
-        result = self.network.request_email_code(email, 'login')
+        if not self._code_request_allowed(email):
+            return
+        
+        self.get_code_btn.setEnabled(False)
+        self.get_code_btn.setText("发送中…")
+        result = self._run_in_background(self.network.request_email_code, email, 'login')
         if result.get('success'):
             QMessageBox.information(self, "提示", "验证码已发送，请查收邮箱")
-            self.get_code_btn.setEnabled(False)
             self.get_code_btn.setText("已发送")
-            # 60秒后恢复
-            from PyQt6.QtCore import QTimer
-            QTimer.singleShot(60000, lambda: (
-                self.get_code_btn.setEnabled(True),
-                self.get_code_btn.setText("获取验证码")
-            ))
+            # 冷却结束后恢复
+            self._get_code_timer.start()
         else:
+            self._restore_get_code_btn()
             QMessageBox.critical(self, "错误", result.get('error', '发送失败'))
     
     def _do_email_login(self):
         """邮箱验证码登录"""
+        if self._login_throttled():
+            return
         if not self._ensure_connection():
             return
             
@@ -1061,23 +1228,27 @@ class LoginDialog(QDialog):
         if not email or not code:
             QMessageBox.warning(self, "提示", "请输入邮箱和验证码")
             return
+        if self._inputs_too_long(email, code, self.email_password_input.text()):
+            return
         
         # 检查该邮箱是否信任此设备
-        is_trusted = self.device_trust and self.device_trust.has_trusted_device(email)
+        is_trusted = email in self._trusted_emails()
         
         if is_trusted:
             # 信任设备：先从本地解密
             device_data = self.device_trust.unlock_from_device(email)
             if device_data:
                 # 验证邮箱验证码
-                result = self.network.login_email(email, code)
+                result = self._run_in_background(self.network.login_email, email, code)
                 if result.get('success'):
+                    self._login_fail_count = 0
                     # 使用本地存储的密钥
                     self.key_manager.unlock_from_device(device_data)
                     self.login_success.emit(result)
                     self.accept()
                     return
                 else:
+                    self._on_login_failed(self.email_code_input)
                     QMessageBox.critical(self, "错误", result.get('error', '验证码错误'))
                     return
         
@@ -1088,19 +1259,20 @@ class LoginDialog(QDialog):
             return
         
         # 验证邮箱验证码
-        result = self.network.login_email(email, code)
+        result = self._run_in_background(self.network.login_email, email, code)
         if not result.get('success'):
+            self._on_login_failed(self.email_code_input)
             QMessageBox.critical(self, "错误", result.get('error', '验证码错误'))
             return
+        self._login_fail_count = 0
         
         # 使用密码解锁密钥
-        if self.key_manager.unlock_with_password(password, result):
+        if self._unlock_cached(self.key_manager.unlock_with_password, password,
+                               result, 'master_key_salt'):
             # 检查是否需要询问信任设备（仅当该邮箱未信任时）
-            if self.device_trust and not self.device_trust.has_trusted_device(email):
-                self._pending_trust_data = {
-                    'result': result,
-                    'email': email
-                }
+            if self.device_trust and email not in self._trusted_emails():
+                self._pending_trust_result = result
+                self._pending_trust_email = email
                 self._ask_trust_device()
             else:
                 self.login_success.emit(result)
@@ -1110,31 +1282,39 @@ class LoginDialog(QDialog):
     
     def _ask_trust_device(self):
         """询问是否信任设备"""
-        reply = QMessageBox.question(
-            self, 
-            "信任此设备", 
-            "是否信任此设备？\n\n"
-            "信任后，下次可使用邮箱验证码快速登录，无需输入密码。\n"
-            "仅在您信任的个人设备上选择此选项。",
-            QMessageBox.StandardButton.Yes | QMessageBox.StandardButton.No,
-            QMessageBox.StandardButton.No
-        )
+        if self._trust_mbox is None:
+            self._trust_mbox = QMessageBox(self)
+            self._trust_mbox.setIcon(QMessageBox.Icon.Question)
+            self._trust_mbox.setWindowTitle("信任此设备")
+            self._trust_mbox.setText(
+                "是否信任此设备？\n\n"
+                "信任后，下次可使用邮箱验证码快速登录，无需输入密码。\n"
+                "仅在您信任的个人设备上选择此选项。"
+            )
+            self._trust_mbox.setStandardButtons(_MB_YES | _MB_NO)
+        self._trust_mbox.setDefaultButton(_MB_NO)
+        self._trust_mbox.exec()
+        # exec() 返回整数，按实际点击的按钮判断
+        reply = self._trust_mbox.standardButton(self._trust_mbox.clickedButton())
         
-        if reply == QMessageBox.StandardButton.Yes:
+        if reply == _MB_YES:
             # 保存设备信任
             if self.device_trust and self.key_manager.user_keys:
                 self.device_trust.trust_device(
                     username=self.key_manager.user_keys.username,
-                    email=self._pending_trust_data.get('email', ''),
+                    email=self._pending_trust_email or '',
                     master_key=self.key_manager.user_keys.master_key,
                     private_key=self.key_manager.user_keys.private_key,
                     public_key=self.key_manager.user_keys.public_key
                 )
+                self._trusted_emails_cache = None
                 QMessageBox.information(self, "成功", "设备已信任，下次可使用验证码登录")
         
         # 完成登录
-        self.login_success.emit(self._pending_trust_data['result'])
-        self._pending_trust_data = None
+        result = self._pending_trust_result
+        self._pending_trust_result = None
+        self._pending_trust_email = None
+        self.login_success.emit(result)
         self.accept()
     
     def _do_register(self):
@@ -1148,23 +1328,23 @@ class LoginDialog(QDialog):
         if not username or not email or not password:
             QMessageBox.warning(self, "提示", "请填写所有字段")
             return
+        if self._inputs_too_long(username, email, password):
+            return
         
         # 验证邮箱格式
-        import re
-        email_pattern = r'^[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}$'
-        if not re.match(email_pattern, email):
+        if not _valid_email(email):
             QMessageBox.warning(self, "提示", "邮箱格式不正确")
             return
         
         # 验证密码强度
-        from auth.password import PasswordManager
         valid, msg = PasswordManager.validate_password(password)
         if not valid:
             QMessageBox.warning(self, "提示", msg)
             return
         
-        reg_data = self.key_manager.prepare_registration(password)
-        result = self.network.register(
+        reg_data = self._run_in_background(self.key_manager.prepare_registration, password)
+        result = self._run_in_background(
+            self.network.register,
             username=username, email=email,
             password_hash=reg_data['password_hash'],
             public_key=reg_data['public_key'],
@@ -1218,25 +1398,25 @@ class LoginDialog(QDialog):
         # 标题
         title = QLabel("✅ 注册成功！")
         title.setObjectName("title")
-        title.setAlignment(Qt.AlignmentFlag.AlignCenter)
+        title.setAlignment(_ALIGN_CENTER)
         layout.addWidget(title)
         
         # 说明
         desc = QLabel("请妥善保存以下恢复密钥，这是恢复账户的方式：")
         desc.setWordWrap(True)
-        desc.setAlignment(Qt.AlignmentFlag.AlignCenter)
+        desc.setAlignment(_ALIGN_CENTER)
         layout.addWidget(desc)
         
         # 恢复密钥显示
         key_display = QLineEdit(recovery_key)
         key_display.setReadOnly(True)
-        key_display.setAlignment(Qt.AlignmentFlag.AlignCenter)
+        key_display.setAlignment(_ALIGN_CENTER)
         layout.addWidget(key_display)
         
         # 警告
         warning = QLabel("⚠️ 此密钥只显示一次，丢失后无法恢复！")
         warning.setObjectName("warning")
-        warning.setAlignment(Qt.AlignmentFlag.AlignCenter)
+        warning.setAlignment(_ALIGN_CENTER)
         layout.addWidget(warning)
         
         layout.addSpacing(10)
@@ -1331,13 +1511,14 @@ class LoginDialog(QDialog):
         if not new_password:
             QMessageBox.warning(self, "提示", "请输入新密码")
             return
+        if self._inputs_too_long(new_password):
+            return
         
         if new_password != confirm_password:
             QMessageBox.warning(self, "提示", "两次输入的密码不一致")
             return
         
         # 验证密码强度
-        from auth.password import PasswordManager
         valid, msg = PasswordManager.validate_password(new_password)
         if not valid:
             QMessageBox.warning(self, "提示", msg)
@@ -1356,9 +1537,11 @@ class LoginDialog(QDialog):
             if not username or not email or not code:
                 QMessageBox.warning(self, "提示", "请输入用户名、邮箱和验证码")
                 return
+            if self._inputs_too_long(username, email, code):
+                return
             
             # 检查信任设备
-            if not self.device_trust or not self.device_trust.has_trusted_device(email):
+            if email not in self._trusted_emails():
                 QMessageBox.critical(self, "错误", "此邮箱未信任此设备，无法使用此方式")
                 return
             
@@ -1373,10 +1556,11 @@ class LoginDialog(QDialog):
             email_for_trust = email
             
             # 准备新密码数据
-            reset_data = self.key_manager.prepare_password_reset(new_password)
+            reset_data = self._run_in_background(self.key_manager.prepare_password_reset, new_password)
             
             # 发送密码重置请求（使用邮箱验证码）
-            reset_result = self.network.reset_password(
+            reset_result = self._run_in_background(
+                self.network.reset_password,
                 email=email,
                 code=code,
                 new_password_hash=reset_data['new_password_hash'],
@@ -1391,25 +1575,29 @@ class LoginDialog(QDialog):
             if not username or not recovery_key:
                 QMessageBox.warning(self, "提示", "请填写用户名和恢复密钥")
                 return
+            if self._inputs_too_long(username, recovery_key):
+                return
             
             # 获取用户数据
-            result = self.network.get_user_for_recovery(username)
+            result = self._run_in_background(self.network.get_user_for_recovery, username)
             if not result.get('success'):
                 QMessageBox.critical(self, "错误", result.get('error', '获取用户信息失败'))
                 return
             
             # 使用恢复密钥解锁主密钥
-            if not self.key_manager.unlock_with_recovery(recovery_key, result):
+            if not self._unlock_cached(self.key_manager.unlock_with_recovery, recovery_key,
+                                       result, 'recovery_key_salt'):
                 QMessageBox.critical(self, "错误", "恢复密钥无效")
                 return
             
             email_for_trust = result.get('email')
             
             # 准备新密码数据
-            reset_data = self.key_manager.prepare_password_reset(new_password)
+            reset_data = self._run_in_background(self.key_manager.prepare_password_reset, new_password)
             
             # 发送密码重置请求
-            reset_result = self.network.reset_password(
+            reset_result = self._run_in_background(
+                self.network.reset_password,
                 username=username,
                 recovery_key=recovery_key,
                 new_password_hash=reset_data['new_password_hash'],
@@ -1421,9 +1609,11 @@ class LoginDialog(QDialog):
             # 自动解除设备信任（密码已更改，本地密钥加密已失效）
             if self.device_trust and email_for_trust:
                 self.device_trust.clear_trust(email_for_trust)
+                self._trusted_emails_cache = None
                 self._refresh_trust_ui()  # 立即刷新信任状态UI
             
             QMessageBox.information(self, "成功", "密码重置成功，请使用新密码登录")
+            self._clear_unlock_cache()
             self.key_manager.lock()
             self.stack.setCurrentIndex(0)
         else:
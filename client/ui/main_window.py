@@ -9,18 +9,26 @@ from PyQt6.QtWidgets import (
     QTableWidgetItem, QHeaderView, QMenu, QFileDialog,
     QMessageBox, QInputDialog, QProgressDialog, QSplitter,
     QFrame, QToolBar, QStatusBar, QDialog, QApplication,
-    QProgressBar
+    QProgressBar, QLineEdit, QFormLayout, QDialogButtonBox
 )
 from PyQt6.QtCore import Qt, QSize, pyqtSignal, QThread, QTimer
 from PyQt6.QtGui import QAction, QIcon
 from pathlib import Path
 
 from .styles import StyleSheet, Icons
+from auth.password import PasswordManager
+from client.file_crypto import FileCrypto
+import base64
+import gc
 import platform
+import re
 import subprocess
 import tempfile
 import os
 
+# 预览临时文件名中需要替换的非法字符
+_UNSAFE_FILENAME_RE = re.compile(r'[<>:"/\\|?*]')
+
 class BadgeButton(QPushButton):
     """带红点徽章的按钮"""
     def __init__(self, text, parent=None):
@@ -260,15 +268,17 @@ class MainWindow(QMainWindow):
         self.group_sort_ascending = False
 
         self._init_ui()
-        self._refresh_files()
+
+        # 初始加载：文件列表与通知计数同时发出，共用一次往返
+        files_future = self.network.get_file_list_async(group_id=self.current_group_id)
+        counts_future = self.network.get_notification_counts_async()
+        self._refresh_files(files_future=files_future)
+        self._refresh_notifications(counts_future=counts_future)
 
         # 通知轮询定时器 (2秒 - 更实时)
         self.notification_timer = QTimer(self)
         self.notification_timer.timeout.connect(self._refresh_notifications)
         self.notification_timer.start(2000)  # 2秒轮询
-
-        # 初始加载通知
-        self._refresh_notifications()
         self._temp_preview_files = []  # 临时预览文件列表
 
     def _init_ui(self):
@@ -357,12 +367,6 @@ class MainWindow(QMainWindow):
             QMessageBox.warning(self, "提示", "文件超过100MB，无法预览")
             return
 
-        import tempfile
-        import subprocess
-        import platform
-        import os
-        from pathlib import Path
-
         try:
             # 显示加载提示
             self._set_status_msg(f"正在下载并解密 {file.name}...")
@@ -376,8 +380,7 @@ class MainWindow(QMainWindow):
             original_name = file.name
 
             # 清理文件名（移除非法字符）
-            import re
-            safe_name = re.sub(r'[<>:"/\\|?*]', '_', original_name)
+            safe_name = _UNSAFE_FILENAME_RE.sub('_', original_name)
 
             # 生成唯一的临时文件路径（避免文件名冲突）
             temp_path = temp_dir / f"preview_{file.id}_{safe_name}"
@@ -455,11 +458,6 @@ class MainWindow(QMainWindow):
     def _download_file_to_temp(self, file: FileItem, temp_path: str) -> bool:
         """下载文件到临时路径（无进度对话框）"""
         try:
-            import gc
-            import base64
-            import tempfile
-            from pathlib import Path
-
             # 开始下载 - 获取元数据
             result = self.network.download_file_start(file.id)
 
@@ -501,8 +499,6 @@ class MainWindow(QMainWindow):
                 gc.collect()
 
                 # 解密文件密钥
-                from client.file_crypto import FileCrypto
-
                 if self.current_group_id:
                     file_key = self.key_manager.decrypt_with_group_key(
                         self.current_group_id, encrypted_file_key
@@ -534,7 +530,6 @@ class MainWindow(QMainWindow):
     def _clean_temp_file(self, file_path: str):
         """清理临时预览文件"""
         try:
-            import os
             if os.path.exists(file_path):
                 os.unlink(file_path)
                 if file_path in self._temp_preview_files:
@@ -544,7 +539,6 @@ class MainWindow(QMainWindow):
 
     def closeEvent(self, event):
         """关闭窗口时清理所有临时预览文件"""
-        import os
         for temp_file in self._temp_preview_files:
             try:
                 if os.path.exists(temp_file):
@@ -750,11 +744,14 @@ class MainWindow(QMainWindow):
 
         menu.exec(self.file_table.viewport().mapToGlobal(pos))
 
-    def _refresh_files(self):
-        """刷新文件列表"""
-        # current_path 存储 (id, name) 元组，需要提取 id
-        parent_id = self.current_path[-1][0] if self.current_path else None
-        result = self.network.get_file_list(parent_id=parent_id, group_id=self.current_group_id)
+    def _refresh_files(self, *, files_future=None):
+        """刷新文件列表（files_future 为已发出的文件列表请求）"""
+        if files_future is None:
+            # current_path 存储 (id, name) 元组，需要提取 id
+            parent_id = self.current_path[-1][0] if self.current_path else None
+            files_future = self.network.get_file_list_async(
+                parent_id=parent_id, group_id=self.current_group_id)
+        result = self.network.wait_response(files_future)
 
         if result.get('success'):
             self.files = [FileItem(f) for f in result.get('files', [])]
@@ -1035,11 +1032,18 @@ class MainWindow(QMainWindow):
         self._create_breadcrumb()
         self._refresh_files()
 
-    def _refresh_notifications(self):
-        """刷新通知徽章"""
-        # 首先检查连通性
+    def _refresh_notifications(self, *, counts_future=None):
+        """
+        刷新通知徽章（counts_future 为已发出的计数请求）
+        
+        计数请求本身即可检查连通性：超时会关闭连接，无需先单独发送心跳
+        """
+        if counts_future is None:
+            counts_future = self.network.get_notification_counts_async()
+        result = self.network.wait_response(counts_future, timeout=5)
+
         host = self.network.server_info.host
-        if not self.network.ping():
+        if not self.network.is_connected:
             self.conn_status_label.setText(f"● 连接已断开: {host}")
             self.conn_status_label.setStyleSheet("color: #ea4335; font-size: 11px; font-weight: bold;")
             self.reconnect_btn.show()
@@ -1050,7 +1054,6 @@ class MainWindow(QMainWindow):
         self.reconnect_btn.hide()
 
         try:
-            result = self.network.get_notification_counts()
             if result.get('success'):
                 invitation_count = result.get('invitation_count', 0)
                 file_count = result.get('file_count', 0)
@@ -1078,7 +1081,7 @@ class MainWindow(QMainWindow):
                 self._set_status_msg("正在恢复会话...")
                 login_res = self.network.login_password(
                     auth_cache['username'], 
-                    auth_cache['password']
+                    auth_cache['password_prehash']
                 )
                 if login_res.get('success'):
                     self._set_status_msg("会话已恢复", 3000)
@@ -1123,10 +1126,14 @@ class MainWindow(QMainWindow):
 
     def _show_group_selector(self):
         """显示群组选择器"""
+        # 群组列表与通知计数请求同时发出，共用一次往返
+        groups_future = self.network.get_groups_async()
+        counts_future = self.network.get_notification_counts_async()
+
         # 刷新通知确保徽章是最新的
-        self._refresh_notifications()
+        self._refresh_notifications(counts_future=counts_future)
 
-        result = self.network.get_groups()
+        result = self.network.wait_response(groups_future)
         if not result.get('success'):
             QMessageBox.warning(self, "错误", result.get('error', '获取群组失败'))
             return
@@ -1326,33 +1333,15 @@ class MainWindow(QMainWindow):
 
         path = Path(file_path)
         file_size = path.stat().st_size
-        temp_file_path = None
 
         try:
-            import gc
-            import os
-            from client.file_crypto import FileCrypto
-
             # 显示加密进度提示
             self._set_status_msg(f"正在加密 {path.name}...")
             QApplication.processEvents()
 
-            # 加密文件
+            # 生成文件密钥；文件内容在上传过程中边加密边发送，不生成临时文件
             file_key = FileCrypto.generate_file_key()
-            encrypted_result, _ = FileCrypto.encrypt_file(path, file_key)
-            gc.collect()
-
-            # 判断返回的是字节数据还是临时文件路径
-            if isinstance(encrypted_result, str):
-                # 大文件：返回的是临时文件路径
-                temp_file_path = encrypted_result
-                total_size = os.path.getsize(temp_file_path)
-                use_temp_file = True
-            else:
-                # 小文件：返回的是字节数据
-                encrypted_data = encrypted_result
-                total_size = len(encrypted_data)
-                use_temp_file = False
+            total_size = FileCrypto.encrypted_size(file_size)
 
             # 创建进度对话框
             progress = ProgressDialog("上传文件", path.name, total_size, self)
@@ -1366,6 +1355,27 @@ class MainWindow(QMainWindow):
             else:
                 encrypted_file_key = self.key_manager.encrypt_file_key(file_key)
 
+            # 小文件：加密后单包上传，省去开始/结束两次往返
+            if total_size <= self.network.SMALL_UPLOAD_THRESHOLD:
+                data = b''.join(FileCrypto.encrypt_file_iter(path, file_key))
+                result = self.network.upload_file_oneshot(
+                    filename=path.name,
+                    encrypted_file_key=encrypted_file_key.hex(),
+                    data=data,
+                    parent_id=self.current_path[-1][0] if self.current_path else None,
+                    group_id=self.current_group_id
+                )
+                if result.get('success'):
+                    progress.update_progress(total_size)
+                    progress.set_complete()
+                    progress.exec()
+                    self._set_status_msg("上传成功")
+                    self._refresh_files()
+                else:
+                    progress.close()
+                    QMessageBox.critical(self, "错误", result.get('error', '上传失败'))
+                return
+
             # 开始上传
             result = self.network.upload_file_start(
                 filename=path.name,
@@ -1382,43 +1392,27 @@ class MainWindow(QMainWindow):
 
             upload_id = result['upload_id']
             chunk_size = 256 * 1024  # 256KB chunks
-            uploaded = 0
 
-            if use_temp_file:
-                # 大文件：从临时文件流式读取上传
-                with open(temp_file_path, 'rb') as f:
-                    while True:
-                        if progress.is_cancelled():
-                            # 通知服务器取消上传
-                            self.network.upload_file_cancel(upload_id)
-                            self._set_status_msg("上传已取消")
-                            return
+            def on_progress(uploaded: int) -> bool:
+                progress.update_progress(uploaded)
+                return not progress.is_cancelled()
 
-                        chunk = f.read(chunk_size)
-                        if not chunk:
-                            break
-
-                        self.network.upload_file_data(upload_id, chunk)
-                        uploaded += len(chunk)
-                        progress.update_progress(uploaded)
-            else:
-                # 小文件：从内存读取上传
-                for i in range(0, total_size, chunk_size):
-                    if progress.is_cancelled():
-                        # 通知服务器取消上传
-                        self.network.upload_file_cancel(upload_id)
-                        del encrypted_data
-                        gc.collect()
-                        self._set_status_msg("上传已取消")
-                        return
-
-                    chunk = encrypted_data[i:i+chunk_size]
-                    self.network.upload_file_data(upload_id, chunk)
-                    uploaded += len(chunk)
-                    progress.update_progress(uploaded)
-
-                del encrypted_data
-                gc.collect()
+            # 流式加密并流水线上传（多个数据块在途，不逐块等待确认）
+            result = self.network.upload_file_data_pipelined(
+                upload_id,
+                FileCrypto.encrypt_file_iter(path, file_key, chunk_size),
+                on_progress=on_progress
+            )
+            if result.get('cancelled'):
+                # 通知服务器取消上传
+                self.network.upload_file_cancel(upload_id)
+                self._set_status_msg("上传已取消")
+                return
+            if not result.get('success'):
+                self.network.upload_file_cancel(upload_id)
+                progress.close()
+                QMessageBox.critical(self, "错误", result.get('error', '上传失败'))
+                return
 
             # 结束上传
             result = self.network.upload_file_end(upload_id)
@@ -1434,13 +1428,6 @@ class MainWindow(QMainWindow):
 
         except Exception as e:
             QMessageBox.critical(self, "错误", str(e))
-        finally:
-            # 清理临时文件
-            if temp_file_path:
-                try:
-                    os.unlink(temp_file_path)
-                except:
-                    pass
 
     def _download_file(self, file: FileItem):
         """下载文件 (流式下载)"""
@@ -1449,11 +1436,6 @@ class MainWindow(QMainWindow):
             return
 
         try:
-            import gc
-            import base64
-            import tempfile
-            from pathlib import Path
-
             # 显示下载状态
             self._set_status_msg(f"正在下载 {file.name}...")
             QApplication.processEvents()
@@ -1515,8 +1497,6 @@ class MainWindow(QMainWindow):
                 gc.collect()
 
                 # 解密文件密钥
-                from client.file_crypto import FileCrypto
-
                 if self.current_group_id:
                     file_key = self.key_manager.decrypt_with_group_key(
                         self.current_group_id, encrypted_file_key
@@ -1535,7 +1515,6 @@ class MainWindow(QMainWindow):
             finally:
                 # 清理临时文件
                 try:
-                    import os
                     os.close(temp_fd)
                     os.unlink(temp_path)
                 except:
@@ -1560,8 +1539,6 @@ class MainWindow(QMainWindow):
 
     def _rename_file(self, file: FileItem):
         """重命名文件"""
-        from PyQt6.QtWidgets import QDialog, QVBoxLayout, QLineEdit, QDialogButtonBox
-
         dialog = QDialog(self)
         dialog.setWindowTitle("重命名")
         dialog.setMinimumWidth(450)  # 设置最小宽度避免遮挡文件名
@@ -1711,8 +1688,6 @@ class MainWindow(QMainWindow):
             return
 
         # 创建邀请列表对话框
-        from PyQt6.QtWidgets import QDialog, QListWidget, QDialogButtonBox
-
         dialog = QDialog(self)
         dialog.setWindowTitle("待处理邀请")
         dialog.setMinimumWidth(400)
@@ -1815,8 +1790,6 @@ class MainWindow(QMainWindow):
 
     def _change_password(self):
         """修改密码"""
-        from PyQt6.QtWidgets import QDialog, QFormLayout, QLineEdit
-
         dialog = QDialog(self)
         dialog.setWindowTitle("修改密码")
         dialog.setFixedSize(400, 280)
@@ -1866,7 +1839,6 @@ class MainWindow(QMainWindow):
                 return
 
             # 验证密码强度
-            from auth.password import PasswordManager
             valid, msg = PasswordManager.validate_password(new_password)
             if not valid:
                 QMessageBox.warning(dialog, "提示", msg)
@@ -1918,8 +1890,6 @@ class MainWindow(QMainWindow):
 
     def _revoke_device_trust(self):
         """解除设备信任"""
-        from PyQt6.QtWidgets import QDialog, QFormLayout, QLineEdit
-
         if not self.device_trust:
             QMessageBox.warning(self, "提示", "设备信任功能不可用")
             return
@@ -1965,7 +1935,6 @@ class MainWindow(QMainWindow):
                 return
 
             # 验证密码
-            from auth.password import PasswordManager
             password_prehash = PasswordManager.prehash_password(password)
             result = self.network.login_password(
                 self.key_manager.user_keys.username, password_prehash
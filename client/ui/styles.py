@@ -422,6 +422,13 @@ class StyleSheet:
         color: #202124;
     }
     
+    QLabel#logoText {
+        font-size: 32px;
+        font-weight: bold;
+        color: white;
+        background: transparent;
+    }
+    
     QLabel#welcomeLabel {
         font-size: 24px;
         font-weight: 400;
@@ -490,6 +497,83 @@ class StyleSheet:
         color: #1a73e8;
         border-bottom: 2px solid #1a73e8;
     }
+    
+    QLabel#trustedEmailsHint {
+        color: #1a73e8;
+        font-size: 12px;
+    }
+    
+    /* 找回密码页邮箱验证码方式的输入框（聚焦时保持同一外观） */
+    QLineEdit#recoveryInput,
+    QLineEdit#recoveryInput:focus {
+        padding: 10px;
+        border: 1px solid #ddd;
+        border-radius: 4px;
+        font-size: 14px;
+    }
+    
+    QLabel#recoveryEmailHint {
+        color: #666;
+        font-size: 11px;
+    }
+    
+    /* 邮箱信任状态提示：通过 trustState 动态属性切换，无需重新设置样式表 */
+    QLabel#trustHintLabel {
+        color: #666;
+        font-size: 11px;
+    }
+    
+    QLabel#trustHintLabel[trustState="trusted"] {
+        color: #1a73e8;
+    }
+    
+    /* 连接状态：通过 state 动态属性切换颜色 */
+    QLabel#connectionStatus {
+        color: rgba(255, 255, 255, 0.9);
+        font-size: 14px;
+        font-weight: 500;
+    }
+    
+    QLabel#connectionStatus[state="ok"] {
+        color: #34a853;
+        font-size: 12px;
+        font-weight: bold;
+    }
+    
+    QLabel#connectionStatus[state="bad"] {
+        color: #ea4335;
+        font-size: 12px;
+        font-weight: bold;
+    }
+    
+    QWidget#contentWidget {
+        background: white;
+        border-top-left-radius: 20px;
+        border-top-right-radius: 20px;
+        margin-top: -5px;
+    }
+    
+    /* 服务器设置对话框 */
+    QLabel#settingsTitle {
+        font-size: 18px;
+        font-weight: 500;
+        color: #202124;
+        margin-bottom: 8px;
+    }
+    
+    QPushButton#testConnectionButton {
+        background: #1a73e8;
+        color: white;
+        border: none;
+        border-radius: 4px;
+        padding: 10px 20px;
+        font-weight: 500;
+        min-width: 100px;
+    }
+    
+    QPushButton#testConnectionButton:hover {
+        background: #1557b0;
+    }
     """
 
 
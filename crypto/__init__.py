@@ -8,5 +8,7 @@ from .rsa import RSACipher
 from .dh import DHKeyExchange
 from .hmac_auth import HMACAuth
 from .kdf import KeyDerivation
+from .secure_memory import LockedBuffer, wipe_bytearray
 
-__all__ = ['AESCipher', 'RSACipher', 'DHKeyExchange', 'HMACAuth', 'KeyDerivation']
+__all__ = ['AESCipher', 'RSACipher', 'DHKeyExchange', 'HMACAuth', 'KeyDerivation',
+           'LockedBuffer', 'wipe_bytearray']
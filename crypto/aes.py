@@ -4,6 +4,7 @@ AES-256 对称加密模块
 """
 
 import os
+import hmac
 from Crypto.Cipher import AES
 from Crypto.Util.Padding import pad, unpad
 
@@ -14,6 +15,10 @@ class AESCipher:
     KEY_SIZE = 32  # 256 bits
     BLOCK_SIZE = 16  # 128 bits
     
+    # 32 字节密钥恰好两个分组，PKCS#7 填充固定为一个完整的 0x10 分组
+    _KEY_PAD = bytes((BLOCK_SIZE,)) * BLOCK_SIZE
+    KEY_CBC_SIZE = KEY_SIZE + BLOCK_SIZE  # 48
+    
     def __init__(self, key: bytes = None):
         """
         初始化 AES 加密器
@@ -54,6 +59,109 @@ class AESCipher:
         ciphertext = cipher.encrypt(pad(plaintext, self.BLOCK_SIZE))
         return ciphertext, iv
     
+    def encrypt_cbc_into(self, plaintext: bytes, out, iv: bytes = None) -> int:
+        """
+        使用 CBC 模式加密，将 IV + 密文直接写入预分配的缓冲区
+        
+        Args:
+            plaintext: 明文数据
+            out: 可写缓冲区（bytearray / memoryview）
+            iv: 初始化向量，如果为 None 则自动生成
+            
+        Returns:
+            写入的字节数
+        """
+        if iv is None:
+            iv = self.generate_iv()
+        padded = pad(plaintext, self.BLOCK_SIZE)
+        total = self.BLOCK_SIZE + len(padded)
+        view = memoryview(out)
+        if len(view) < total:
+            raise ValueError(f"输出缓冲区长度不足，需要 {total} 字节")
+        view[:self.BLOCK_SIZE] = iv
+        cipher = AES.new(self.key, AES.MODE_CBC, iv)
+        cipher.encrypt(padded, output=view[self.BLOCK_SIZE:total])
+        return total
+    
+    def encrypt_cbc_key(self, key: bytes, iv: bytes = None) -> tuple[bytes, bytes]:
+        """
+        使用 CBC 模式加密 32 字节密钥（填充为常量分组，不走通用填充逻辑）
+        
+        输出与 encrypt_cbc(key) 完全相同
+        
+        Args:
+            key: 32 字节密钥
+            iv: 初始化向量，如果为 None 则自动生成
+            
+        Returns:
+            (48 字节密文, IV) 元组
+        """
+        if len(key) != self.KEY_SIZE:
+            raise ValueError(f"密钥长度必须为 {self.KEY_SIZE} 字节")
+        if iv is None:
+            iv = self.generate_iv()
+        cipher = AES.new(self.key, AES.MODE_CBC, iv)
+        return cipher.encrypt(bytes(key) + self._KEY_PAD), iv
+    
+    def decrypt_cbc_key(self, ciphertext: bytes, iv: bytes) -> bytes:
+        """
+        解密 encrypt_cbc_key / encrypt_cbc 生成的 32 字节密钥密文
+        
+        Args:
+            ciphertext: 48 字节密文
+            iv: 初始化向量
+            
+        Returns:
+            32 字节密钥
+            
+        Raises:
+            ValueError: 密文长度或填充不正确
+        """
+        if len(ciphertext) != self.KEY_CBC_SIZE:
+            raise ValueError(f"密文长度必须为 {self.KEY_CBC_SIZE} 字节")
+        cipher = AES.new(self.key, AES.MODE_CBC, iv)
+        plaintext = cipher.decrypt(ciphertext)
+        if not hmac.compare_digest(plaintext[self.KEY_SIZE:], self._KEY_PAD):
+            raise ValueError("Padding is incorrect.")
+        return plaintext[:self.KEY_SIZE]
+    
+    def decrypt_cbc_keys(self, records: list[bytes]) -> list[bytes]:
+        """
+        批量解密 IV(16) + 48 字节密文格式的密钥记录
+        
+        CBC 解密 P_i = D(C_i) XOR C_{i-1}，各分组的块解密互不依赖，
+        因此所有记录的密文拼接后只做一次 ECB 解密，再与各自的 IV/前一分组异或
+        
+        Args:
+            records: IV + 密文 记录列表（每条 64 字节）
+            
+        Returns:
+            32 字节密钥列表，顺序与输入一致
+            
+        Raises:
+            ValueError: 记录长度或填充不正确
+        """
+        record_size = self.BLOCK_SIZE + self.KEY_CBC_SIZE
+        if any(len(record) != record_size for record in records):
+            raise ValueError(f"记录长度必须为 {record_size} 字节")
+        if not records:
+            return []
+        
+        ciphertext = b''.join(record[self.BLOCK_SIZE:] for record in records)
+        chain = b''.join(record[:self.KEY_CBC_SIZE] for record in records)
+        decrypted = AES.new(self.key, AES.MODE_ECB).decrypt(ciphertext)
+        plaintext = (int.from_bytes(decrypted, 'big')
+                     ^ int.from_bytes(chain, 'big')).to_bytes(len(chain), 'big')
+        
+        keys = []
+        for offset in range(0, len(plaintext), self.KEY_CBC_SIZE):
+            pad_start = offset + self.KEY_SIZE
+            if not hmac.compare_digest(plaintext[pad_start:pad_start + self.BLOCK_SIZE],
+                                       self._KEY_PAD):
+                raise ValueError("Padding is incorrect.")
+            keys.append(plaintext[offset:pad_start])
+        return keys
+    
     def decrypt_cbc(self, ciphertext: bytes, iv: bytes) -> bytes:
         """
         使用 CBC 模式解密
@@ -101,18 +209,20 @@ class AESCipher:
         plaintext = cipher.decrypt(ciphertext)
         return plaintext
     
-    def encrypt_gcm(self, plaintext: bytes, aad: bytes = None) -> tuple[bytes, bytes, bytes]:
+    def encrypt_gcm(self, plaintext: bytes, aad: bytes = None,
+                    nonce: bytes = None) -> tuple[bytes, bytes, bytes]:
         """
         使用 GCM 模式加密（认证加密）
         
         Args:
             plaintext: 明文数据
             aad: 附加认证数据（可选）
+            nonce: nonce，如果为 None 则自动生成（推荐 12 字节）
             
         Returns:
             (密文, nonce, tag) 元组
         """
-        cipher = AES.new(self.key, AES.MODE_GCM)
+        cipher = AES.new(self.key, AES.MODE_GCM, nonce=nonce)
         if aad:
             cipher.update(aad)
         ciphertext, tag = cipher.encrypt_and_digest(plaintext)
@@ -3,6 +3,10 @@ RSA-2048 非对称加密模块
 支持加解密和数字签名
 """
 
+from collections import OrderedDict
+from threading import Lock
+from typing import Union
+
 from Crypto.PublicKey import RSA
 from Crypto.Cipher import PKCS1_OAEP
 from Crypto.Signature import pkcs1_15
@@ -14,22 +18,61 @@ class RSACipher:
     
     KEY_SIZE = 2048
     
-    def __init__(self, private_key: bytes = None, public_key: bytes = None):
+    # 公钥加密器缓存（按 PEM 原始字节索引，LRU 淘汰），供反复加密给同一对端时复用
+    PUBLIC_KEY_CACHE_SIZE = 256
+    _public_key_cache: 'OrderedDict[bytes, RSACipher]' = OrderedDict()
+    _public_key_lock = Lock()
+    
+    def __init__(self, private_key: Union[bytes, RSA.RsaKey] = None,
+                 public_key: Union[bytes, RSA.RsaKey] = None):
         """
         初始化 RSA 加密器
         
         Args:
-            private_key: PEM 格式私钥
-            public_key: PEM 格式公钥
+            private_key: PEM 格式私钥，或已解析的 RsaKey 对象（跳过解析）
+            public_key: PEM 格式公钥，或已解析的 RsaKey 对象（跳过解析）
         """
         self._private_key = None
         self._public_key = None
         
         if private_key:
-            self._private_key = RSA.import_key(private_key)
+            self._private_key = self._load_key(private_key)
             self._public_key = self._private_key.publickey()
         elif public_key:
-            self._public_key = RSA.import_key(public_key)
+            self._public_key = self._load_key(public_key)
+    
+    @classmethod
+    def for_public_key(cls, public_key: bytes) -> 'RSACipher':
+        """
+        获取公钥加密器（缓存已解析的公钥，重复使用时跳过 PEM 解析和密钥校验）
+        
+        Args:
+            public_key: PEM 格式公钥
+            
+        Returns:
+            共享的 RSACipher 实例（只含公钥）
+        """
+        key = bytes(public_key)
+        cache = cls._public_key_cache
+        with cls._public_key_lock:
+            rsa = cache.get(key)
+            if rsa is not None:
+                cache.move_to_end(key)
+                return rsa
+        
+        rsa = cls(public_key=key)
+        with cls._public_key_lock:
+            cache[key] = rsa
+            while len(cache) > cls.PUBLIC_KEY_CACHE_SIZE:
+                cache.popitem(last=False)
+        return rsa
+    
+    @staticmethod
+    def _load_key(key: Union[bytes, RSA.RsaKey]) -> RSA.RsaKey:
+        """解析 PEM 密钥，已解析的密钥对象直接返回"""
+        if isinstance(key, RSA.RsaKey):
+            return key
+        return RSA.import_key(key)
     
     @classmethod
     def generate_keypair(cls) -> tuple[bytes, bytes]:
@@ -110,6 +153,16 @@ class RSACipher:
         except (ValueError, TypeError):
             return False
     
+    @property
+    def private_key_obj(self) -> RSA.RsaKey:
+        """获取已解析的私钥对象"""
+        return self._private_key
+    
+    @property
+    def public_key_obj(self) -> RSA.RsaKey:
+        """获取已解析的公钥对象"""
+        return self._public_key
+    
     @property
     def public_key_bytes(self) -> bytes:
         """获取公钥 PEM"""
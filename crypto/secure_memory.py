@@ -0,0 +1,82 @@
+"""
+锁定内存模块
+将敏感数据（如私钥）保存在不会被换出到磁盘的内存页中
+"""
+
+import sys
+import ctypes
+import weakref
+import ctypes.util
+
+
+def _load_lock_functions():
+    """加载平台的内存锁定函数，返回 (lock, unlock)，不支持时返回 (None, None)"""
+    try:
+        if sys.platform == 'win32':
+            kernel32 = ctypes.WinDLL('kernel32', use_last_error=True)
+            lock, unlock = kernel32.VirtualLock, kernel32.VirtualUnlock
+            ok = lambda ret: ret != 0   # 成功返回非零
+        else:
+            libc = ctypes.CDLL(ctypes.util.find_library('c'), use_errno=True)
+            lock, unlock = libc.mlock, libc.munlock
+            ok = lambda ret: ret == 0   # 成功返回 0
+        lock.argtypes = unlock.argtypes = (ctypes.c_void_p, ctypes.c_size_t)
+        return (lambda addr, size: ok(lock(addr, size)),
+                lambda addr, size: ok(unlock(addr, size)))
+    except (OSError, AttributeError, TypeError):
+        return None, None
+
+
+_lock, _unlock = _load_lock_functions()
+
+
+def wipe_bytearray(buf: bytearray):
+    """用 memset 原地清零可变缓冲区中的敏感数据"""
+    if buf:
+        ctypes.memset((ctypes.c_char * len(buf)).from_buffer(buf), 0, len(buf))
+
+
+class LockedBuffer:
+    """
+    锁定在物理内存中的缓冲区
+
+    尽力调用 mlock / VirtualLock 防止内容被换出到磁盘。
+    锁定失败（如超过 RLIMIT_MEMLOCK）时仍可正常使用，仅 locked 为 False。
+    """
+
+    def __init__(self, data: bytes):
+        """
+        Args:
+            data: 要保存的敏感数据（会被复制进锁定内存）
+        """
+        self._size = len(data)
+        self._buf = (ctypes.c_char * self._size).from_buffer_copy(data)
+        self._addr = ctypes.addressof(self._buf)
+        self.locked = bool(_lock and self._size and _lock(self._addr, self._size))
+        self._views = []  # 已返回视图的弱引用，清零时一并释放
+
+    def __len__(self) -> int:
+        return self._size
+
+    def view(self) -> memoryview:
+        """返回只读视图（不复制数据），wipe() 后视图失效，访问时抛出 ValueError"""
+        view = memoryview(self._buf).cast('B').toreadonly()
+        self._views = [ref for ref in self._views if ref() is not None]
+        self._views.append(weakref.ref(view))
+        return view
+
+    def wipe(self):
+        """清零、释放已返回的视图并解除锁定"""
+        ctypes.memset(self._addr, 0, self._size)
+        # 释放视图，仍持有它的对象（如 AESCipher）不会用全零密钥继续加解密
+        for ref in self._views:
+            view = ref()
+            if view is not None:
+                try:
+                    view.release()
+                except BufferError:
+                    pass  # 正在被 C 代码使用，内容已清零
+        self._views.clear()
+        if self.locked:
+            _unlock(self._addr, self._size)
+            self.locked = False
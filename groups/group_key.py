@@ -39,8 +39,7 @@ class GroupKeyManager:
         Returns:
             加密后的群组密钥
         """
-        rsa = RSACipher(public_key=member_public_key)
-        return rsa.encrypt(group_key)
+        return RSACipher.for_public_key(member_public_key).encrypt(group_key)
     
     def decrypt_group_key(self, encrypted_group_key: bytes) -> bytes:
         """
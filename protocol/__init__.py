@@ -3,9 +3,9 @@
 自定义实现的加密传输协议（不使用 SSL/TLS）
 """
 
-from .packet import Packet, PacketType
+from .packet import Packet, PacketType, encode_binary, decode_binary
 from .handshake import ClientHandshake, ServerHandshake
 from .session import Session
 from .secure_channel import SecureChannel
 
-__all__ = ['Packet', 'PacketType', 'ClientHandshake', 'ServerHandshake', 'Session', 'SecureChannel']
+__all__ = ['Packet', 'PacketType', 'encode_binary', 'decode_binary', 'ClientHandshake', 'ServerHandshake', 'Session', 'SecureChannel']
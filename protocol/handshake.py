@@ -169,7 +169,7 @@ class ClientHandshake:
             
             # 验证签名（防中间人攻击）
             sign_data = self.client_random + server_hello.server_random + server_hello.dh_public_key
-            rsa = RSACipher(public_key=server_hello.server_public_key)
+            rsa = RSACipher.for_public_key(server_hello.server_public_key)
             if not rsa.verify(sign_data, server_hello.signature):
                 self.state = HandshakeState.FAILED
                 return False
@@ -225,12 +225,13 @@ class ClientHandshake:
             finished = FinishedMessage.from_bytes(data)
             
             # 验证服务端的 verify_data
-            expected = HMACAuth.quick_hmac(
+            valid = HMACAuth.quick_verify(
                 self.session_keys['hmac_key'],
-                b"server_finished" + self.client_random + self.server_random
+                b"server_finished" + self.client_random + self.server_random,
+                finished.verify_data
             )
             
-            if finished.verify_data == expected:
+            if valid:
                 self.state = HandshakeState.FINISHED
                 return True
             else:
@@ -321,12 +322,13 @@ class ServerHandshake:
             finished = FinishedMessage.from_bytes(data)
             
             # 验证客户端的 verify_data
-            expected = HMACAuth.quick_hmac(
+            valid = HMACAuth.quick_verify(
                 self.session_keys['hmac_key'],
-                b"client_finished" + self.client_random + self.server_random
+                b"client_finished" + self.client_random + self.server_random,
+                finished.verify_data
             )
             
-            if finished.verify_data != expected:
+            if not valid:
                 self.state = HandshakeState.FAILED
                 return None
             
@@ -5,6 +5,7 @@
 
 import struct
 import time
+import binascii
 from enum import IntEnum
 from dataclasses import dataclass
 from typing import Optional
@@ -45,6 +46,7 @@ class PacketType(IntEnum):
     FOLDER_CREATE_REQUEST = 0x2D
     FOLDER_CREATE_RESPONSE = 0x2E
     FILE_UPLOAD_CANCEL = 0x2F
+    FILE_UPLOAD_ONESHOT = 0x60  # 小文件单包上传：元数据 + 密文 + 结束
     
     # 群组操作
     GROUP_CREATE_REQUEST = 0x30
@@ -85,6 +87,7 @@ class PacketFlags(IntEnum):
     FRAGMENTED = 0x0004     # 分片数据包
     LAST_FRAGMENT = 0x0008  # 最后一个分片
     REQUIRES_ACK = 0x0010   # 需要确认
+    ACCEPTS_COMPRESSED = 0x0020  # 发送方可以接收压缩载荷
 
 
 # 数据包格式:
@@ -102,6 +105,25 @@ PACKET_MAGIC = b'\x53\x44\x49\x53'  # "SDIS" - Secure Disk System
 PACKET_VERSION = 1
 HEADER_SIZE = 4 + 1 + 1 + 2 + 4 + 8 + 4 + 32  # 56 bytes
 
+# JSON 消息中二进制字段（密钥、盐值、哈希）的文本编码
+# 消息通过 'encoding' 字段声明编码；未声明时按 hex 处理以兼容旧版本
+BINARY_ENCODING = 'base64'
+LEGACY_BINARY_ENCODING = 'hex'
+
+
+def encode_binary(data: bytes, encoding: str = BINARY_ENCODING) -> str:
+    """将二进制字段编码为文本（base64 比 hex 短约 1/3）"""
+    if encoding == BINARY_ENCODING:
+        return binascii.b2a_base64(data, newline=False).decode('ascii')
+    return data.hex()
+
+
+def decode_binary(text: str, encoding: str = BINARY_ENCODING) -> bytes:
+    """解码文本形式的二进制字段"""
+    if encoding == BINARY_ENCODING:
+        return binascii.a2b_base64(text)
+    return bytes.fromhex(text)
+
 
 @dataclass
 class Packet:
@@ -7,7 +7,8 @@ import os
 import socket
 import struct
 import threading
-from typing import Optional, Tuple, Callable
+import zlib
+from typing import Optional, Tuple, Callable, Union
 from queue import Queue
 
 from crypto.aes import AESCipher
@@ -22,6 +23,12 @@ class SecureChannel:
     MAX_PAYLOAD_SIZE = 65536  # 最大载荷大小
     RECV_BUFFER_SIZE = 4096   # 接收缓冲区大小
     
+    # 载荷压缩：只有对端在数据包中声明 ACCEPTS_COMPRESSED 后才会压缩发给它的数据，
+    # 因此与不支持压缩的旧版本互通
+    COMPRESSION_THRESHOLD = 1024  # 小于该长度的载荷不压缩
+    COMPRESSION_LEVEL = 1         # JSON 文本在低级别下已有很高压缩率
+    MAX_DECOMPRESSED_SIZE = 32 * 1024 * 1024  # 解压后载荷上限，防止压缩炸弹耗尽内存
+    
     def __init__(self, sock: socket.socket, session: Session, is_server: bool = False):
         """
         初始化安全通道
@@ -38,6 +45,7 @@ class SecureChannel:
         self._recv_buffer = b''
         self._lock = threading.Lock()
         self._closed = False
+        self.peer_accepts_compressed = False
     
     @property
     def encrypt_key(self) -> bytes:
@@ -49,13 +57,15 @@ class SecureChannel:
         """获取解密密钥"""
         return self.session.client_key if self.is_server else self.session.server_key
     
-    def send(self, packet_type: PacketType, payload: bytes) -> bool:
+    def send(self, packet_type: PacketType, payload: Union[bytes, memoryview],
+             compress: bool = True) -> bool:
         """
         发送加密数据
         
         Args:
             packet_type: 数据包类型
-            payload: 原始载荷数据
+            payload: 原始载荷数据（可为 memoryview，加密前不会复制）
+            compress: 是否允许压缩（已加密的文件数据等不可压缩内容应传 False）
             
         Returns:
             发送是否成功
@@ -64,6 +74,14 @@ class SecureChannel:
             return False
         
         try:
+            flags = PacketFlags.ENCRYPTED | PacketFlags.ACCEPTS_COMPRESSED
+            if (compress and self.peer_accepts_compressed
+                    and len(payload) >= self.COMPRESSION_THRESHOLD):
+                compressed = zlib.compress(payload, self.COMPRESSION_LEVEL)
+                if len(compressed) < len(payload):
+                    payload = compressed
+                    flags |= PacketFlags.COMPRESSED
+            
             with self._lock:
                 # 加密载荷
                 cipher = AESCipher(self.encrypt_key)
@@ -83,7 +101,7 @@ class SecureChannel:
                 packet = Packet(
                     packet_type=packet_type,
                     payload=full_payload,
-                    flags=PacketFlags.ENCRYPTED,
+                    flags=flags,
                     sequence=sequence
                 )
                 
@@ -143,6 +161,8 @@ class SecureChannel:
             else:
                 payload = packet.payload
             
+            payload = self.unwrap_payload(packet.flags, payload)
+            
             self.session.update_activity()
             return (packet.packet_type, payload)
         except socket.timeout:
@@ -153,6 +173,24 @@ class SecureChannel:
             if timeout:
                 self.sock.settimeout(None)
     
+    def unwrap_payload(self, flags: int, payload: bytes) -> bytes:
+        """
+        处理已解密载荷的压缩标志，并记录对端是否可以接收压缩数据
+        
+        Raises:
+            zlib.error: 压缩数据损坏
+            ValueError: 解压后超过 MAX_DECOMPRESSED_SIZE
+        """
+        if flags & PacketFlags.ACCEPTS_COMPRESSED:
+            self.peer_accepts_compressed = True
+        if flags & PacketFlags.COMPRESSED:
+            decompressor = zlib.decompressobj()
+            data = decompressor.decompress(payload, self.MAX_DECOMPRESSED_SIZE)
+            if decompressor.unconsumed_tail:
+                raise ValueError("解压后载荷过大")
+            return data
+        return payload
+    
     def _send_all(self, data: bytes):
         """确保完整发送数据"""
         total_sent = 0
@@ -242,6 +280,11 @@ class SecureChannel:
     def close(self):
         """关闭通道"""
         self._closed = True
+        try:
+            # 先 shutdown 以唤醒阻塞在 recv() 中的读线程（仅 close 不会唤醒）
+            self.sock.shutdown(socket.SHUT_RDWR)
+        except Exception:
+            pass
         try:
             self.sock.close()
         except Exception:
@@ -9,10 +9,15 @@ from pathlib import Path
 from typing import Optional, List, Dict, Any
 from datetime import datetime
 from contextlib import contextmanager
+from dataclasses import fields
 
 from auth.user import User
 
 
+# users 表列名与 User 字段同名，按字段声明顺序查询以便直接解包
+_USER_COLUMNS = ', '.join(f.name for f in fields(User))
+
+
 class Database:
     """SQLite 数据库管理器"""
     
@@ -63,7 +68,6 @@ class Database:
                     password_hash BLOB NOT NULL,
                     public_key BLOB NOT NULL,
                     encrypted_private_key BLOB NOT NULL,
-                    private_key_salt BLOB,
                     encrypted_master_key BLOB NOT NULL,
                     master_key_salt BLOB NOT NULL,
                     recovery_key_encrypted BLOB NOT NULL,
@@ -171,14 +175,14 @@ class Database:
             cur.execute('''
                 INSERT INTO users (
                     username, email, password_hash, public_key,
-                    encrypted_private_key, private_key_salt,
+                    encrypted_private_key,
                     encrypted_master_key, master_key_salt,
                     recovery_key_encrypted, recovery_key_salt, recovery_key_hash,
                     is_active, created_at
-                ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
             ''', (
                 user.username, user.email, user.password_hash, user.public_key,
-                user.encrypted_private_key, user.private_key_salt,
+                user.encrypted_private_key,
                 user.encrypted_master_key, user.master_key_salt,
                 user.recovery_key_encrypted, user.recovery_key_salt, user.recovery_key_hash,
                 1, datetime.now().isoformat()
@@ -188,23 +192,23 @@ class Database:
     def get_user_by_id(self, user_id: int) -> Optional[User]:
         """通过 ID 获取用户"""
         with self.cursor() as cur:
-            cur.execute('SELECT * FROM users WHERE id = ?', (user_id,))
+            cur.execute(f'SELECT {_USER_COLUMNS} FROM users WHERE id = ?', (user_id,))
             row = cur.fetchone()
-            return self._row_to_user(row) if row else None
+            return User.from_db_row(row) if row else None
     
     def get_user_by_username(self, username: str) -> Optional[User]:
         """通过用户名获取用户"""
         with self.cursor() as cur:
-            cur.execute('SELECT * FROM users WHERE username = ?', (username,))
+            cur.execute(f'SELECT {_USER_COLUMNS} FROM users WHERE username = ?', (username,))
             row = cur.fetchone()
-            return self._row_to_user(row) if row else None
+            return User.from_db_row(row) if row else None
     
     def get_user_by_email(self, email: str) -> Optional[User]:
         """通过 Email 获取用户"""
         with self.cursor() as cur:
-            cur.execute('SELECT * FROM users WHERE email = ?', (email,))
+            cur.execute(f'SELECT {_USER_COLUMNS} FROM users WHERE email = ?', (email,))
             row = cur.fetchone()
-            return self._row_to_user(row) if row else None
+            return User.from_db_row(row) if row else None
     
     def update_user_password(self, user_id: int, password_hash: bytes,
                              encrypted_master_key: bytes, master_key_salt: bytes):
@@ -226,26 +230,6 @@ class Database:
                 (datetime.now().isoformat(), user_id)
             )
     
-    def _row_to_user(self, row: sqlite3.Row) -> User:
-        """将数据库行转换为 User 对象"""
-        return User(
-            id=row['id'],
-            username=row['username'],
-            email=row['email'],
-            password_hash=row['password_hash'],
-            public_key=row['public_key'],
-            encrypted_private_key=row['encrypted_private_key'],
-            private_key_salt=row['private_key_salt'] or b'',
-            encrypted_master_key=row['encrypted_master_key'],
-            master_key_salt=row['master_key_salt'],
-            recovery_key_encrypted=row['recovery_key_encrypted'],
-            recovery_key_salt=row['recovery_key_salt'],
-            recovery_key_hash=row['recovery_key_hash'],
-            is_active=bool(row['is_active']),
-            created_at=datetime.fromisoformat(row['created_at']),
-            last_login=datetime.fromisoformat(row['last_login']) if row['last_login'] else None
-        )
-    
     # ============ 群组操作 ============
     
     def create_group(self, name: str, owner_id: int, encrypted_group_key: bytes = b'') -> int:
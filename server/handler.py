@@ -8,11 +8,14 @@ import os
 from typing import Tuple, Optional
 from datetime import datetime
 
-from protocol.packet import PacketType
+from protocol.packet import (
+    PacketType, encode_binary, decode_binary, LEGACY_BINARY_ENCODING
+)
 from protocol.session import Session
 from auth.user import User
 from auth.password import PasswordManager
 from auth.email_service import EmailService
+from auth.master_key import MasterKeyManager
 from crypto.rsa import RSACipher
 from .database import Database
 from .file_storage import FileStorage
@@ -69,6 +72,7 @@ class RequestHandler:
             PacketType.FILE_UPLOAD_DATA: self._handle_upload_data,
             PacketType.FILE_UPLOAD_END: self._handle_upload_end,
             PacketType.FILE_UPLOAD_CANCEL: self._handle_upload_cancel,
+            PacketType.FILE_UPLOAD_ONESHOT: self._handle_upload_oneshot,
             PacketType.FILE_DOWNLOAD_REQUEST: self._handle_download_request,
             PacketType.FILE_DOWNLOAD_DATA: self._handle_download_data,
             PacketType.FILE_DELETE_REQUEST: self._handle_delete,
@@ -123,6 +127,23 @@ class RequestHandler:
     
     # ============ 认证处理 ============
     
+    _USER_KEY_FIELDS = ('public_key', 'encrypted_private_key',
+                        'encrypted_master_key', 'master_key_salt')
+    _RECOVERY_KEY_FIELDS = _USER_KEY_FIELDS + ('recovery_key_encrypted',
+                                               'recovery_key_salt',
+                                               'recovery_key_hash')
+    
+    def _user_key_fields(self, user: User, data: dict,
+                         recovery: bool = False) -> dict:
+        """按请求声明的编码（旧客户端为 hex）导出用户密钥字段"""
+        encoding = data.get('encoding', LEGACY_BINARY_ENCODING)
+        fields = self._RECOVERY_KEY_FIELDS if recovery else self._USER_KEY_FIELDS
+        result = {'encoding': encoding}
+        for name in fields:
+            value = getattr(user, name)
+            result[name] = encode_binary(value, encoding) if value else ''
+        return result
+    
     def _handle_register(self, session: Session, 
                          payload: bytes) -> Tuple[PacketType, bytes]:
         """处理注册请求"""
@@ -131,7 +152,15 @@ class RequestHandler:
             
             username = data['username']
             email = data['email']
-            password_hash = bytes.fromhex(data['password_hash'])
+            encoding = data.get('encoding', LEGACY_BINARY_ENCODING)
+            password_hash = decode_binary(data['password_hash'], encoding)
+            
+            # 哈希参数决定之后每次登录的验证开销，只接受固定参数
+            if not PasswordManager.is_acceptable_hash(password_hash):
+                return PacketType.REGISTER_RESPONSE, json.dumps({
+                    'success': False,
+                    'error': '密码哈希格式无效'
+                }).encode()
             
             # 检查用户名和邮箱是否已存在
             if self.db.get_user_by_username(username):
@@ -151,14 +180,13 @@ class RequestHandler:
                 username=username,
                 email=email,
                 password_hash=password_hash,
-                public_key=bytes.fromhex(data['public_key']),
-                encrypted_private_key=bytes.fromhex(data['encrypted_private_key']),
-                private_key_salt=bytes.fromhex(data.get('private_key_salt', '')),
-                encrypted_master_key=bytes.fromhex(data['encrypted_master_key']),
-                master_key_salt=bytes.fromhex(data['master_key_salt']),
-                recovery_key_encrypted=bytes.fromhex(data['recovery_key_encrypted']),
-                recovery_key_salt=bytes.fromhex(data['recovery_key_salt']),
-                recovery_key_hash=bytes.fromhex(data['recovery_key_hash'])
+                public_key=decode_binary(data['public_key'], encoding),
+                encrypted_private_key=decode_binary(data['encrypted_private_key'], encoding),
+                encrypted_master_key=decode_binary(data['encrypted_master_key'], encoding),
+                master_key_salt=decode_binary(data['master_key_salt'], encoding),
+                recovery_key_encrypted=decode_binary(data['recovery_key_encrypted'], encoding),
+                recovery_key_salt=decode_binary(data['recovery_key_salt'], encoding),
+                recovery_key_hash=decode_binary(data['recovery_key_hash'], encoding)
             )
             
             user_id = self.db.create_user(user)
@@ -210,7 +238,7 @@ class RequestHandler:
                 'error': '用户名或密码错误'
             }).encode()
         
-        # 使用 bcrypt 验证预哈希后的密码
+        # 验证预哈希后的密码（scrypt，旧账户为 bcrypt）
         if not PasswordManager.verify_password(password_prehash, user.password_hash):
             return PacketType.AUTH_RESPONSE, json.dumps({
                 'success': False,
@@ -229,10 +257,7 @@ class RequestHandler:
             'user_id': user.id,
             'username': user.username,
             'email': user.email,
-            'public_key': user.public_key.hex(),
-            'encrypted_private_key': user.encrypted_private_key.hex(),
-            'encrypted_master_key': user.encrypted_master_key.hex(),
-            'master_key_salt': user.master_key_salt.hex()
+            **self._user_key_fields(user, data)
         }).encode()
     
     def _handle_email_login(self, session: Session, 
@@ -267,10 +292,7 @@ class RequestHandler:
             'user_id': user.id,
             'username': user.username,
             'email': user.email,
-            'public_key': user.public_key.hex(),
-            'encrypted_private_key': user.encrypted_private_key.hex(),
-            'encrypted_master_key': user.encrypted_master_key.hex(),
-            'master_key_salt': user.master_key_salt.hex()
+            **self._user_key_fields(user, data)
         }).encode()
     
     def _handle_email_code(self, session: Session, 
@@ -320,13 +342,7 @@ class RequestHandler:
             'user_id': user.id,
             'username': user.username,
             'email': user.email,
-            'public_key': user.public_key.hex() if user.public_key else '',
-            'encrypted_private_key': user.encrypted_private_key.hex() if user.encrypted_private_key else '',
-            'encrypted_master_key': user.encrypted_master_key.hex() if user.encrypted_master_key else '',
-            'master_key_salt': user.master_key_salt.hex() if user.master_key_salt else '',
-            'recovery_key_encrypted': user.recovery_key_encrypted.hex() if user.recovery_key_encrypted else '',
-            'recovery_key_salt': user.recovery_key_salt.hex() if user.recovery_key_salt else '',
-            'recovery_key_hash': user.recovery_key_hash.hex() if user.recovery_key_hash else ''
+            **self._user_key_fields(user, data, recovery=True)
         }).encode()
     
     def _handle_password_reset(self, session: Session, 
@@ -338,9 +354,16 @@ class RequestHandler:
             email = data.get('email')
             code = data.get('code')
             recovery_key = data.get('recovery_key')
-            new_password_hash = bytes.fromhex(data['new_password_hash'])
-            new_encrypted_master_key = bytes.fromhex(data['new_encrypted_master_key'])
-            new_master_key_salt = bytes.fromhex(data['new_master_key_salt'])
+            encoding = data.get('encoding', LEGACY_BINARY_ENCODING)
+            new_password_hash = decode_binary(data['new_password_hash'], encoding)
+            new_encrypted_master_key = decode_binary(data['new_encrypted_master_key'], encoding)
+            new_master_key_salt = decode_binary(data['new_master_key_salt'], encoding)
+            
+            if not PasswordManager.is_acceptable_hash(new_password_hash):
+                return PacketType.PASSWORD_RESET_RESPONSE, json.dumps({
+                    'success': False,
+                    'error': '密码哈希格式无效'
+                }).encode()
             
             user = None
             
@@ -355,16 +378,8 @@ class RequestHandler:
                 
                 # 验证恢复密钥
                 # 注意：存储的是 SHA256(normalized_recovery_key)，不是 PBKDF2 派生后的哈希
-                import hashlib
-                import secrets
-                
                 if user.recovery_key_hash:
-                    # 标准化恢复密钥（移除分隔符，转大写）
-                    recovery_normalized = recovery_key.replace('-', '').replace(' ', '').upper()
-                    # 直接哈希标准化后的恢复密钥
-                    computed_hash = hashlib.sha256(recovery_normalized.encode()).digest()
-                    
-                    if not secrets.compare_digest(computed_hash, user.recovery_key_hash):
+                    if not MasterKeyManager.verify_recovery_key(recovery_key, user.recovery_key_hash):
                         return PacketType.PASSWORD_RESET_RESPONSE, json.dumps({
                             'success': False,
                             'error': '恢复密钥无效'
@@ -591,18 +606,10 @@ class RequestHandler:
             # 如果是群组文件，为其他成员创建通知
             group_id = upload.get('group_id')
             if group_id:
-                members = self.db.get_group_members(group_id)
-                uploader_id = upload.get('uploader_id')
-                filename = upload.get('filename')
-                for member in members:
-                    if member['id'] != uploader_id:
-                        self.db.create_notification(
-                            user_id=member['id'],
-                            notification_type='new_file',
-                            reference_id=upload['file_id'],
-                            group_id=group_id,
-                            message=f"群组有新文件: {filename}"
-                        )
+                self._notify_group_upload(
+                    group_id, upload.get('uploader_id'),
+                    upload['file_id'], upload.get('filename')
+                )
             
             return PacketType.FILE_UPLOAD_END, json.dumps({
                 'success': True,
@@ -614,6 +621,72 @@ class RequestHandler:
                 'error': str(e)
             }).encode()
     
+    def _notify_group_upload(self, group_id: int, uploader_id: int,
+                             file_id: int, filename: str):
+        """为群组其他成员创建新文件通知"""
+        for member in self.db.get_group_members(group_id):
+            if member['id'] != uploader_id:
+                self.db.create_notification(
+                    user_id=member['id'],
+                    notification_type='new_file',
+                    reference_id=file_id,
+                    group_id=group_id,
+                    message=f"群组有新文件: {filename}"
+                )
+    
+    def _handle_upload_oneshot(self, session: Session, 
+                               payload: bytes) -> Tuple[PacketType, bytes]:
+        """
+        处理小文件单包上传
+        
+        载荷格式: 元数据长度(4, 大端) + 元数据 JSON + 加密文件数据
+        """
+        auth_error = self._require_auth(session)
+        if auth_error:
+            return auth_error
+        
+        try:
+            header_len = int.from_bytes(payload[:4], 'big')
+            data = json.loads(payload[4:4 + header_len].decode('utf-8'))
+            content = memoryview(payload)[4 + header_len:]
+            
+            filename = data['filename']
+            group_id = data.get('group_id')
+            if len(content) != data['size']:
+                raise ValueError('文件数据长度不匹配')
+            
+            storage_path = self.storage.generate_storage_path(
+                user_id=session.user_id if not group_id else None,
+                group_id=group_id
+            )
+            if not self.storage.save_file(storage_path, content):
+                raise IOError('保存文件失败')
+            
+            file_id = self.db.create_file(
+                owner_id=session.user_id,
+                group_id=group_id,
+                name=filename,
+                path=data.get('path', '/' + filename),
+                storage_path=storage_path,
+                size=data['size'],
+                encrypted_file_key=bytes.fromhex(data['encrypted_file_key']),
+                is_folder=False,
+                parent_id=data.get('parent_id')
+            )
+            
+            if group_id:
+                self._notify_group_upload(group_id, session.user_id, file_id, filename)
+            
+            return PacketType.FILE_UPLOAD_ONESHOT, json.dumps({
+                'success': True,
+                'file_id': file_id
+            }).encode()
+        except Exception as e:
+            return PacketType.FILE_UPLOAD_ONESHOT, json.dumps({
+                'success': False,
+                'error': str(e)
+            }).encode()
+    
     def _handle_upload_cancel(self, session: Session, 
                               payload: bytes) -> Tuple[PacketType, bytes]:
         """处理上传取消"""
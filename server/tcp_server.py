@@ -3,11 +3,13 @@ TCP 服务器模块
 处理客户端连接和消息路由
 """
 
+import json
 import os
 import socket
 import selectors
 import threading
 import traceback
+import zlib
 from typing import Dict, Callable, Optional
 from dataclasses import dataclass
 
@@ -265,6 +267,16 @@ class TCPServer:
                 payload = cipher.decrypt_ctr(encrypted, nonce)
             else:
                 payload = packet.payload
+            try:
+                payload = client.channel.unwrap_payload(packet.flags, payload)
+            except (zlib.error, ValueError) as e:
+                # 客户端按发送顺序匹配响应，必须应答而不能静默丢弃
+                print(f"[Server] 载荷解压失败: {e}")
+                self._send_response(client, PacketType.ERROR, json.dumps({
+                    'success': False,
+                    'error': '载荷解压失败'
+                }).encode('utf-8'))
+                return
             
             # 调用处理器
             if self.handler: